@@ -117,9 +117,12 @@ June 2010.  It proceeds as follows:
 
 
 import ROOT
+from mcmc_adaptive import AdaptiveMetropolisProposal
+from mcmc_chain import ChainInterval, ChainStore, RunMetropolisHastings
 
 
-def FourBinInstructional(doBayesian=False, doFeldmanCousins=False, doMCMC=False):
+def FourBinInstructional(doBayesian=False, doFeldmanCousins=False, doMCMC=False,
+                         doAdaptiveMCMC=False):
     # let's time self challenging example
     t = ROOT.TStopwatch()
     t.Start()
@@ -235,6 +238,28 @@ def FourBinInstructional(doBayesian=False, doFeldmanCousins=False, doMCMC=False)
     if doMCMC:
         mcInt = mc.GetInterval()
 
+    # use an adaptive Metropolis proposal instead: no fit is needed,
+    # the strong correlations of b, rho and s are learnt during burn-in
+    adaptiveInt = 0
+    if doAdaptiveMCMC:
+        params = ROOT.RooArgList(wspace.set("poi"))
+        params.add(wspace.set("nuis"))
+        # start with 5% of the range of each parameter
+        widths = [0.05 * (params.at(i).getMax() - params.at(i).getMin())
+                  for i in range(params.getSize())]
+        nAdaptSteps = 5000
+        nll = wspace.pdf("model").createNLL(data)
+        # run until the effective sample size for s is 2000 (at most 500000 steps)
+        maxIters = 500000
+        chain = ChainStore(None, [params.at(i).GetName() for i in range(params.getSize())], maxIters)
+        info = RunMetropolisHastings(nll, params, AdaptiveMetropolisProposal(widths, nAdaptSteps),
+                                     maxIters, chain, seed=4357, targetESS=2000, essName="s",
+                                     burnInSteps=nAdaptSteps)
+        burnIn = chain.EntriesForWeightedSteps(nAdaptSteps)
+        adaptiveInt = ChainInterval(chain.Values("s", burnIn), chain.Weights(burnIn), 0.95, 0.5)
+        print "adaptive MCMC: ", info["nIters"], " steps, acceptance rate = ", info["acceptanceRate"], \
+            ", ESS = ", info["ess"], ", R-hat = ", info["rHat"]
+
     ###################
     # Make some  plots
     c1 = ROOT.gROOT.Get("c1")
@@ -284,6 +309,9 @@ def FourBinInstructional(doBayesian=False, doFeldmanCousins=False, doMCMC=False)
         print "MCMC interval s = [", mcInt.LowerLimit(wspace.var("s")), ", ", mcInt.UpperLimit(wspace.var("s")), "]"
         # MCMC interval s = [15.7628, 84.7266]
 
+    if doAdaptiveMCMC:
+        print "adaptive MCMC interval s = [", adaptiveInt[0], ", ", adaptiveInt[1], "]"
+
     t.Print()
     c1.SaveAs("FourBinInstructional.png")
 
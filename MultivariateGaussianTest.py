@@ -1,168 +1,309 @@
 # comparison of MCMC and PLC in a multi-variate gaussian problem
 
-#include "RooGlobalFunc.h"
-#include <stdlib.h>
-#include "TMatrixDSym.h"
-#include "RooMultiVarGaussian.h"
-#include "RooArgList.h"
-#include "RooRealVar.h"
-#include "TH2F.h"
-#include "TCanvas.h"
-#include "RooAbsReal.h"
-#include "RooFitResult.h"
-#include "TStopwatch.h"
-#include "RooStats/MCMCCalculator.h"
-#include "RooStats/MetropolisHastings.h"
-#include "RooStats/MarkovChain.h"
-#include "RooStats/ConfInterval.h"
-#include "RooStats/MCMCInterval.h"
-#include "RooStats/MCMCIntervalPlot.h"
-#include "RooStats/ModelConfig.h"
-#include "RooStats/ProposalHelper.h"
-#include "RooStats/ProposalFunction.h"
-#include "RooStats/PdfProposal.h"
-#include "RooStats/ProfileLikelihoodCalculator.h"
-#include "RooStats/LikelihoodIntervalPlot.h"
-#include "RooStats/LikelihoodInterval.h"
-
-using namespace std
-import ROOT
-using namespace ROOT.RooStats
-
-
-def MultivariateGaussianTest(self, dim = 4, nPOI = 2):
-  '''
-    Authors: Kevin Belasco and Kyle Cranmer.
-
-    ROOT.This tutorial produces an N-dimensional multivariate Gaussian
-    with a non-trivial covariance matrix.  By default N=4 (called "dim").
-
-    A subset of these are considered parameters of interest.
-    ROOT.This problem is tractable analytically.
-
-    We use self mainly as a test of Markov Chain Monte Carlo
-    and we compare the result to the profile likelihood ratio.
-
-    We use the proposal helper to create a customized
-    proposal function for self problem.
-
-    For N=4 and 2 parameters of interest it takes about 10-20 seconds
-    and the acceptance rate is 37%
-   '''
-
-  # let's time self challenging example
-  ROOT.TStopwatch t
-  t.Start()
-
-   ROOT.RooArgList xVec
-   ROOT.RooArgList muVec
-   ROOT.RooArgSet poi
-
-   # make the observable and means
-   Int_t i,j
-   ROOT.RooRealVar* x
-   ROOT.RooRealVar* mu_x
-   for (i = 0; i < dim; i++)      name = Form("x%d", i)
-      x = ROOT.RooRealVar(name, name, 0, -3,3)
-      xVec.add(*x)
-
-      mu_name = Form("mu_x%d",i)
-      mu_x = ROOT.RooRealVar(mu_name, mu_name, 0, -2,2)
-      muVec.add(*mu_x)
-
-
-   # put them into the list of parameters of interest
-   for (i = 0; i < nPOI; i++)      poi.add(*muVec.at(i))
-
-
-   # make a covariance matrix that is all 1's
-   ROOT.TMatrixDSym cov(dim)
-   for (i = 0; i < dim; i++)      for (j = 0; j < dim; j++)         if (i == j) cov(i,j) = 3.
-         else        cov(i,j) = 1.0
+'''
+  Authors: Kevin Belasco and Kyle Cranmer.
 
+  This tutorial produces an N-dimensional multivariate Gaussian
+  with a non-trivial covariance matrix.  By default N=4 (called "dim").
 
+  A subset of these are considered parameters of interest.
+  This problem is tractable analytically.
 
-   # now make the multivariate Gaussian
-   ROOT.RooMultiVarGaussian mvg("mvg", "mvg", xVec, muVec, cov)
+  We use self mainly as a test of Markov Chain Monte Carlo
+  and we compare the result to the profile likelihood ratio.
 
-   #####################/
-   # make a toy dataset
-   data = mvg.generate(ROOT.RooArgSet(x)Vec, 100)
+  We use the proposal helper to create a customized
+  proposal function for self problem.
 
-   #######################/
-   # now create the model config for self problem
-   w = ROOT.RooWorkspace("MVG")
-   ROOT.RooStats.ModelConfig( modelConfig(w)
-   modelConfig.SetPdf(mvg)
-   modelConfig.SetParametersOfInterest(poi)
+  For N=4 and 2 parameters of interest it takes about 10-20 seconds
+  and the acceptance rate is 37%
 
-   #####################/
-   # Setup calculators
+  Since the problem is tractable analytically it is also used as a
+  benchmark of the MCMC throughput: MultivariateGaussianBenchmark sweeps
+  the dimension, the correlation strength and the proposal type and
+  records for each configuration the wall time, the number of NLL
+  evaluations, the acceptance rate, the effective sample size per second
+  and the error of the interval with respect to the exact answer.  The
+  results are written as JSON, eg. to compare releases:
 
-   # MCMC
-   # we want to setup an efficient proposal function
-   # using the covariance matrix from a fit to the data
-   fit = mvg.fitTo(*data, ROOT.RooFit.Save(True))
-   ROOT.RooStats.ProposalHelper( ph
-   ph.SetVariables((ROOT.RooArgSet&)fit.floatParsFinal())
-   ph.SetCovMatrix(fit.covarianceMatrix())
-   ph.SetUpdateProposalParameters(True)
-   ph.SetCacheSize(100)
-   pdfProp = ph.GetProposalFunction()
-
-   # now create the calculator
-   ROOT.RooStats.MCMCCalculator( mc(*data, modelConfig)
-   mc.SetConfidenceLevel(0.95)
-   mc.SetNumBurnInSteps(100)
-   mc.SetNumIters(10000)
-   mc.SetNumBins(50)
-   mc.SetProposalFunction(*pdfProp)
-
-   mcInt = mc.GetInterval()
-   poiList = mcInt.GetAxes()
-
-   # now setup the profile likelihood calculator
-   ROOT.RooStats.ProfileLikelihoodCalculator( plc(*data, modelConfig)
-   plc.SetConfidenceLevel(0.95)
-   plInt = (LikelihoodInterval*)plc.GetInterval()
-
-
-   #####################/
-   # make some plots
-   ROOT.RooStats.MCMCIntervalPlot( mcPlot(*mcInt)
-
-   c1 = ROOT.TCanvas()
-   mcPlot.SetLineColor(ROOT.kGreen)
-   mcPlot.SetLineWidth(2)
-   mcPlot.Draw()
-
-   ROOT.RooStats.LikelihoodIntervalPlot( plPlot(plInt)
-   plPlot.Draw("same")
-
-   if poiList.getSize() == 1:      p = (ROOT.RooRealVar*)poiList.at(0)
-      ll = mcInt.LowerLimit(*p)
-      ul = mcInt.UpperLimit(*p)
-      cout << "MCMC interval: [" << ll << ", " << ul << "]" << endl
-
-
-   if poiList.getSize() == 2:      p0 = (ROOT.RooRealVar*)poiList.at(0)
-      p1 = (ROOT.RooRealVar*)poiList.at(1)
-      scatter = ROOT.TCanvas()
-      ll = mcInt.LowerLimit(*p0)
-      ul = mcInt.UpperLimit(*p0)
-      cout << "MCMC interval on p0: [" << ll << ", " << ul << "]" << endl
-      ll = mcInt.LowerLimit(*p0)
-      ul = mcInt.UpperLimit(*p0)
-      cout << "MCMC interval on p1: [" << ll << ", " << ul << "]" << endl
-
-      #MCMC interval on p0: [-0.2, 0.6]
-      #MCMC interval on p1: [-0.2, 0.6]
-
-      mcPlot.DrawChainScatter(*p0, *p1)
-      scatter.Update()
-
-
-  t.Print()
+    python MultivariateGaussianTest.py benchmark
+'''
 
 
+import json
+import sys
+import time
 
+import ROOT
+import numpy as np
+
+from dataset_numpy import DataSetToArrays
+from mcmc_adaptive import AdaptiveMetropolisProposal
+from mcmc_chain import ChainInterval, ChainStore, RandomWalkProposal, RunMetropolisHastings
+from mcmc_diagnostics import EffectiveSampleSize, ExpandWeightedChain
+
+
+def MakeMultivariateGaussianModel(dim=4, nPOI=2, correlation=1. / 3, variance=3.,
+                                  xRange=3., nEvents=100):
+    '''
+    Build the multivariate Gaussian model in a workspace with a toy dataset.
+    The covariance matrix has variance on the diagonal and
+    correlation * variance off the diagonal (the original example uses 3 and 1).
+    '''
+    w = ROOT.RooWorkspace("MVG")
+    xVec = ROOT.RooArgList()
+    muVec = ROOT.RooArgList()
+    poi = ROOT.RooArgSet()
+
+    # make the observable and means
+    for i in range(dim):
+        name = "x%d" % i
+        x = ROOT.RooRealVar(name, name, 0, -xRange, xRange)
+        xVec.addClone(x)
+
+        muName = "mu_x%d" % i
+        muX = ROOT.RooRealVar(muName, muName, 0, -2, 2)
+        muVec.addClone(muX)
+
+    # make a covariance matrix
+    cov = ROOT.TMatrixDSym(dim)
+    for i in range(dim):
+        for j in range(dim):
+            if i == j:
+                cov[i][j] = variance
+            else:
+                cov[i][j] = correlation * variance
+
+    # now make the multivariate Gaussian
+    mvg = ROOT.RooMultiVarGaussian("mvg", "mvg", xVec, muVec, cov)
+    getattr(w, 'import')(mvg)
+    mvg = w.pdf("mvg")
+
+    # put them into the list of parameters of interest
+    for i in range(nPOI):
+        poi.add(w.var("mu_x%d" % i))
+    obs = ROOT.RooArgSet()
+    for i in range(dim):
+        obs.add(w.var("x%d" % i))
+
+    #####################/
+    # make a toy dataset
+    data = mvg.generate(obs, nEvents)
+    data.SetName("data")
+    getattr(w, 'import')(data)
+
+    #######################/
+    # now create the model config for self problem
+    modelConfig = ROOT.RooStats.ModelConfig("ModelConfig", w)
+    modelConfig.SetPdf(mvg)
+    modelConfig.SetParametersOfInterest(poi)
+    modelConfig.SetObservables(obs)
+    getattr(w, 'import')(modelConfig)
+
+    return w, w.obj("ModelConfig"), w.data("data")
+
+
+def MultivariateGaussianTest(dim=4, nPOI=2):
+
+    # let's time self challenging example
+    t = ROOT.TStopwatch()
+    t.Start()
+
+    w, modelConfig, data = MakeMultivariateGaussianModel(dim, nPOI)
+    mvg = modelConfig.GetPdf()
+
+    #####################/
+    # Setup calculators
+
+    # MCMC
+    # we want to setup an efficient proposal function
+    # using the covariance matrix from a fit to the data
+    fit = mvg.fitTo(data, ROOT.RooFit.Save(True))
+    ph = ROOT.RooStats.ProposalHelper()
+    ph.SetVariables(ROOT.RooArgSet(fit.floatParsFinal()))
+    ph.SetCovMatrix(fit.covarianceMatrix())
+    ph.SetUpdateProposalParameters(True)
+    ph.SetCacheSize(100)
+    pdfProp = ph.GetProposalFunction()
+
+    # now create the calculator
+    mc = ROOT.RooStats.MCMCCalculator(data, modelConfig)
+    mc.SetConfidenceLevel(0.95)
+    mc.SetNumBurnInSteps(100)
+    mc.SetNumIters(10000)
+    mc.SetNumBins(50)
+    mc.SetProposalFunction(pdfProp)
+
+    mcInt = mc.GetInterval()
+    poiList = mcInt.GetAxes()
+
+    # now setup the profile likelihood calculator
+    plc = ROOT.RooStats.ProfileLikelihoodCalculator(data, modelConfig)
+    plc.SetConfidenceLevel(0.95)
+    plInt = plc.GetInterval()
+
+    #####################/
+    # make some plots
+    mcPlot = ROOT.RooStats.MCMCIntervalPlot(mcInt)
+
+    c1 = ROOT.TCanvas()
+    mcPlot.SetLineColor(ROOT.kGreen)
+    mcPlot.SetLineWidth(2)
+    mcPlot.Draw()
+
+    plPlot = ROOT.RooStats.LikelihoodIntervalPlot(plInt)
+    plPlot.Draw("same")
+
+    if poiList.getSize() == 1:
+        p = poiList.at(0)
+        ll = mcInt.LowerLimit(p)
+        ul = mcInt.UpperLimit(p)
+        print "MCMC interval: [", ll, ", ", ul, "]"
+
+    if poiList.getSize() == 2:
+        p0 = poiList.at(0)
+        p1 = poiList.at(1)
+        scatter = ROOT.TCanvas()
+        ll = mcInt.LowerLimit(p0)
+        ul = mcInt.UpperLimit(p0)
+        print "MCMC interval on p0: [", ll, ", ", ul, "]"
+        ll = mcInt.LowerLimit(p1)
+        ul = mcInt.UpperLimit(p1)
+        print "MCMC interval on p1: [", ll, ", ", ul, "]"
+
+        # MCMC interval on p0: [-0.2, 0.6]
+        # MCMC interval on p1: [-0.2, 0.6]
+
+        mcPlot.DrawChainScatter(p0, p1)
+        scatter.Update()
+
+    c1.SaveAs("MultivariateGaussianTest.png")
+    t.Print()
+
+
+# ____________________________________
+def ExactCentralIntervals(data, dim, nPOI, variance, confidenceLevel):
+    '''
+    With a flat prior the posterior of the means is Gaussian, centred on the
+    sample mean with covariance cov / nEvents.  Returns the exact central
+    intervals of the parameters of interest.
+    '''
+    arrays = DataSetToArrays(data, ["x%d" % i for i in range(nPOI)])
+    nEvents = data.numEntries()
+    z = ROOT.Math.normal_quantile_c((1. - confidenceLevel) / 2., 1.)
+    width = z * np.sqrt(variance / nEvents)
+    means = [arrays["x%d" % i].mean() for i in range(nPOI)]
+    return [(m - width, m + width) for m in means]
+
+
+def RunBenchmarkPoint(dim, nPOI, correlation, proposalType, nIters=20000, nBurnIn=1000,
+                      confidenceLevel=0.95, seed=4357):
+    '''
+    Run one MCMC configuration and return its figures of merit as a dict.
+    proposalType is "sequential" or "fitcovariance" (MCMCCalculator with a
+    SequentialProposal or a ProposalHelper from a fit), or "randomwalk" or
+    "adaptive" (RunMetropolisHastings with a fixed or adaptive proposal).
+    '''
+    variance = 3.
+    ROOT.RooRandom.randomGenerator().SetSeed(seed)
+    # wide observable ranges so that the likelihood is exactly Gaussian
+    w, modelConfig, data = MakeMultivariateGaussianModel(dim, nPOI, correlation, variance,
+                                                         xRange=20. * np.sqrt(variance))
+    exact = ExactCentralIntervals(data, dim, nPOI, variance, confidenceLevel)
+    poiNames = ["mu_x%d" % i for i in range(nPOI)]
+    params = ROOT.RooArgList()
+    for i in range(dim):
+        params.add(w.var("mu_x%d" % i))
+
+    start = time.time()
+    if proposalType in ("sequential", "fitcovariance"):
+        mc = ROOT.RooStats.MCMCCalculator(data, modelConfig)
+        if proposalType == "sequential":
+            proposal = ROOT.RooStats.SequentialProposal(0.1)
+            mc.SetProposalFunction(proposal)
+        else:
+            fit = modelConfig.GetPdf().fitTo(data, ROOT.RooFit.Save(True),
+                                             ROOT.RooFit.PrintLevel(-1))
+            ph = ROOT.RooStats.ProposalHelper()
+            ph.SetVariables(ROOT.RooArgSet(fit.floatParsFinal()))
+            ph.SetCovMatrix(fit.covarianceMatrix())
+            ph.SetUpdateProposalParameters(True)
+            ph.SetCacheSize(100)
+            proposal = ph.GetProposalFunction()
+            mc.SetProposalFunction(proposal)
+        mc.SetConfidenceLevel(confidenceLevel)
+        mc.SetLeftSideTailFraction(0.5)
+        mc.SetNumBurnInSteps(nBurnIn)
+        mc.SetNumIters(nIters)
+        mcInt = mc.GetInterval()
+        wallTime = time.time() - start
+
+        chain = DataSetToArrays(mcInt.GetChain().GetAsConstDataSet(), poiNames)
+        # MCMCInterval skips the first nBurnIn entries of the chain, not
+        # weighted steps
+        burnIn = nBurnIn
+        steps = dict((n, ExpandWeightedChain(chain[n][burnIn:], chain["weight"][burnIn:]))
+                     for n in poiNames)
+        limits = [(mcInt.LowerLimit(w.var(n)), mcInt.UpperLimit(w.var(n))) for n in poiNames]
+        # one NLL evaluation per proposed step
+        nEvaluations = nIters
+        acceptanceRate = (len(chain["weight"]) - 1) / float(nIters)
+    else:
+        widths = [0.05 * (p.getMax() - p.getMin()) for p in params]
+        if proposalType == "randomwalk":
+            proposal = RandomWalkProposal(widths)
+        else:
+            proposal = AdaptiveMetropolisProposal(widths, nBurnIn)
+        nll = modelConfig.GetPdf().createNLL(data)
+        chain = ChainStore(None, [p.GetName() for p in params], nIters)
+        info = RunMetropolisHastings(nll, params, proposal, nIters, chain, seed=seed)
+        wallTime = time.time() - start
+
+        burnIn = chain.EntriesForWeightedSteps(nBurnIn)
+        steps = dict((n, ExpandWeightedChain(chain.Values(n, burnIn), chain.Weights(burnIn)))
+                     for n in poiNames)
+        limits = [ChainInterval(chain.Values(n, burnIn), chain.Weights(burnIn),
+                                confidenceLevel, 0.5) for n in poiNames]
+        nEvaluations = info["nNLLEvaluations"]
+        acceptanceRate = info["acceptanceRate"]
+
+    ess = min(EffectiveSampleSize(steps[n]) for n in poiNames)
+    intervalError = max(max(abs(l[0] - e[0]), abs(l[1] - e[1])) for l, e in zip(limits, exact))
+    return {"dim": dim, "nPOI": nPOI, "correlation": correlation,
+            "proposal": proposalType, "nIters": nIters,
+            "wallTime": wallTime, "nllEvaluations": nEvaluations,
+            "acceptanceRate": acceptanceRate, "ess": ess,
+            "essPerSecond": ess / wallTime if wallTime > 0 else None,
+            "intervalError": intervalError}
+
+
+def MultivariateGaussianBenchmark(dims=(4, 8, 16, 32, 64), correlations=(0., 1. / 3, 0.9),
+                                  proposals=("sequential", "fitcovariance", "randomwalk", "adaptive"),
+                                  nPOI=2, nIters=20000, nBurnIn=1000,
+                                  outputFile="MultivariateGaussianBenchmark.json"):
+    '''
+    Sweep dimension, correlation strength and proposal type and write the
+    results as a JSON list of records to outputFile.
+    '''
+    ROOT.RooMsgService.instance().setGlobalKillBelow(ROOT.RooFit.WARNING)
+    results = []
+    for dim in dims:
+        for correlation in correlations:
+            for proposalType in proposals:
+                result = RunBenchmarkPoint(dim, min(nPOI, dim), correlation, proposalType,
+                                           nIters, nBurnIn)
+                print "dim = %2d  rho = %.2f  %-13s  time = %8.2f s  accept = %.3f  ESS/s = %8.1f  error = %.4f" % (
+                    dim, correlation, proposalType, result["wallTime"],
+                    result["acceptanceRate"], result["essPerSecond"] or 0., result["intervalError"])
+                results.append(result)
+
+    with open(outputFile, "w") as out:
+        json.dump({"rootVersion": ROOT.gROOT.GetVersion(), "results": results}, out, indent=1)
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "benchmark":
+        MultivariateGaussianBenchmark()
+    else:
+        MultivariateGaussianTest()
@@ -4,18 +4,18 @@
  Author: Kyle Cranmer
  date: Spring. 2011
 
- ROOT.This is a standard demo that can be used with any ROOT file
+ This is a standard demo that can be used with any ROOT file
  prepared in the standard way.  You specify:
  - name for input ROOT file
  - name of workspace inside ROOT file that holds model and data
- - name of ROOT.RooStats.ModelConfig( that specifies details for calculator tools
+ - name of ModelConfig that specifies details for calculator tools
  - name of dataset
 
  With default parameters the macro will attempt to run the
  standard hist2workspace example and read the ROOT file
  that it produces.
 
- ROOT.The macro will scan through all the categories in a simPdf find the corresponding
+ The macro will scan through all the categories in a simPdf find the corresponding
  observable.  For each cateogry, will loop through each of the nuisance parameters
  and plot
  - the data
@@ -26,276 +26,221 @@
  You can specify how many sigma to vary by changing nSigmaToVary.
  You can also change the signal rate by changing muVal.
 
- ROOT.The script produces a lot plots, can merge them by doing:
- gs -q -dNOPAUSE -dBATCH -sDEVICE=pdfwrite -sOutputFile=merged.pdf `ls *pdf`
+ With nWorkers > 1 the plots of the (category, nuisance parameter) pairs
+ are made in batch mode by that many processes, each reading its own copy
+ of the workspace (see histfactory_plots).
+ With useVariationEngine the +-Nsigma curves are drawn from template
+ yields cached per category (see histfactory_variations) instead of
+ evaluating the full channel pdf three times per plot.
+
+ With doFit the model is fitted to the data and the first category is
+ plotted with the fitted model.  The data is split by category in one
+ pass, which gives the observed yields and the data of the plot, and the
+ yields of all categories (see histfactory_yields) are kept in
+ <input file>.yields.json for the next run.
+
+ The plots are written as they are made to the multi-page PDF file
+ outputPdf, one page per plot followed by a summary page.  With
+ outputPdf=None every plot is saved to its own PDF file instead.
  '''
 
-#include "TFile.h"
-#include "TROOT.h"
-#include "TCanvas.h"
-#include "TList.h"
-#include "TMath.h"
-#include "TSystem.h"
-#include "RooWorkspace.h"
-#include "RooAbsData.h"
-#include "RooRealVar.h"
-#include "RooPlot.h"
-#include "RooSimultaneous.h"
-#include "RooCategory.h"
-
-#include "RooStats/ModelConfig.h"
-#include "RooStats/ProfileInspector.h"
-
-import ROOT
-using namespace ROOT.RooStats
-using namespace std
-
-void StandardHistFactoryPlotsWithCategories( infile = "",
-                                             workspaceName = "combined",
-                                             modelConfigName = "ModelConfig",
-                                             dataName = "obsData")
-
-   double nSigmaToVary=5.
-   double muVal=0
-   bool doFit=False
-
-   ##############################/
-   # First part is just to access a user-defined file
-   # or create the standard example file if it doesn't exist
-   ##############################
-    filename = ""
-   if not strcmp(infile, ""):      filename = "results/example_combined_GaussExample_model.root"
-      fileExist = not gSystem.AccessPathName(filename); # note opposite return code
-                                                           # if file does not exists generate with histfactory
-      if not fileExist:#ifdef _WIN32
-         cout << "HistFactory file cannot be generated on Windows - exit" << endl
-         return
-#endif
-         # Normally self would be run on the command line
-         cout <<"will run standard hist2workspace example"<<endl
-         gROOT.ProcessLine(".not  prepareHistFactory .")
-         gROOT.ProcessLine(".not  hist2workspace config/example.xml")
-         cout <<"\n\n---------------------"<<endl
-         cout <<"Done creating example input"<<endl
-         cout <<"---------------------\n\n"<<endl
-
-
-
-   else:
-      filename = infile
-
-   # ROOT.Try to open the file
-   ROOT.TFile *file = ROOT.TFile.Open(filename)
-
-   # if input file was specified byt not found, quit
-   if not file :      cout <<"StandardRooStatsDemoMacro: Input file " << filename << " is not found" << endl
-      return
-
-
-   ##############################/
-   # ROOT.Tutorial starts here
-   ##############################
-
-   # get the workspace out of the file
-   w = (ROOT.RooWorkspace*) file.Get(workspaceName)
-   if not w:      cout <<"workspace not found" << endl
-      return
-
-
-   # get the modelConfig out of the file
-   mc = (ModelConfig*) w.obj(modelConfigName)
-
-   # get the modelConfig out of the file
-   data = w.data(dataName)
-
-   # make sure ingredients are found
-   if not data or not mc:      w.Print()
-      cout << "data or ROOT.RooStats.ModelConfig( was not found" <<endl
-      return
-
-
-   #######################
-   # now use the profile inspector
-
-   obs = (ROOT.RooRealVar*)mc.GetObservables().first()
-   list = ROOT.TList()
-
-
-   ROOT.RooRealVar firstPOI = dynamic_cast<RooRealVar*>(mc.GetParametersOfInterest().first())
-
-   firstPOI.setVal(muVal)
-   #  firstPOI.setConstant()
-   if doFit:      mc.GetPdf().fitTo(*data)
-
-
-   ####################
-   ####################
-   ####################
-
-   mc.GetNuisanceParameters().Print("v")
-   nPlotsMax = 1000
-   cout <<" check expectedData by category"<<endl
-   ROOT.RooDataSet* simData=NULL
-   simPdf = NULL
-   if strcmp(mc.GetPdf().ClassName(), "RooSimultaneous")==0:      cout <<"Is a simultaneous PDF"<<endl
-      simPdf = (ROOT.RooSimultaneous *)(mc.GetPdf())
-   } else:
-      cout <<"Is not a simultaneous PDF"<<endl
-
-
-
-
-   if doFit:      channelCat = (ROOT.RooCategory*) (&simPdf.indexCat())
-      iter = channelCat.typeIterator() 
-      tt = NULL
-      tt=(ROOT.RooCatType*) iter.Next()
-      pdftmp = ((ROOT.RooSimultaneous*)mc.GetPdf()).getPdf(tt.GetName()) 
-      obstmp = pdftmp.getObservables(*mc.GetObservables()) 
-      obs = ((ROOT.RooRealVar*)obstmp.first())
-      frame = obs.frame()
-      cout <<Form("%s==%s.%s",channelCat.GetName(),channelCat.GetName(),tt.GetName())<<endl
-      cout << tt.GetName() << " " << channelCat.getLabel() <<endl
-      data.plotOn(frame,MarkerSize(1),Cut(Form("%s==%s.%s",channelCat.GetName(),channelCat.GetName(),tt.GetName())), ROOT.RooFit.DataError(ROOT.RooAbsData.None))
-
-      normCount = data.sumEntries(Form("%s==%s.%s",channelCat.GetName(),channelCat.GetName(),tt.GetName())) 
-
-      pdftmp.plotOn(frame, ROOT.RooFit.LineWidth(2.), ROOT.RooFit.Normalization(normCount, ROOT.RooAbsReal.NumEvent)) 
-      frame.Draw()
-      cout <<"events = " << mc.GetPdf().expectedEvents(*data.get()) <<endl
-      return
-
-
-
-
-   int nPlots=0
-   if not simPdf:
-      it = mc.GetNuisanceParameters().createIterator()
-      var = NULL
-      while( (var = (ROOT.RooRealVar*) it.Next()) != NULL)         frame = obs.frame()
-         frame.SetYTitle(var.GetName())
-         data.plotOn(frame,MarkerSize(1))
-         var.setVal(0)
-         mc.GetPdf().plotOn(frame, ROOT.RooFit.LineWidth(1.))
-         var.setVal(1)
-         mc.GetPdf().plotOn(frame, ROOT.RooFit.LineColor(ROOT.kRed), ROOT.RooFit.LineStyle(ROOT.kDashed), ROOT.RooFit.LineWidth(1))
-         var.setVal(-1)
-         mc.GetPdf().plotOn(frame, ROOT.RooFit.LineColor(ROOT.kGreen), ROOT.RooFit.LineStyle(ROOT.kDashed), ROOT.RooFit.LineWidth(1))
-         list.Add(frame)
-         var.setVal(0)
-
 
+import math
 
-   } else:
-      channelCat = (ROOT.RooCategory*) (&simPdf.indexCat())
-      #    iter = simPdf.indexCat().typeIterator() 
-      iter = channelCat.typeIterator() 
-      tt = NULL
-      while(nPlots<nPlotsMax and (tt=(ROOT.RooCatType*) iter.Next()))
-         cout << "on type " << tt.GetName() << " " << endl
-         # Get pdf associated with state from simpdf
-         pdftmp = simPdf.getPdf(tt.GetName()) 
-
-         # Generate observables defined by the pdf associated with self state
-         obstmp = pdftmp.getObservables(*mc.GetObservables()) 
-         #      obstmp.Print()
-
-
-         obs = ((ROOT.RooRealVar*)obstmp.first())
+import ROOT
 
-         it = mc.GetNuisanceParameters().createIterator()
-         var = NULL
-         while(nPlots<nPlotsMax and (var = (ROOT.RooRealVar*) it.Next()))            c2 = ROOT.TCanvas("c2")
+from histfactory_plots import (PlotVariations, VariationPairs, VariationPlotFileName,
+                               SaveVariationPlot, ParallelVariationPlots)
+from histfactory_variations import VariationEngine
+from histfactory_yields import ComputeYieldTable, SplitByCategory, YieldTableCache
+from multipage_pdf import MultiPagePdf
+
+
+def StandardHistFactoryPlotsWithCategories(infile="",
+                                           workspaceName="combined",
+                                           modelConfigName="ModelConfig",
+                                           dataName="obsData",
+                                           nWorkers=1,
+                                           useVariationEngine=False,
+                                           outputPdf="StandardHistFactoryPlotsWithCategories.pdf",
+                                           doFit=False):
+
+    nSigmaToVary = 5.
+    muVal = 0
+
+    ##############################/
+    # First part is just to access a user-defined file
+    # or create the standard example file if it doesn't exist
+    ##############################
+    filename = ""
+    if infile == "":
+        filename = "results/example_combined_GaussExample_model.root"
+        fileExist = not ROOT.gSystem.AccessPathName(filename)  # note opposite return code
+        # if file does not exists generate with histfactory
+        if not fileExist:
+            # Normally this would be run on the command line
+            print "will run standard hist2workspace example"
+            ROOT.gROOT.ProcessLine(".! prepareHistFactory .")
+            ROOT.gROOT.ProcessLine(".! hist2workspace config/example.xml")
+            print "\n\n---------------------"
+            print "Done creating example input"
+            print "---------------------\n\n"
+    else:
+        filename = infile
+
+    # Try to open the file
+    inputFile = ROOT.TFile.Open(filename)
+
+    # if input file was specified byt not found, quit
+    if not inputFile:
+        print "StandardRooStatsDemoMacro: Input file", filename, "is not found"
+        return
+
+    ##############################/
+    # Tutorial starts here
+    ##############################
+
+    # get the workspace out of the file
+    w = inputFile.Get(workspaceName)
+    if not w:
+        print "workspace not found"
+        return
+
+    # get the modelConfig out of the file
+    mc = w.obj(modelConfigName)
+
+    # get the modelConfig out of the file
+    data = w.data(dataName)
+
+    # make sure ingredients are found
+    if not data or not mc:
+        w.Print()
+        print "data or ModelConfig was not found"
+        return
+
+    #######################
+    # now use the profile inspector
+
+    obs = mc.GetObservables().first()
+    plots = []
+
+    firstPOI = mc.GetParametersOfInterest().first()
+
+    firstPOI.setVal(muVal)
+    #  firstPOI.setConstant()
+    if doFit:
+        mc.GetPdf().fitTo(data)
+
+    ####################
+    ####################
+    ####################
+
+    mc.GetNuisanceParameters().Print("v")
+    nPlotsMax = 1000
+    output = MultiPagePdf(outputPdf) if outputPdf else None
+    print " check expectedData by category"
+    simPdf = None
+    if mc.GetPdf().ClassName() == "RooSimultaneous":
+        print "Is a simultaneous PDF"
+        simPdf = mc.GetPdf()
+    else:
+        print "Is not a simultaneous PDF"
+
+    if doFit:
+        channelCat = simPdf.indexCat()
+        it = channelCat.typeIterator()
+        tt = it.Next()
+        pdftmp = simPdf.getPdf(tt.GetName())
+        obstmp = pdftmp.getObservables(mc.GetObservables())
+        obs = obstmp.first()
+        frame = obs.frame()
+        print tt.GetName(), channelCat.getLabel()
+        # one pass over the data for all the categories, instead of a cut
+        # per category
+        parts = SplitByCategory(data, channelCat)
+        parts[tt.GetName()].plotOn(frame, ROOT.RooFit.MarkerSize(1),
+                                   ROOT.RooFit.DataError(getattr(ROOT.RooAbsData, "None")))
+
+        # yields of all the categories, from the cache if already computed
+        # for these parameter values
+        cache = YieldTableCache(filename + ".yields.json")
+        key = cache.Key(filename, workspaceName, modelConfigName, dataName, mc)
+        table = cache.Get(key, lambda: ComputeYieldTable(mc, data, parts=parts))
+        print table.Format()
+
+        normCount = table.observed[tt.GetName()]
+
+        pdftmp.plotOn(frame, ROOT.RooFit.LineWidth(2),
+                      ROOT.RooFit.Normalization(normCount, ROOT.RooAbsReal.NumEvent))
+        frame.Draw()
+        print "events = ", table.Total(tt.GetName())
+        return
+
+    if not simPdf:
+        for var in ROOT.RooArgList(mc.GetNuisanceParameters()):
             frame = obs.frame()
-            frame.SetName(Form("frame%d",nPlots))
             frame.SetYTitle(var.GetName())
-
-            cout <<Form("%s==%s.%s",channelCat.GetName(),channelCat.GetName(),tt.GetName())<<endl
-            cout << tt.GetName() << " " << channelCat.getLabel() <<endl
-            data.plotOn(frame,MarkerSize(1),Cut(Form("%s==%s.%s",channelCat.GetName(),channelCat.GetName(),tt.GetName())), ROOT.RooFit.DataError(ROOT.RooAbsData.None))
-
-            normCount = data.sumEntries(Form("%s==%s.%s",channelCat.GetName(),channelCat.GetName(),tt.GetName())) 
-
-            if strcmp(var.GetName(), "Lumi")==0:               cout <<"working on lumi"<<endl
-               var.setVal(w.var("nominalLumi").getVal())
-               var.Print()
-            } else:
-               var.setVal(0)
-
-            # w.allVars().Print("v")
-            # mc.GetNuisanceParameters().Print("v")
-            # pdftmp.plotOn(frame, ROOT.RooFit.LineWidth(2.))
-            # mc.GetPdf().plotOn(frame, ROOT.RooFit.LineWidth(2.),Slice(*channelCat,tt.GetName()),ProjWData(*data))
-            #pdftmp.plotOn(frame, ROOT.RooFit.LineWidth(2.),Slice(*channelCat,tt.GetName()),ProjWData(*data))
-            normCount = pdftmp.expectedEvents(*obs)
-            pdftmp.plotOn(frame, ROOT.RooFit.LineWidth(2.), ROOT.RooFit.Normalization(normCount, ROOT.RooAbsReal.NumEvent)) 
-
-            if strcmp(var.GetName(), "Lumi")==0:               cout <<"working on lumi"<<endl
-               var.setVal(w.var("nominalLumi").getVal()+0.05)
-               var.Print()
-            } else:
-               var.setVal(nSigmaToVary)
-
-            # pdftmp.plotOn(frame, ROOT.RooFit.LineColor(ROOT.kRed), ROOT.RooFit.LineStyle(ROOT.kDashed), ROOT.RooFit.LineWidth(2))
-            # mc.GetPdf().plotOn(frame, ROOT.RooFit.LineColor(ROOT.kRed), ROOT.RooFit.LineStyle(ROOT.kDashed), ROOT.RooFit.LineWidth(2.),Slice(*channelCat,tt.GetName()),ProjWData(*data))
-            #pdftmp.plotOn(frame, ROOT.RooFit.LineColor(ROOT.kRed), ROOT.RooFit.LineStyle(ROOT.kDashed), ROOT.RooFit.LineWidth(2.),Slice(*channelCat,tt.GetName()),ProjWData(*data))
-            normCount = pdftmp.expectedEvents(*obs)
-            pdftmp.plotOn(frame, ROOT.RooFit.LineWidth(2.), ROOT.RooFit.LineColor(ROOT.kRed), ROOT.RooFit.LineStyle(ROOT.kDashed), ROOT.RooFit.Normalization(normCount, ROOT.RooAbsReal.NumEvent)) 
-
-            if strcmp(var.GetName(), "Lumi")==0:               cout <<"working on lumi"<<endl
-               var.setVal(w.var("nominalLumi").getVal()-0.05)
-               var.Print()
-            } else:
-               var.setVal(-nSigmaToVary)
-
-            # pdftmp.plotOn(frame, ROOT.RooFit.LineColor(ROOT.kGreen), ROOT.RooFit.LineStyle(ROOT.kDashed), ROOT.RooFit.LineWidth(2))
-            # mc.GetPdf().plotOn(frame, ROOT.RooFit.LineColor(ROOT.kGreen), ROOT.RooFit.LineStyle(ROOT.kDashed), ROOT.RooFit.LineWidth(2),Slice(*channelCat,tt.GetName()),ProjWData(*data))
-            #pdftmp.plotOn(frame, ROOT.RooFit.LineColor(ROOT.kGreen), ROOT.RooFit.LineStyle(ROOT.kDashed), ROOT.RooFit.LineWidth(2),Slice(*channelCat,tt.GetName()),ProjWData(*data))
-            normCount = pdftmp.expectedEvents(*obs)
-            pdftmp.plotOn(frame, ROOT.RooFit.LineWidth(2.), ROOT.RooFit.LineColor(ROOT.kGreen), ROOT.RooFit.LineStyle(ROOT.kDashed), ROOT.RooFit.Normalization(normCount, ROOT.RooAbsReal.NumEvent)) 
-
-
-
-            # set them back to normal
-            if strcmp(var.GetName(), "Lumi")==0:               cout <<"working on lumi"<<endl
-               var.setVal(w.var("nominalLumi").getVal())
-               var.Print()
-            } else:
-               var.setVal(0)
-
-
-            list.Add(frame)
-
-            # quit making plots
-            ++nPlots
-
-            frame.Draw()
-            c2.SaveAs(Form("%s_%s_%s.pdf",tt.GetName(),obs.GetName(),var.GetName()))
-            delete c2
-
-
-
-
-
-
-   ####################
-   ####################
-   ####################
-
-   # now make plots
-   c1 = ROOT.TCanvas("c1", "ProfileInspectorDemo",800,200)
-   if list.GetSize()>4:      n = list.GetSize()
-      nx = (int)sqrt(n) 
-      ny = ROOT.TMath.CeilNint(n/nx)
-      nx = ROOT.TMath.CeilNint( sqrt(n) )
-      c1.Divide(ny,nx)
-   } else:
-      c1.Divide(list.GetSize())
-   for(int i=0; i<list.GetSize(); ++i)      c1.cd(i+1)
-      list.At(i).Draw()
-
-
-
-
-
-
-
+            data.plotOn(frame, ROOT.RooFit.MarkerSize(1))
+            var.setVal(0)
+            mc.GetPdf().plotOn(frame, ROOT.RooFit.LineWidth(1))
+            var.setVal(1)
+            mc.GetPdf().plotOn(frame, ROOT.RooFit.LineColor(ROOT.kRed),
+                               ROOT.RooFit.LineStyle(ROOT.kDashed), ROOT.RooFit.LineWidth(1))
+            var.setVal(-1)
+            mc.GetPdf().plotOn(frame, ROOT.RooFit.LineColor(ROOT.kGreen),
+                               ROOT.RooFit.LineStyle(ROOT.kDashed), ROOT.RooFit.LineWidth(1))
+            plots.append(frame)
+            var.setVal(0)
+            if output:
+                output.AddObject(frame, title=var.GetName())
+
+    elif nWorkers > 1:
+        # headless, the pairs are plotted by the worker processes
+        ROOT.gROOT.SetBatch(True)
+        pairs = VariationPairs(mc, nPlotsMax)
+        results = ParallelVariationPlots(filename, workspaceName, modelConfigName, dataName,
+                                         pairs, nSigmaToVary, muVal, nWorkers,
+                                         useEngine=useVariationEngine, savePdf=output is None)
+        for category, name, pdfFileName, frame in results:
+            plots.append(frame)
+            if output:
+                output.AddObject(frame, title="%s %s" % (category, name))
+
+    else:
+        engine = VariationEngine(mc) if useVariationEngine else None
+        for nPlots, (category, name) in enumerate(VariationPairs(mc, nPlotsMax)):
+            print "on type", category
+            var = mc.GetNuisanceParameters().find(name)
+            frame = PlotVariations(w, mc, data, category, var, nSigmaToVary,
+                                   "frame%d" % nPlots, engine)
+            plots.append(frame)
+            if output:
+                output.AddObject(frame, title="%s %s" % (category, name))
+            else:
+                SaveVariationPlot(frame, VariationPlotFileName(".", mc, category, name))
+
+    ####################
+    ####################
+    ####################
+
+    # now make plots
+    c1 = ROOT.TCanvas("c1", "ProfileInspectorDemo", 800, 200)
+    if len(plots) > 4:
+        n = len(plots)
+        nx = int(math.sqrt(n))
+        ny = ROOT.TMath.CeilNint(float(n) / nx)
+        nx = ROOT.TMath.CeilNint(math.sqrt(n))
+        c1.Divide(ny, nx)
+    else:
+        c1.Divide(len(plots))
+    for i, frame in enumerate(plots):
+        c1.cd(i + 1)
+        frame.Draw()
+    if output:
+        output.AddCanvas(c1, title="summary")
+        output.Close()
+    return c1
+
+
+if __name__ == "__main__":
+    StandardHistFactoryPlotsWithCategories()
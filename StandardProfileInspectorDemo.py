@@ -9,7 +9,7 @@ This is a standard demo that can be used with any ROOT file
 prepared in the standard way.  You specify:
  - name for input ROOT file
  - name of workspace inside ROOT file that holds model and data
- - name of ROOT.RooStats.ModelConfig( that specifies details for calculator tools
+ - name of ModelConfig that specifies details for calculator tools
  - name of dataset
 
 With default parameters the macro will attempt to run the
@@ -23,101 +23,103 @@ of each nuisance parameter in the model vs. the parameter of interest.
 (aka. profiled value of nuisance parameter vs. parameter of interest)
 (aka. best fit nuisance parameter with p.o.i fixed vs. parameter of interest)
 
+With outputPdf the profile plots are also written to a multi-page PDF
+file, one page per nuisance parameter followed by the summary canvas.
+
 '''
 
-#include "TFile.h"
-#include "TROOT.h"
-#include "TCanvas.h"
-#include "TList.h"
-#include "TMath.h"
-#include "TSystem.h"
-#include "RooWorkspace.h"
-#include "RooAbsData.h"
 
-#include "RooStats/ModelConfig.h"
-#include "RooStats/ProfileInspector.h"
+import math
 
 import ROOT
-using namespace ROOT.RooStats
-
-void StandardProfileInspectorDemo( infile = "",
-                                   workspaceName = "combined",
-                                   modelConfigName = "ModelConfig",
-                                   dataName = "obsData")
-  ##############################/
-  # First part is just to access a user-defined file
-  # or create the standard example file if it doesn't exist
-  ##############################
-
-    filename = ""
-   if not strcmp(infile, ""):      filename = "results/example_combined_GaussExample_model.root"
-      fileExist = not gSystem.AccessPathName(filename); # note opposite return code
-      # if file does not exists generate with histfactory
-      if not fileExist:#ifdef _WIN32
-         cout << "HistFactory file cannot be generated on Windows - exit" << endl
-         return
-#endif
-         # Normally self would be run on the command line
-         cout <<"will run standard hist2workspace example"<<endl
-         gROOT.ProcessLine(".not  prepareHistFactory .")
-         gROOT.ProcessLine(".not  hist2workspace config/example.xml")
-         cout <<"\n\n---------------------"<<endl
-         cout <<"Done creating example input"<<endl
-         cout <<"---------------------\n\n"<<endl
-
-
-
-   else:
-      filename = infile
-
-   # ROOT.Try to open the file
-   ROOT.TFile *file = ROOT.TFile.Open(filename)
-
-   # if input file was specified byt not found, quit
-   if not file :      cout <<"StandardRooStatsDemoMacro: Input file " << filename << " is not found" << endl
-      return
-
 
+from multipage_pdf import MultiPagePdf
 
-  ##############################/
-  # ROOT.Tutorial starts here
-  ##############################
 
-  # get the workspace out of the file
-  w = (ROOT.RooWorkspace*) file.Get(workspaceName)
-  if not w:    cout <<"workspace not found" << endl
-    return
-
-
-  # get the modelConfig out of the file
-  mc = (ModelConfig*) w.obj(modelConfigName)
-
-  # get the modelConfig out of the file
-  data = w.data(dataName)
-
-  # make sure ingredients are found
-  if not data or not mc:    w.Print()
-    cout << "data or ROOT.RooStats.ModelConfig( was not found" <<endl
-    return
-
-
-  #######################
-  # now use the profile inspector
-  ProfileInspector p
-  list = p.GetListOfProfilePlots(*data,mc)
-
-  # now make plots
-  c1 = ROOT.TCanvas("c1", "ProfileInspectorDemo",800,200)
-  if list.GetSize()>4:    n = list.GetSize()
-    nx = (int)sqrt(n) 
-    ny = ROOT.TMath.CeilNint(n/nx)
-    nx = ROOT.TMath.CeilNint( sqrt(n) )
-    c1.Divide(ny,nx)
-  } else:
-    c1.Divide(list.GetSize())
-  for(int i=0; i<list.GetSize(); ++i)    c1.cd(i+1)
-    list.At(i).Draw("al")
-
-
-  cout << endl
+def StandardProfileInspectorDemo(infile="",
+                                 workspaceName="combined",
+                                 modelConfigName="ModelConfig",
+                                 dataName="obsData",
+                                 outputPdf=None):
+    ##############################/
+    # First part is just to access a user-defined file
+    # or create the standard example file if it doesn't exist
+    ##############################
 
+    filename = ""
+    if infile == "":
+        filename = "results/example_combined_GaussExample_model.root"
+        fileExist = not ROOT.gSystem.AccessPathName(filename)  # note opposite return code
+        # if file does not exists generate with histfactory
+        if not fileExist:
+            # Normally this would be run on the command line
+            print "will run standard hist2workspace example"
+            ROOT.gROOT.ProcessLine(".! prepareHistFactory .")
+            ROOT.gROOT.ProcessLine(".! hist2workspace config/example.xml")
+            print "\n\n---------------------"
+            print "Done creating example input"
+            print "---------------------\n\n"
+    else:
+        filename = infile
+
+    # Try to open the file
+    inputFile = ROOT.TFile.Open(filename)
+
+    # if input file was specified byt not found, quit
+    if not inputFile:
+        print "StandardRooStatsDemoMacro: Input file", filename, "is not found"
+        return
+
+    ##############################/
+    # Tutorial starts here
+    ##############################
+
+    # get the workspace out of the file
+    w = inputFile.Get(workspaceName)
+    if not w:
+        print "workspace not found"
+        return
+
+    # get the modelConfig out of the file
+    mc = w.obj(modelConfigName)
+
+    # get the modelConfig out of the file
+    data = w.data(dataName)
+
+    # make sure ingredients are found
+    if not data or not mc:
+        w.Print()
+        print "data or ModelConfig was not found"
+        return
+
+    #######################
+    # now use the profile inspector
+    p = ROOT.RooStats.ProfileInspector()
+    plots = p.GetListOfProfilePlots(data, mc)
+
+    # now make plots
+    c1 = ROOT.TCanvas("c1", "ProfileInspectorDemo", 800, 200)
+    if plots.GetSize() > 4:
+        n = plots.GetSize()
+        nx = int(math.sqrt(n))
+        ny = ROOT.TMath.CeilNint(float(n) / nx)
+        nx = ROOT.TMath.CeilNint(math.sqrt(n))
+        c1.Divide(ny, nx)
+    else:
+        c1.Divide(plots.GetSize())
+    for i in range(plots.GetSize()):
+        c1.cd(i + 1)
+        plots.At(i).Draw("al")
+
+    if outputPdf:
+        with MultiPagePdf(outputPdf) as output:
+            for i in range(plots.GetSize()):
+                output.AddObject(plots.At(i), "al", title=plots.At(i).GetName())
+            output.AddCanvas(c1, title="summary")
+
+    print
+    return c1
+
+
+if __name__ == "__main__":
+    StandardProfileInspectorDemo()
@@ -4,63 +4,75 @@
 # author: Kyle Cranmer & Wouter Verkerke
 # date May 2010
 #
+# The numerical integration of the averaged model takes seconds per point.
+# For a uniform (or Gamma) prior on b hybrid_pvalue computes the same
+# p-value in closed form, for many points at once.
 #
 ####################################/
 
-#ifndef __CINT__
-#include "RooGlobalFunc.h"
-#endif
-#include "RooRealVar.h"
-#include "RooProdPdf.h"
-#include "RooWorkspace.h"
-#include "RooDataSet.h"
-#include "TCanvas.h"
-#include "TH1.h"
 
 import ROOT
-using namespace ROOT.RooStats
+import numpy as np
 
-def Zbi_Zgamma(self):
-  # Make model for prototype on/off problem
-  # Pois(x | s+b) * Pois(y | tau b )
-  # for Z_Gamma, uniform prior on b.
-  w = ROOT.RooWorkspace("w",True)
-  w.factory("Poisson.px(x[150,0,500],sum.splusb(s[0,0,100],b[100,0,300]))")
-  w.factory("Poisson.py(y[100,0,500],prod.taub(tau[1.],b))")
-  w.factory("Uniform.prior_b(b)")
+import number_counting
+from hybrid_pvalue import HybridPValueEngine
 
-  # construct the Bayesian-averaged model (eg. a projection pdf)
-  # p'(x|s) = \int db p(x|s+b) * [ p(y|b) * prior(b) ]
-  w.factory("PROJ.averagedModel(PROD.foo(px|b,py,prior_b),b)") 
 
-  # plot it, is averaged model, is b known exactly
-  frame = w.var("x").frame() 
-  w.pdf("averagedModel").plotOn(frame) 
-  w.pdf("px").plotOn(frame, ROOT.RooFit.LineColor(ROOT.kRed)) 
-  frame.Draw() 
+def Zbi_Zgamma():
+    # Make model for prototype on/off problem
+    # Pois(x | s+b) * Pois(y | tau b )
+    # for Z_Gamma, use uniform prior on b.
+    w = ROOT.RooWorkspace("w", True)
+    w.factory("Poisson::px(x[150,0,500],sum::splusb(s[0,0,100],b[100,0,300]))")
+    w.factory("Poisson::py(y[100,0,500],prod::taub(tau[1.],b))")
+    w.factory("Uniform::prior_b(b)")
 
-  # compare analytic calculation of Z_Bi
-  # with the numerical ROOT.RooFit implementation of Z_Gamma
-  # for an example x = 150, y = 100
+    # construct the Bayesian-averaged model (eg. a projection pdf)
+    # p'(x|s) = \int db p(x|s+b) * [ p(y|b) * prior(b) ]
+    w.factory("PROJ::averagedModel(PROD::foo(px|b,py,prior_b),b)")
 
-  # numeric ROOT.RooFit Z_Gamma
-  w.var("y").setVal(100)
-  w.var("x").setVal(150)
-  cdf = w.pdf("averagedModel").createCdf(*w.var("x"))
-  cdf.getVal(); # get ugly print messages out of the way
+    # plot it, blue is averaged model, red is b known exactly
+    frame = w.var("x").frame()
+    w.pdf("averagedModel").plotOn(frame)
+    w.pdf("px").plotOn(frame, ROOT.RooFit.LineColor(ROOT.kRed))
+    frame.Draw()
 
-  cout << "Hybrid p-value = " << cdf.getVal() << endl
-  cout << "Significance = " <<
-    PValueToSignificance(1-cdf.getVal()) << endl
+    # compare analytic calculation of Z_Bi
+    # with the numerical RooFit implementation of Z_Gamma
+    # for an example with x = 150, y = 100
 
-  # analytic Z_Bi
-  Z_Bi = NumberCountingUtils.BinomialWithTauObsZ(150, 100, 1)
-  std.cout << "Z_Bi significance estimation: " << Z_Bi << std.endl
+    # numeric RooFit Z_Gamma
+    w.var("y").setVal(100)
+    w.var("x").setVal(150)
+    cdf = w.pdf("averagedModel").createCdf(ROOT.RooArgSet(w.var("x")))
+    cdf.getVal()  # get ugly print messages out of the way
 
-  # OUTPUT
-  # Hybrid p-value = 0.999058
-  # Significance = 3.10804
-  # Z_Bi significance estimation: 3.10804
+    print "Hybrid p-value = ", cdf.getVal()
+    print "Z_Gamma Significance  = ", ROOT.RooStats.PValueToSignificance(1 - cdf.getVal())
 
+    # analytic Z_Bi
+    Z_Bi = ROOT.RooStats.NumberCountingUtils.BinomialWithTauObsZ(150, 100, 1)
+    print "Z_Bi significance estimation: ", Z_Bi
 
+    # closed form Z_Gamma, the engine detects that the averaged model is
+    # negative binomial
+    engine = HybridPValueEngine(w, "px", "x", "b", ["py", "prior_b"], auxObservableName="y")
+    p = engine.PValue(150)
+    print "closed form (analytic = %s) hybrid p-value = %g  Z_Gamma = %g" % (
+        engine.analytic, 1 - p, number_counting.PValueToSignificance(p))
 
+    # and for a grid of x and y values in one call
+    xValues = np.arange(120, 181, 10)
+    yValues = np.array([80., 100., 120.])
+    zScan = number_counting.PValueToSignificance(engine.PValue(xValues[:, np.newaxis], yValues))
+    for y, zValues in zip(yValues, zScan.T):
+        print "y =", y, "  Z_Gamma for x in", xValues[0], "...", xValues[-1], ":", np.round(zValues, 3)
+
+    # OUTPUT
+    # Hybrid p-value = 0.999058
+    # Z_Gamma Significance  = 3.10804
+    # Z_Bi significance estimation: 3.10804
+
+
+if __name__ == "__main__":
+    Zbi_Zgamma()
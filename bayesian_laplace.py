@@ -0,0 +1,222 @@
+# /
+#
+# Laplace approximation of the marginal posterior
+#
+# With dozens of nuisance parameters (HistFactory models) the numerical
+# integration of BayesianCalculator is too slow, and
+# StandardBayesianNumericalDemo can only narrow the nuisance ranges
+# (nSigmaNuisance) after a Hesse fit.  Here the nuisance parameters are
+# integrated with the Laplace approximation: at every POI value the
+# likelihood is maximized over the nuisance parameters and approximated by
+# a Gaussian around the conditional maximum,
+#
+#   log p(poi) = -f_min(poi) + 1/2 log det(cov(poi)) + const
+#
+# where f = nll - log prior is minimized over the nuisance parameters and
+# cov is the covariance matrix of f from Hesse.  The prior is part of the
+# integrand, so it can depend on the nuisance parameters as well as on the
+# POI.  The conditional fits are made from the best fit outwards, each
+# starting from the nuisance values of the neighbouring POI value, so a fit
+# costs only a few iterations.
+#
+# Optionally the approximation is corrected by importance sampling, which
+# makes the marginal exact up to the sampling error for non-Gaussian
+# likelihoods.  The samples are drawn from a Student's t distribution with
+# the mean and covariance of the fit, whose tails are heavier than those
+# of the Gaussian for skewed nuisance parameters, and the same samples are
+# used at all the POI values:
+#
+#   poiValues, density, info = ScanLaplacePosterior(modelConfig, data, nScanPoints=100,
+#                                                   nImportanceSamples=200)
+#   lower, upper = PosteriorInterval(poiValues, density, 0.95)
+#
+# /
+
+
+import ROOT
+import numpy as np
+from scipy.special import gammaln
+
+from bayesian_scan import ScanPoints
+
+# degrees of freedom of the Student's t importance sampling distribution
+PROPOSAL_DOF = 4
+
+
+def _ConditionalFit(nll, nuisances, strategy, printLevel):
+    '''
+    Minimize nll over the floating nuisance parameters and run Hesse.
+    Returns the minimum, the fitted values and covariance matrix (in the
+    order of nuisances) and the fit status.
+    '''
+    minimizer = ROOT.RooMinimizer(nll)
+    minimizer.setPrintLevel(printLevel)
+    minimizer.setStrategy(strategy)
+    status = minimizer.minimize(ROOT.Math.MinimizerOptions.DefaultMinimizerType(),
+                                ROOT.Math.MinimizerOptions.DefaultMinimizerAlgo())
+    minimizer.hesse()
+    result = minimizer.save()
+    ROOT.SetOwnership(result, True)
+
+    floating = result.floatParsFinal()
+    names = [floating.at(i).GetName() for i in range(floating.getSize())]
+    order = [names.index(p.GetName()) for p in nuisances]
+    matrix = result.covarianceMatrix()
+    covariance = np.array([[matrix(i, j) for j in order] for i in order])
+    values = np.array([p.getVal() for p in nuisances])
+    return result.minNll(), values, covariance, status
+
+
+def _ImportanceSample(nll, nuisances, mean, covariance, z, logQ):
+    '''
+    Log of the integral of exp(-nll) over the nuisance parameters, by
+    importance sampling from the Student's t distribution centred at mean
+    with scale matrix covariance.  z are the standardized samples and logQ
+    their log density, the same for all the POI values.
+    '''
+    lows = np.array([p.getMin() for p in nuisances])
+    highs = np.array([p.getMax() for p in nuisances])
+    cholesky = np.linalg.cholesky(covariance)
+    logDet = 2. * np.log(np.diag(cholesky)).sum()
+
+    logWeights = np.full(len(z), -np.inf)
+    samples = mean + z.dot(cholesky.T)
+    for k, x in enumerate(samples):
+        if np.any(x < lows) or np.any(x > highs):
+            continue
+        for p, value in zip(nuisances, x):
+            p.setVal(value)
+        logWeights[k] = -nll.getVal() - (logQ[k] - 0.5 * logDet)
+    for p, value in zip(nuisances, mean):
+        p.setVal(value)
+
+    maxLog = logWeights.max()
+    if not np.isfinite(maxLog):
+        return -np.inf
+    return maxLog + np.log(np.exp(logWeights - maxLog).mean())
+
+
+def _StudentTSamples(nSamples, dim, rng):
+    '''
+    nSamples standardized samples of the dim-dimensional Student's t
+    distribution with PROPOSAL_DOF degrees of freedom and their log density.
+    '''
+    nu = float(PROPOSAL_DOF)
+    z = rng.standard_normal((nSamples, dim)) / np.sqrt(rng.chisquare(nu, nSamples) / nu)[:, np.newaxis]
+    logQ = (gammaln(0.5 * (nu + dim)) - gammaln(0.5 * nu) - 0.5 * dim * np.log(nu * np.pi)
+            - 0.5 * (nu + dim) * np.log1p((z ** 2).sum(axis=1) / nu))
+    return z, logQ
+
+
+def LaplaceMarginalPosterior(nll, poi, nuisances, poiValues, prior=None,
+                             nImportanceSamples=0, seed=None, strategy=0, printLevel=-1):
+    '''
+    Marginal posterior of the RooRealVar poi at the sorted poiValues with
+    the Laplace approximation over the list of RooRealVars nuisances.
+    With nImportanceSamples > 0 each point is corrected by importance
+    sampling from a Student's t distribution with the mean and covariance
+    of its conditional fit, using the same standardized samples at all
+    the points.  prior is an optional pdf of the POI and the nuisance
+    parameters (a flat prior otherwise), multiplied with the likelihood
+    inside the integral.
+
+    Returns the log of the unnormalized posterior and a dict with the
+    Laplace and importance sampled log integrals, the conditional fit
+    status and the number of NLL evaluations of the sampling.
+    '''
+    if prior:
+        # the prior is integrated with the likelihood
+        negLogPrior = ROOT.RooFormulaVar("negLogPrior", "-log(TMath::Max(@0, 1e-300))",
+                                         ROOT.RooArgList(prior))
+        nll = ROOT.RooAddition("nllWithPrior", "", ROOT.RooArgList(nll, negLogPrior))
+    poiValues = np.asarray(poiValues, dtype=float)
+    nPoints = len(poiValues)
+    dim = len(nuisances)
+    rng = np.random.RandomState(seed)
+    if nImportanceSamples > 0:
+        # common samples, so that the sampling errors of neighbouring points
+        # are correlated and do not make the posterior ragged
+        z, logQ = _StudentTSamples(nImportanceSamples, dim, rng)
+    logLaplace = np.full(nPoints, -np.inf)
+    logSampled = np.full(nPoints, np.nan)
+    status = np.zeros(nPoints, dtype=int)
+
+    wasConstant = poi.isConstant()
+    # unconditional fit to start from the best fit POI value
+    minimizer = ROOT.RooMinimizer(nll)
+    minimizer.setPrintLevel(printLevel)
+    minimizer.minimize(ROOT.Math.MinimizerOptions.DefaultMinimizerType(),
+                       ROOT.Math.MinimizerOptions.DefaultMinimizerAlgo())
+    bestFit = np.array([p.getVal() for p in nuisances])
+    start = int(np.argmin(np.abs(poiValues - poi.getVal())))
+
+    poi.setConstant(True)
+    # outwards from the best fit, warm started from the previous point
+    for order in (range(start, nPoints), range(start - 1, -1, -1)):
+        for p, value in zip(nuisances, bestFit):
+            p.setVal(value)
+        for i in order:
+            poi.setVal(poiValues[i])
+            if dim == 0:
+                logLaplace[i] = -nll.getVal()
+                continue
+            nllMin, values, covariance, status[i] = _ConditionalFit(nll, nuisances,
+                                                                    strategy, printLevel)
+            sign, logDet = np.linalg.slogdet(covariance)
+            if sign <= 0:
+                status[i] = -1
+                continue
+            logLaplace[i] = -nllMin + 0.5 * logDet + 0.5 * dim * np.log(2. * np.pi)
+            if nImportanceSamples > 0:
+                logSampled[i] = _ImportanceSample(nll, nuisances, values, covariance, z, logQ)
+    poi.setConstant(wasConstant)
+
+    if nImportanceSamples > 0 and dim > 0:
+        logPosterior = logSampled.copy()
+    else:
+        logPosterior = logLaplace.copy()
+    info = {"logLaplace": logLaplace, "logImportanceSampled": logSampled, "status": status,
+            "nSampledEvaluations": nPoints * nImportanceSamples}
+    return logPosterior, info
+
+
+def ScanLaplacePosterior(modelConfig, data, nScanPoints=100, nImportanceSamples=0,
+                         poiRange=None, seed=None):
+    '''
+    Scan the marginal posterior of the parameter of interest of modelConfig
+    with the Laplace approximation, at the centres of nScanPoints bins of
+    poiRange.  Returns the POI values, the posterior density normalized on
+    them and the info dict of LaplaceMarginalPosterior.
+    '''
+    poi = modelConfig.GetParametersOfInterest().first()
+    if poiRange is None:
+        poiRange = (poi.getMin(), poi.getMax())
+    poiValues = ScanPoints(poiRange, nScanPoints)
+
+    nuisanceSet = ROOT.RooArgSet()
+    if modelConfig.GetNuisanceParameters():
+        nuisanceSet.add(modelConfig.GetNuisanceParameters())
+    ROOT.RooStats.RemoveConstantParameters(nuisanceSet)
+    nuisances = [p for p in ROOT.RooArgList(nuisanceSet)]
+
+    nllOptions = [ROOT.RooFit.Constrain(nuisanceSet)]
+    if modelConfig.GetGlobalObservables():
+        nllOptions.append(ROOT.RooFit.GlobalObservables(modelConfig.GetGlobalObservables()))
+    nll = modelConfig.GetPdf().createNLL(data, *nllOptions)
+
+    # leave the parameters as they were
+    parameters = ROOT.RooArgSet(nuisanceSet)
+    parameters.add(poi)
+    saved = parameters.snapshot()
+    logPosterior, info = LaplaceMarginalPosterior(nll, poi, nuisances, poiValues,
+                                                  modelConfig.GetPriorPdf(),
+                                                  nImportanceSamples, seed)
+    parameters.assignValueOnly(saved)
+
+    finite = np.isfinite(logPosterior)
+    density = np.zeros(nScanPoints)
+    density[finite] = np.exp(logPosterior[finite] - logPosterior[finite].max())
+    total = density.sum() * (poiValues[1] - poiValues[0])
+    if total > 0:
+        density /= total
+    return poiValues, density, info
@@ -0,0 +1,129 @@
+# /
+#
+# Quasi-Monte Carlo integration of nuisance parameters
+#
+# BayesianCalculator marginalizes the nuisance parameters with adaptive
+# integration, or with plain Monte Carlo ("TOYMC") or Vegas, and needs
+# nToys = 10000 or more points per POI value.  Here the nuisance
+# parameters are integrated with scrambled Sobol sequences, whose error
+# falls close to 1/N instead of 1/sqrt(N) for smooth likelihoods.  A few
+# independently scrambled replicas of the sequence give an error estimate
+# of the integral; the default of 4 replicas of 1024 points is 4096
+# evaluations per POI value.  For a Gaussian likelihood with two Gaussian
+# constrained nuisance parameters (tests/test_bayesian_qmc.py) their error
+# on the marginal posterior is about 0.2% of its peak, against about 1.3%
+# for 10000 plain Monte Carlo points.  The points are generated once and
+# reused for all the POI values of the scan, so the posterior is also
+# smooth as a function of the POI.
+#
+#   poiValues, density, error = ScanQMCPosterior(modelConfig, data, nScanPoints=100)
+#   lower, upper = PosteriorInterval(poiValues, density, 0.95)
+#
+# The nuisance parameters are integrated over their ranges with the
+# constraint terms of the model and the prior, as for BayesianCalculator.
+# scipy >= 1.7 is needed for scipy.stats.qmc.
+#
+# /
+
+
+import ROOT
+import numpy as np
+from scipy.stats import qmc
+
+from bayesian_scan import ScanPoints
+
+
+def SobolReplicas(lows, highs, nPoints=1024, nReplicas=4, seed=None):
+    '''
+    nReplicas independently scrambled Sobol point sets of nPoints points
+    (rounded up to a power of 2) in the box [lows, highs].  Returns an
+    array of shape (nReplicas, nPoints, dim).
+    '''
+    dim = len(lows)
+    m = int(np.ceil(np.log2(nPoints)))
+    rng = np.random.RandomState(seed)
+    replicas = []
+    for i in range(nReplicas):
+        sampler = qmc.Sobol(dim, scramble=True, seed=rng.randint(2 ** 31))
+        replicas.append(qmc.scale(sampler.random_base2(m), lows, highs))
+    return np.array(replicas)
+
+
+def QMCMarginalPosterior(nll, poi, nuisances, poiValues, prior=None, nPoints=1024,
+                         nReplicas=4, seed=None):
+    '''
+    Marginal posterior of the RooRealVar poi at poiValues, integrating
+    exp(-nll) over the list of RooRealVars nuisances with the same
+    scrambled Sobol points for all POI values.  prior is an optional pdf
+    of the POI and the nuisance parameters (a flat prior otherwise),
+    multiplied with the likelihood at every point of the integral.
+
+    Returns the unnormalized posterior and its error from the spread of
+    the replicas.
+    '''
+    lows = np.array([p.getMin() for p in nuisances])
+    highs = np.array([p.getMax() for p in nuisances])
+    points = SobolReplicas(lows, highs, nPoints, nReplicas, seed)
+
+    # all NLL values first, so that the same offset is used for all the
+    # POI values when taking the exponential, with -log prior added
+    nllValues = np.empty((len(poiValues),) + points.shape[:2])
+    for i, poiValue in enumerate(poiValues):
+        poi.setVal(poiValue)
+        for r in range(nReplicas):
+            for j, x in enumerate(points[r]):
+                for p, value in zip(nuisances, x):
+                    p.setVal(value)
+                nllValues[i, r, j] = nll.getVal()
+                if prior:
+                    nllValues[i, r, j] -= np.log(max(prior.getVal(), 1e-300))
+
+    finite = np.isfinite(nllValues)
+    nllMin = nllValues[finite].min()
+    likelihood = np.where(finite, np.exp(-(nllValues - nllMin)), 0.)
+    replicaMeans = likelihood.mean(axis=2)
+    density = replicaMeans.mean(axis=1)
+    if nReplicas > 1:
+        error = replicaMeans.std(axis=1, ddof=1) / np.sqrt(nReplicas)
+    else:
+        error = np.full(len(poiValues), np.nan)
+    return density, error
+
+
+def ScanQMCPosterior(modelConfig, data, nScanPoints=100, nPoints=1024, nReplicas=4,
+                     poiRange=None, seed=None):
+    '''
+    Scan the marginal posterior of the parameter of interest of modelConfig
+    at the centres of nScanPoints bins of poiRange.  Returns the POI values
+    and the posterior density and its error normalized on them, as
+    bayesian_scan.ScanPosterior.
+    '''
+    poi = modelConfig.GetParametersOfInterest().first()
+    if poiRange is None:
+        poiRange = (poi.getMin(), poi.getMax())
+    poiValues = ScanPoints(poiRange, nScanPoints)
+
+    nuisanceSet = ROOT.RooArgSet()
+    if modelConfig.GetNuisanceParameters():
+        nuisanceSet.add(modelConfig.GetNuisanceParameters())
+    ROOT.RooStats.RemoveConstantParameters(nuisanceSet)
+    nuisances = [p for p in ROOT.RooArgList(nuisanceSet)]
+
+    nllOptions = [ROOT.RooFit.Constrain(nuisanceSet)]
+    if modelConfig.GetGlobalObservables():
+        nllOptions.append(ROOT.RooFit.GlobalObservables(modelConfig.GetGlobalObservables()))
+    nll = modelConfig.GetPdf().createNLL(data, *nllOptions)
+
+    # leave the parameters as they were
+    parameters = ROOT.RooArgSet(nuisanceSet)
+    parameters.add(poi)
+    saved = parameters.snapshot()
+    density, error = QMCMarginalPosterior(nll, poi, nuisances, poiValues,
+                                          modelConfig.GetPriorPdf(), nPoints, nReplicas, seed)
+    parameters.assignValueOnly(saved)
+
+    total = density.sum() * (poiValues[1] - poiValues[0])
+    if total > 0:
+        density = density / total
+        error = error / total
+    return poiValues, density, error
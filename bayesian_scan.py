@@ -0,0 +1,253 @@
+# /
+#
+# Parallel scan of the posterior of BayesianCalculator
+#
+# BayesianCalculator.SetScanOfPosterior(nScanPoints) evaluates the
+# marginal posterior of the parameter of interest point after point, and
+# every point is a numerical integral over all the nuisance parameters.
+# StandardBayesianNumericalDemo therefore keeps nScanPoints at 20.
+#
+# Here the scan points are distributed over worker processes.  Every worker
+# reads the workspace from the ROOT file once, builds its own
+# BayesianCalculator and evaluates GetPosteriorFunction() at its share of
+# the points.  The posterior is then normalized on the scan grid and the
+# interval and the plot are made from it:
+#
+#   interval, plot = RunParallelBayesianScan("ws.root", "combined", "ModelConfig",
+#                                            "obsData", nScanPoints=200)
+#   print interval.LowerLimit(), interval.UpperLimit()
+#   plot.Draw()
+#
+# /
+
+
+import multiprocessing
+import os
+
+import ROOT
+import numpy as np
+
+from density_grid import GridInterval
+
+# state of a worker process, set by _InitWorker
+_worker = {}
+
+
+class BayesianSetup(object):
+    '''
+    Options of the BayesianCalculator of every worker.  priorName is the
+    name of a prior pdf in the workspace to use instead of the prior of the
+    ModelConfig, integrationType and nToys are passed to
+    SetIntegrationType and SetNumIters.
+    '''
+
+    def __init__(self, priorName=None, integrationType="", nToys=10000):
+        self.priorName = priorName
+        self.integrationType = integrationType
+        self.nToys = nToys
+
+    def Key(self):
+        return (self.priorName, self.integrationType, self.nToys)
+
+    def __call__(self, calculator, w, modelConfig, data):
+        if self.priorName is not None:
+            calculator.SetPriorPdf(w.pdf(self.priorName))
+        if self.integrationType:
+            calculator.SetIntegrationType(self.integrationType)
+            calculator.SetNumIters(self.nToys)
+        if "TOYMC" in self.integrationType:
+            nuisancePdf = ROOT.RooStats.MakeNuisancePdf(modelConfig, "nuisance_pdf")
+            calculator.ForceNuisancePdf(nuisancePdf)
+            return nuisancePdf
+        return None
+
+
+class PosteriorCache(object):
+    '''
+    Scanned posteriors, as (poiValues, density), keyed by the inputs of
+    the scan, see ScanPosterior.
+    '''
+
+    def __init__(self):
+        self.grids = {}
+
+    def Get(self, key, scan):
+        '''
+        Return the posterior stored for key, calling scan() to compute it
+        the first time.
+        '''
+        if key not in self.grids:
+            self.grids[key] = scan()
+        return self.grids[key]
+
+    def Clear(self):
+        self.grids.clear()
+
+
+def ScanCalculatorPosterior(calculator, poi, nScanPoints=100, poiRange=None):
+    '''
+    Evaluate the posterior function of an existing BayesianCalculator at
+    the centres of nScanPoints bins of poiRange, in this process.  Returns
+    the POI values and the normalized density, as ScanPosterior.
+    '''
+    if poiRange is None:
+        poiRange = (poi.getMin(), poi.getMax())
+    poiValues = ScanPoints(poiRange, nScanPoints)
+    posterior = calculator.GetPosteriorFunction()
+    density = np.empty(nScanPoints)
+    for i, value in enumerate(poiValues):
+        poi.setVal(value)
+        density[i] = posterior.getVal()
+    return poiValues, _Normalize(poiValues, density)
+
+
+def ScanPoints(poiRange, nScanPoints):
+    '''
+    POI values of a scan: the centres of nScanPoints bins of poiRange.
+    '''
+    width = (poiRange[1] - poiRange[0]) / float(nScanPoints)
+    return poiRange[0] + width * (np.arange(nScanPoints) + 0.5)
+
+
+def _Normalize(poiValues, density):
+    total = density.sum() * (poiValues[1] - poiValues[0])
+    if total > 0:
+        density = density / total
+    return density
+
+
+def _InitWorker(fileName, workspaceName, modelConfigName, dataName, setup, poiRange):
+    ROOT.gROOT.SetBatch(True)
+    ROOT.RooMsgService.instance().setGlobalKillBelow(ROOT.RooFit.WARNING)
+    inputFile = ROOT.TFile.Open(fileName)
+    w = inputFile.Get(workspaceName)
+    modelConfig = w.obj(modelConfigName)
+    data = w.data(dataName)
+    poi = modelConfig.GetParametersOfInterest().first()
+    # the same range as the main process, so that the posterior
+    # functions of all workers are normalized in the same way
+    poi.setRange(poiRange[0], poiRange[1])
+
+    calculator = ROOT.RooStats.BayesianCalculator(data, modelConfig)
+    keepAlive = None
+    if setup is not None:
+        keepAlive = setup(calculator, w, modelConfig, data)
+    posterior = calculator.GetPosteriorFunction()
+    _worker.update(file=inputFile, workspace=w, calculator=calculator,
+                   keepAlive=keepAlive, poi=poi, posterior=posterior)
+
+
+def _EvaluatePosterior(poiValue):
+    _worker["poi"].setVal(poiValue)
+    return _worker["posterior"].getVal()
+
+
+def ScanPosterior(fileName, workspaceName, modelConfigName, dataName,
+                  nScanPoints=200, setup=None, nWorkers=None, poiRange=None, cache=None):
+    '''
+    Evaluate the marginal posterior of the parameter of interest at the
+    centres of nScanPoints bins of poiRange (by default the range of the
+    parameter), in nWorkers processes.  With a PosteriorCache a scan with
+    the same inputs is done only once.
+
+    Returns the POI values and the posterior density normalized on them.
+    '''
+    if cache is not None:
+        setupKey = setup.Key() if setup is not None else None
+        # the prior and the nuisance parameters are defined by the
+        # workspace in the file and the setup
+        key = (fileName, os.path.getmtime(fileName), workspaceName, modelConfigName,
+               dataName, setupKey, nScanPoints, poiRange)
+        return cache.Get(key, lambda: ScanPosterior(fileName, workspaceName, modelConfigName,
+                                                    dataName, nScanPoints, setup, nWorkers,
+                                                    poiRange))
+    if nWorkers is None:
+        nWorkers = multiprocessing.cpu_count()
+    if poiRange is None:
+        inputFile = ROOT.TFile.Open(fileName)
+        poi = inputFile.Get(workspaceName).obj(modelConfigName).GetParametersOfInterest().first()
+        poiRange = (poi.getMin(), poi.getMax())
+        inputFile.Close()
+
+    poiValues = ScanPoints(poiRange, nScanPoints)
+
+    pool = multiprocessing.Pool(nWorkers, _InitWorker,
+                                (fileName, workspaceName, modelConfigName, dataName,
+                                 setup, poiRange))
+    try:
+        # small chunks keep the workers balanced when some points are
+        # much slower to integrate than others
+        density = np.array(pool.map(_EvaluatePosterior, poiValues, chunksize=1))
+    finally:
+        pool.close()
+        pool.join()
+
+    return poiValues, _Normalize(poiValues, density)
+
+
+def PosteriorInterval(poiValues, density, confidenceLevel=0.95, leftSideTailFraction=0.5,
+                      shortest=False):
+    '''
+    Interval from a scanned posterior.  As for BayesianCalculator the
+    default is the central interval, leftSideTailFraction=0 gives an upper
+    limit and shortest=True the shortest interval.
+    '''
+    if shortest:
+        leftSideTailFraction = -1.
+    return GridInterval(poiValues, density, confidenceLevel, leftSideTailFraction)
+
+
+def MakePosteriorPlot(poi, poiValues, density, limits=None):
+    '''
+    RooPlot of the scanned posterior of the RooRealVar poi, with the
+    interval limits shaded if given.
+    '''
+    plot = poi.frame()
+    plot.SetTitle("Posterior probability of parameter \"%s\"" % poi.GetName())
+    plot.GetYaxis().SetTitle("posterior function")
+
+    if limits is not None:
+        inside = (poiValues >= limits[0]) & (poiValues <= limits[1])
+        x = np.concatenate([[limits[0]], poiValues[inside], [limits[1]]])
+        y = np.interp(x, poiValues, density)
+        band = ROOT.TGraph(len(x) + 2, np.concatenate([[x[0]], x, [x[-1]]]),
+                           np.concatenate([[0.], y, [0.]]))
+        band.SetFillColor(ROOT.kGreen)
+        band.SetLineColor(ROOT.kGreen)
+        plot.addObject(band, "F")
+        ROOT.SetOwnership(band, False)
+
+    curve = ROOT.TGraph(len(poiValues), np.asarray(poiValues, dtype=float),
+                        np.asarray(density, dtype=float))
+    curve.SetLineColor(ROOT.kBlue)
+    curve.SetLineWidth(2)
+    plot.addObject(curve, "L")
+    # the plot owns the graphs
+    ROOT.SetOwnership(curve, False)
+    plot.SetMaximum(1.1 * density.max())
+    return plot
+
+
+def RunParallelBayesianScan(fileName, workspaceName, modelConfigName, dataName,
+                            nScanPoints=200, setup=None, nWorkers=None, poiRange=None,
+                            confidenceLevel=0.95, leftSideTailFraction=0.5, shortest=False,
+                            cache=None):
+    '''
+    Scan the posterior in parallel and return the SimpleInterval on the
+    parameter of interest and the RooPlot of the posterior.
+    '''
+    poiValues, density = ScanPosterior(fileName, workspaceName, modelConfigName, dataName,
+                                       nScanPoints, setup, nWorkers, poiRange, cache)
+    lower, upper = PosteriorInterval(poiValues, density, confidenceLevel,
+                                     leftSideTailFraction, shortest)
+
+    # the workspace read from the file keeps the parameter alive
+    inputFile = ROOT.TFile.Open(fileName)
+    w = inputFile.Get(workspaceName)
+    poi = w.obj(modelConfigName).GetParametersOfInterest().first()
+    if poiRange is not None:
+        poi.setRange(poiRange[0], poiRange[1])
+    interval = ROOT.RooStats.SimpleInterval("BayesianInterval_a", poi, lower, upper,
+                                            confidenceLevel)
+    plot = MakePosteriorPlot(poi, poiValues, density, (lower, upper))
+    return interval, plot
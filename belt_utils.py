@@ -0,0 +1,151 @@
+# /
+#
+# Confidence belt utilities
+#
+# Once a ConfidenceBelt has been built (eg. by FeldmanCousins or a
+# NeymanConstruction with CreateConfBelt(True)) the acceptance region
+# of every scanned parameter point is known.  The interval for any
+# further dataset only needs the value of the test statistic at each of
+# those points, so there is no need to create a new FeldmanCousins object
+# and throw the toys again.
+#
+# The functions below read the belt thresholds once into arrays and
+# evaluate many datasets against them in a single pass:
+#
+#   inInterval = GetIntervalsFromBelt(fc.GetConfidenceBelt(),
+#                                     fc.GetPointsToScan(),
+#                                     fc.GetTestStatSampler(),
+#                                     toyDatasets)
+#   lower, upper = GetIntervalLimits(fc.GetPointsToScan(), inInterval, "mu")
+#
+# /
+
+
+import ROOT
+import numpy as np
+
+from dataset_numpy import DataSetToArrays
+
+
+def GetBeltThresholds(belt, parameterScan):
+    '''
+    Return arrays with the lower and upper edge of the acceptance region
+    stored in the belt for every point of parameterScan.
+    '''
+    nPoints = parameterScan.numEntries()
+    lower = np.empty(nPoints)
+    upper = np.empty(nPoints)
+    for i in range(nPoints):
+        # no need to clone, belt only reads the values of the point
+        point = parameterScan.get(i)
+        lower[i] = belt.GetAcceptanceRegionMin(point)
+        upper[i] = belt.GetAcceptanceRegionMax(point)
+    return lower, upper
+
+
+def GetParameterValues(parameterScan, name):
+    '''
+    Return an array with the values of parameter name at every scanned point.
+    '''
+    return DataSetToArrays(parameterScan, [name])[name]
+
+
+def EvaluateTestStatistics(testStatSampler, datasets, parameterScan, observables=None):
+    '''
+    Evaluate the test statistic of testStatSampler for every dataset at every
+    point of parameterScan.  Returns an array of shape (nDatasets, nPoints).
+
+    datasets can be an iterable of RooAbsData, or an array of shape
+    (nDatasets, nObservables) of observed values.  In the latter case
+    observables must be given and each row is evaluated as a dataset with a
+    single entry (eg. the number counting form).
+    '''
+    nPoints = parameterScan.numEntries()
+
+    if observables is not None:
+        values = np.atleast_2d(np.asarray(datasets, dtype=float))
+        # one scratch dataset that is refilled for every row
+        obsList = ROOT.RooArgList(observables)
+        scratch = ROOT.RooDataSet("beltScratchData", "", observables)
+
+        def _datasets():
+            for row in values:
+                scratch.reset()
+                for j in range(obsList.getSize()):
+                    obsList.at(j).setVal(row[j])
+                scratch.add(observables)
+                yield scratch
+
+        source = _datasets()
+        nDatasets = len(values)
+    else:
+        source = list(datasets)
+        nDatasets = len(source)
+
+    stats = np.empty((nDatasets, nPoints))
+    # the points are held fixed, only the data change.
+    # Cache the points once as the sampler may modify the parameters.
+    points = [parameterScan.get(i).snapshot() for i in range(nPoints)]
+    for iData, data in enumerate(source):
+        for iPoint, point in enumerate(points):
+            stats[iData, iPoint] = testStatSampler.EvaluateTestStatistic(data, point)
+    return stats
+
+
+def GetIntervalsFromBelt(belt, parameterScan, testStatSampler, datasets, observables=None):
+    '''
+    Evaluate many datasets against an existing confidence belt.
+
+    Returns a boolean array of shape (nDatasets, nPoints) which is True where
+    the scanned point is inside the interval for that dataset.
+    '''
+    lower, upper = GetBeltThresholds(belt, parameterScan)
+    stats = EvaluateTestStatistics(testStatSampler, datasets, parameterScan, observables)
+    # same acceptance rule as NeymanConstruction
+    return (stats >= lower) & (stats <= upper)
+
+
+def GetIntervalLimits(parameterScan, inInterval, name):
+    '''
+    Return arrays with the lower and upper limit on parameter name for every
+    row of inInterval.  Rows with an empty interval give NaN.
+    '''
+    values = GetParameterValues(parameterScan, name)
+    inInterval = np.atleast_2d(inInterval)
+    lower = np.where(inInterval, values, np.inf).min(axis=1)
+    upper = np.where(inInterval, values, -np.inf).max(axis=1)
+    empty = ~inInterval.any(axis=1)
+    lower[empty] = np.nan
+    upper[empty] = np.nan
+    return lower, upper
+
+
+def MakePointSetInterval(parameterScan, inIntervalRow, name="pointSetInterval", confidenceLevel=None):
+    '''
+    Build a PointSetInterval from one row of the membership array, eg. to use
+    IsInInterval or the interval plots as for the FeldmanCousins result.
+    '''
+    pointsInInterval = ROOT.RooDataSet(name + "_points", "", parameterScan.get())
+    for i in np.flatnonzero(inIntervalRow):
+        pointsInInterval.add(parameterScan.get(int(i)))
+    # the interval does not copy the points, keep them alive
+    ROOT.SetOwnership(pointsInInterval, False)
+    interval = ROOT.RooStats.PointSetInterval(name, pointsInInterval)
+    if confidenceLevel is not None:
+        interval.SetConfidenceLevel(confidenceLevel)
+    return interval
+
+
+def GetPointSetMembership(parameterScan, interval, names):
+    '''
+    Return a boolean array telling for every point of parameterScan if it is
+    in the PointSetInterval interval.  Equivalent to calling
+    interval.IsInInterval for each point, without the quadratic cost.
+    '''
+    scan = DataSetToArrays(parameterScan, names)
+    accepted = DataSetToArrays(interval.GetParameterPoints(), names)
+    # points in the interval are copies of the scanned points,
+    # so they can be compared exactly
+    acceptedPoints = set(zip(*[accepted[n] for n in names]))
+    return np.array([p in acceptedPoints for p in zip(*[scan[n] for n in names])],
+                    dtype=bool)
@@ -0,0 +1,164 @@
+# /
+#
+# Contours from scanned parameter points
+#
+# rs401d_FeldmanCousins draws the Feldman-Cousins contour by cloning a TH2,
+# filling 0/1 for every scanned point with SetBinContent(hist.FindBin(...))
+# and drawing it with "cont2".  Here the contour is instead extracted
+# directly from the arrays of scanned points with a vectorized marching
+# squares algorithm.  The field can be a 0/1 interval membership flag (use
+# level 0.5, as for the histogram) or any scalar field like a p-value or
+# -log(likelihood ratio), so the same code serves Feldman-Cousins,
+# profile likelihood and MCMC results, and any number of levels.
+#
+#   inInterval = GetPointSetMembership(parameterScan, interval, names)
+#   lines = GetContours(x, y, inInterval, [0.5])[0.5]
+#   graphs = MakeContourGraphs(lines)
+#
+# /
+
+
+import ROOT
+import numpy as np
+
+
+def GridFromPoints(x, y, values):
+    '''
+    Arrange scattered points of a rectangular scan on a grid.  Returns the
+    sorted x and y axis values and an array of shape (ny, nx) holding values,
+    with NaN where a grid point was not scanned.
+    '''
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    xAxis = np.unique(x)
+    yAxis = np.unique(y)
+    grid = np.full((len(yAxis), len(xAxis)), np.nan)
+    grid[np.searchsorted(yAxis, y), np.searchsorted(xAxis, x)] = np.asarray(values, dtype=float)
+    return xAxis, yAxis, grid
+
+
+def _EdgePoints(a, b, pa, pb, level):
+    # linear interpolation of the crossing point along an edge
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (level - a) / (b - a)
+    t = np.where(np.isfinite(t), np.clip(t, 0., 1.), 0.5)
+    return pa + t * (pb - pa)
+
+
+def MarchingSquares(xAxis, yAxis, grid, level):
+    '''
+    Return the contour of grid at level as a list of polylines, each an array
+    of shape (nPoints, 2).  Closed contours repeat their first point at the
+    end.  Cells with a NaN corner are skipped.
+    '''
+    xAxis = np.asarray(xAxis, dtype=float)
+    yAxis = np.asarray(yAxis, dtype=float)
+    f = np.asarray(grid, dtype=float)
+    ny, nx = f.shape
+    if nx < 2 or ny < 2:
+        return []
+    above = f >= level
+    X, Y = np.meshgrid(xAxis, yAxis)
+
+    # crossing points on all horizontal edges (j,i)-(j,i+1) and vertical
+    # edges (j,i)-(j+1,i).  Each edge is computed once so that neighbouring
+    # cells share exactly the same point.
+    hx = _EdgePoints(f[:, :-1], f[:, 1:], X[:, :-1], X[:, 1:], level)
+    vy = _EdgePoints(f[:-1, :], f[1:, :], Y[:-1, :], Y[1:, :], level)
+    hPoints = np.stack([hx, Y[:, :-1]], axis=-1).reshape(-1, 2)
+    vPoints = np.stack([X[:-1, :], vy], axis=-1).reshape(-1, 2)
+    points = np.concatenate([hPoints, vPoints])
+    nH = ny * (nx - 1)
+
+    # edge ids of every cell: bottom, right, top, left
+    j, i = np.mgrid[0:ny - 1, 0:nx - 1]
+    edgeIds = np.stack([j * (nx - 1) + i,
+                        nH + j * nx + i + 1,
+                        (j + 1) * (nx - 1) + i,
+                        nH + j * nx + i], axis=-1).reshape(-1, 4)
+
+    c00 = above[:-1, :-1].ravel()
+    c10 = above[:-1, 1:].ravel()
+    c11 = above[1:, 1:].ravel()
+    c01 = above[1:, :-1].ravel()
+    crossed = np.stack([c00 != c10, c10 != c11, c01 != c11, c00 != c01], axis=-1)
+    corners = np.stack([f[:-1, :-1], f[:-1, 1:], f[1:, 1:], f[1:, :-1]], axis=-1).reshape(-1, 4)
+    valid = np.isfinite(corners).all(axis=1)
+    nCrossed = crossed.sum(axis=1)
+
+    # cells with one segment: join the two crossed edges
+    simple = valid & (nCrossed == 2)
+    order = np.argsort(~crossed[simple], axis=1, kind="stable")[:, :2]
+    simpleIds = np.take_along_axis(edgeIds[simple], order, axis=1)
+
+    # saddle cells: decide the pairing from the value at the cell centre
+    saddle = valid & (nCrossed == 4)
+    centreAbove = corners[saddle].mean(axis=1) >= level
+    isolateOffDiagonal = centreAbove == c00[saddle]
+    saddleIds = edgeIds[saddle]
+    first = np.where(isolateOffDiagonal[:, None], saddleIds[:, [0, 1]], saddleIds[:, [0, 3]])
+    second = np.where(isolateOffDiagonal[:, None], saddleIds[:, [2, 3]], saddleIds[:, [2, 1]])
+
+    segments = np.concatenate([simpleIds, first, second])
+    return [points[ids] for ids in _JoinSegments(segments)]
+
+
+def _JoinSegments(segments):
+    # every edge is shared by at most two segments, walk along them
+    neighbours = {}
+    for iSeg, (a, b) in enumerate(segments.tolist()):
+        neighbours.setdefault(a, []).append(iSeg)
+        neighbours.setdefault(b, []).append(iSeg)
+
+    used = np.zeros(len(segments), dtype=bool)
+
+    def walk(edge, iSeg):
+        chain = []
+        while True:
+            used[iSeg] = True
+            a, b = segments[iSeg]
+            edge = b if a == edge else a
+            chain.append(edge)
+            nextSegs = [s for s in neighbours[edge] if not used[s]]
+            if not nextSegs:
+                return chain
+            iSeg = nextSegs[0]
+
+    lines = []
+    # open lines first start at the edges touched by a single segment
+    starts = [e for e, segs in neighbours.items() if len(segs) == 1]
+    for edge in starts:
+        iSeg = neighbours[edge][0]
+        if not used[iSeg]:
+            lines.append([edge] + walk(edge, iSeg))
+    # the remaining segments form closed loops
+    for iSeg in range(len(segments)):
+        if not used[iSeg]:
+            edge = int(segments[iSeg][0])
+            lines.append([edge] + walk(edge, iSeg))
+    return lines
+
+
+def GetContours(x, y, values, levels):
+    '''
+    Contours of a field given on scanned points (x[i], y[i]) for every level
+    in levels.  values can be 0/1 membership flags or a scalar field.
+    Returns a dict level -> list of polylines.
+    '''
+    xAxis, yAxis, grid = GridFromPoints(x, y, np.asarray(values, dtype=float))
+    return dict((level, MarchingSquares(xAxis, yAxis, grid, level)) for level in levels)
+
+
+def MakeContourGraphs(lines, color=ROOT.kRed, width=2):
+    '''
+    Make a TGraph for each polyline, ready to be drawn with "L SAME".
+    '''
+    graphs = []
+    for line in lines:
+        xs = np.ascontiguousarray(line[:, 0])
+        ys = np.ascontiguousarray(line[:, 1])
+        graph = ROOT.TGraph(len(line), xs, ys)
+        graph.SetLineColor(color)
+        graph.SetLineWidth(width)
+        graphs.append(graph)
+    return graphs
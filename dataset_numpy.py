@@ -0,0 +1,106 @@
+# /
+#
+# NumPy bridge for RooDataSet
+#
+# Many tutorials loop over the entries of a RooDataSet, eg. the points to
+# scan of a FeldmanCousins calculator or the Markov chain of an
+# MCMCInterval, doing
+#
+#   tmpPoint = parameterScan.get(i).clone("temp")
+#   x = tmpPoint.getRealValue("x")
+#
+# The clone and the per-entry calls dominate the run time once the dataset
+# has thousands of entries.  The functions below export the columns of a
+# dataset into a dict of NumPy arrays in a single copy (using the bulk
+# RooDataSet.to_numpy of recent ROOT versions when available) and import
+# such a dict back into a RooDataSet, so the loops become array operations.
+#
+# /
+
+
+import ROOT
+import numpy as np
+
+
+def DataSetToArrays(data, names=None, weightName="weight"):
+    '''
+    Return a dict of NumPy arrays with the columns of data.
+
+    names restricts the export to the given variables (default all of them).
+    For weighted datasets the event weights are added under weightName.
+    data can also be a RooDataHist, eg. the points to scan of a
+    FeldmanCousins calculator without nuisance parameters, whose bin
+    centres and weights are read entry by entry.
+    '''
+    if names is None:
+        names = [v.GetName() for v in ROOT.RooArgList(data.get())]
+
+    # RooDataHist.to_numpy returns the histogram (weights, edges), not the
+    # columns, and a RooDataHist has no weight variable
+    if data.InheritsFrom("RooDataSet") and hasattr(data, "to_numpy"):
+        # bulk copy of the vector store done in C++
+        arrays = data.to_numpy()
+        result = dict((n, np.asarray(arrays[n])) for n in names)
+        if data.isWeighted():
+            wName = data.weightVar().GetName() if data.weightVar() else None
+            if wName in arrays:
+                result[weightName] = np.asarray(arrays[wName])
+            else:
+                result[weightName] = _ReadWeights(data)
+        return result
+
+    # older ROOT: one pass over the entries, reading the values through the
+    # row that the dataset updates in place (no clone needed)
+    nEntries = data.numEntries()
+    row = data.get()
+    columns = [row.find(n) for n in names]
+    result = dict((n, np.empty(nEntries)) for n in names)
+    isWeighted = data.isWeighted()
+    if isWeighted:
+        result[weightName] = np.empty(nEntries)
+    for i in range(nEntries):
+        data.get(i)
+        for n, var in zip(names, columns):
+            result[n][i] = var.getVal()
+        if isWeighted:
+            result[weightName][i] = data.weight()
+    return result
+
+
+def _ReadWeights(data):
+    weights = np.empty(data.numEntries())
+    for i in range(data.numEntries()):
+        data.get(i)
+        weights[i] = data.weight()
+    return weights
+
+
+def ArraysToDataSet(arrays, variables, name="data", title="", weightName=None):
+    '''
+    Create a RooDataSet with the variables in the RooArgSet variables from a
+    dict of equal length NumPy arrays keyed by variable name.  If weightName
+    is given, that entry of arrays is used as the event weight.
+    '''
+    if hasattr(ROOT.RooDataSet, "from_numpy"):
+        return ROOT.RooDataSet.from_numpy(arrays, variables, name=name, title=title,
+                                          weight_name=weightName)
+
+    varList = ROOT.RooArgList(variables)
+    names = [varList.at(j).GetName() for j in range(varList.getSize())]
+    columns = [np.asarray(arrays[n], dtype=float) for n in names]
+    if weightName is not None:
+        weightVar = ROOT.RooRealVar(weightName, weightName, 1.)
+        allVars = ROOT.RooArgSet(variables, weightVar)
+        data = ROOT.RooDataSet(name, title, allVars, weightName)
+        weights = np.asarray(arrays[weightName], dtype=float)
+    else:
+        data = ROOT.RooDataSet(name, title, variables)
+    nEntries = len(columns[0]) if columns else 0
+    for i in range(nEntries):
+        for j in range(len(names)):
+            varList.at(j).setVal(columns[j][i])
+        if weightName is not None:
+            data.add(variables, weights[i])
+        else:
+            data.add(variables)
+    return data
@@ -0,0 +1,55 @@
+# /
+#
+# Intervals and highest density levels of densities on a grid
+#
+# The posterior of a parameter is often only known on a regular grid of
+# values: a scan of BayesianCalculator.GetPosteriorFunction() in
+# bayesian_scan, or a binned kernel density estimate of a Markov chain in
+# mcmc_kde.  The central, one-sided and shortest intervals and the level
+# of the highest density region are computed here from the grid alone,
+# with NumPy only:
+#
+#   lower, upper = GridInterval(poiValues, density, 0.95, leftSideTailFraction=0.5)
+#   level = HighestDensityLevel(density, 0.68)
+#
+# /
+
+
+import numpy as np
+
+
+def HighestDensityLevel(density, confidenceLevel):
+    '''
+    Density value above which the grid contains the fraction confidenceLevel
+    of the probability, ie. the level of the highest posterior density
+    region (the cutoff of MCMCInterval).
+    '''
+    values = np.sort(density.ravel())[::-1]
+    content = np.cumsum(values)
+    content /= content[-1]
+    return values[min(np.searchsorted(content, confidenceLevel), len(values) - 1)]
+
+
+def GridInterval(centres, density, confidenceLevel, leftSideTailFraction=-1.):
+    '''
+    Interval from a 1-d density on the bin centres of a regular grid.  With
+    leftSideTailFraction >= 0 the interval leaves that fraction of
+    (1 - confidenceLevel) on the left side (0.5 for central, 0 for an upper
+    limit), otherwise the shortest interval containing confidenceLevel is
+    returned.
+    '''
+    centres = np.asarray(centres)
+    width = centres[1] - centres[0]
+    if leftSideTailFraction >= 0:
+        edges = np.append(centres - 0.5 * width, centres[-1] + 0.5 * width)
+        cumulative = np.append(0., np.cumsum(density))
+        cumulative /= cumulative[-1]
+        alpha = 1. - confidenceLevel
+        lower = np.interp(alpha * leftSideTailFraction, cumulative, edges)
+        upper = np.interp(1. - alpha * (1. - leftSideTailFraction), cumulative, edges)
+        if leftSideTailFraction == 0:
+            lower = edges[0]
+        return lower, upper
+
+    inside = np.flatnonzero(density >= HighestDensityLevel(density, confidenceLevel))
+    return centres[inside.min()] - 0.5 * width, centres[inside.max()] + 0.5 * width
@@ -0,0 +1,232 @@
+# /
+#
+# Parallel variation plots of HistFactory models
+#
+# StandardHistFactoryPlotsWithCategories plots, for every channel of the
+# RooSimultaneous and every nuisance parameter, the data with the channel
+# pdf at the nominal value and at +-N sigma of the parameter: three plotOn
+# calls per pair, one pair after the other.  With hundreds of nuisance
+# parameters and tens of channels that takes hours.
+#
+# ParallelVariationPlots distributes the (category, nuisance parameter)
+# pairs over worker processes in batch mode.  Every worker reads its own
+# copy of the workspace from the ROOT file, optionally saves the canvas of
+# each of its pairs to a PDF file and writes the RooPlot to a ROOT file of
+# the worker.  The main process reads the plots back into memory in the
+# order of the pairs and removes these files, eg. to write the plots to a
+# multipage_pdf.MultiPagePdf:
+#
+#   pairs = VariationPairs(mc)
+#   plots = ParallelVariationPlots("ws.root", "combined", "ModelConfig", "obsData", pairs,
+#                                  nWorkers=8)
+#   for category, nuisance, pdfFileName, frame in plots:
+#       ...
+#
+# With a histfactory_variations.VariationEngine the model curves are drawn
+# from cached template yields instead of three plotOn calls per pair.
+#
+# /
+
+
+import multiprocessing
+import os
+
+import ROOT
+import numpy as np
+
+from histfactory_variations import VariationEngine
+
+# state of a worker process, set by _InitWorker
+_worker = {}
+
+
+def CategoryCut(channelCat, label):
+    '''
+    Cut selecting the events of the category state label.
+    '''
+    return "%s==%s::%s" % (channelCat.GetName(), channelCat.GetName(), label)
+
+
+def CategoryLabels(simPdf):
+    '''
+    Labels of the states of the index category of simPdf.
+    '''
+    labels = []
+    it = simPdf.indexCat().typeIterator()
+    tt = it.Next()
+    while tt:
+        labels.append(tt.GetName())
+        tt = it.Next()
+    return labels
+
+
+def VariationPairs(mc, nPlotsMax=1000):
+    '''
+    (category label, nuisance parameter name) pairs of the RooSimultaneous
+    pdf of mc, category by category, at most nPlotsMax.
+    '''
+    nuisanceNames = [var.GetName() for var in ROOT.RooArgList(mc.GetNuisanceParameters())]
+    pairs = [(label, name) for label in CategoryLabels(mc.GetPdf()) for name in nuisanceNames]
+    return pairs[:nPlotsMax]
+
+
+def VariationValues(w, var, nSigmaToVary):
+    '''
+    Nominal, up and down values of the nuisance parameter var.  Lumi is
+    varied by +-0.05 around nominalLumi.
+    '''
+    if var.GetName() == "Lumi":
+        nominal = w.var("nominalLumi").getVal()
+        return [nominal, nominal + 0.05, nominal - 0.05]
+    return [0., nSigmaToVary, -nSigmaToVary]
+
+
+def _PlotYields(frame, engine, category, name, values, styles):
+    lowEdges, highEdges = engine.Bins(category)[1:]
+    edges = np.append(lowEdges, highEdges[-1])
+    for i, (yields, style) in enumerate(zip(engine.TotalYields(category, name, values), styles)):
+        hist = ROOT.TH1D("%s_%s_%d" % (frame.GetName(), name, i), "", len(lowEdges), edges)
+        hist.SetDirectory(0)
+        for j, value in enumerate(yields):
+            hist.SetBinContent(j + 1, value)
+        hist.SetLineWidth(2)
+        hist.SetLineColor(style[0])
+        hist.SetLineStyle(style[1])
+        # the frame owns the histogram
+        ROOT.SetOwnership(hist, False)
+        frame.addTH1(hist, "hist")
+
+
+def PlotVariations(w, mc, data, category, var, nSigmaToVary, frameName, engine=None):
+    '''
+    RooPlot of the data of the category with its channel pdf for the
+    nominal value of var (blue) and for +nSigmaToVary (red) and
+    -nSigmaToVary (green), see VariationValues.  With a VariationEngine
+    the expected yields are drawn as histograms from its cached templates.
+    '''
+    simPdf = mc.GetPdf()
+    channelCat = simPdf.indexCat()
+    # pdf associated with the state and its observable
+    channelPdf = simPdf.getPdf(category)
+    obs = channelPdf.getObservables(mc.GetObservables()).first()
+
+    frame = obs.frame()
+    frame.SetName(frameName)
+    frame.SetYTitle(var.GetName())
+    data.plotOn(frame, ROOT.RooFit.MarkerSize(1),
+                ROOT.RooFit.Cut(CategoryCut(channelCat, category)),
+                ROOT.RooFit.DataError(getattr(ROOT.RooAbsData, "None")))
+
+    values = VariationValues(w, var, nSigmaToVary)
+    if engine is not None:
+        var.setVal(values[0])
+        _PlotYields(frame, engine, category, var.GetName(), values,
+                    [(ROOT.kBlue, ROOT.kSolid), (ROOT.kRed, ROOT.kDashed),
+                     (ROOT.kGreen, ROOT.kDashed)])
+        return frame
+
+    styles = [[],
+              [ROOT.RooFit.LineColor(ROOT.kRed), ROOT.RooFit.LineStyle(ROOT.kDashed)],
+              [ROOT.RooFit.LineColor(ROOT.kGreen), ROOT.RooFit.LineStyle(ROOT.kDashed)]]
+    for value, style in zip(values, styles):
+        var.setVal(value)
+        normCount = channelPdf.expectedEvents(ROOT.RooArgSet(obs))
+        channelPdf.plotOn(frame, ROOT.RooFit.LineWidth(2), ROOT.RooFit.Normalization(
+            normCount, ROOT.RooAbsReal.NumEvent), *style)
+    # set them back to normal
+    var.setVal(values[0])
+    return frame
+
+
+def VariationPlotFileName(outputDir, mc, category, nuisanceName):
+    obs = mc.GetPdf().getPdf(category).getObservables(mc.GetObservables()).first()
+    return os.path.join(outputDir, "%s_%s_%s.pdf" % (category, obs.GetName(), nuisanceName))
+
+
+def SaveVariationPlot(frame, fileName):
+    c2 = ROOT.TCanvas("c2")
+    frame.Draw()
+    c2.SaveAs(fileName)
+    c2.Close()
+
+
+def _InitWorker(fileName, workspaceName, modelConfigName, dataName, muVal, nSigmaToVary,
+                outputDir, useEngine, savePdf):
+    ROOT.gROOT.SetBatch(True)
+    ROOT.RooMsgService.instance().setGlobalKillBelow(ROOT.RooFit.WARNING)
+    inputFile = ROOT.TFile.Open(fileName)
+    w = inputFile.Get(workspaceName)
+    mc = w.obj(modelConfigName)
+    mc.GetParametersOfInterest().first().setVal(muVal)
+    _worker.update(file=inputFile, workspace=w, mc=mc, data=w.data(dataName),
+                   engine=VariationEngine(mc) if useEngine else None,
+                   nSigmaToVary=nSigmaToVary, outputDir=outputDir, savePdf=savePdf,
+                   frameFileName=os.path.join(outputDir, "frames_%d.root" % os.getpid()),
+                   nFrames=0)
+
+
+def _PlotPair(job):
+    index, category, nuisanceName = job
+    w, mc = _worker["workspace"], _worker["mc"]
+    frameName = "frame%d" % index
+    frame = PlotVariations(w, mc, _worker["data"], category,
+                           mc.GetNuisanceParameters().find(nuisanceName),
+                           _worker["nSigmaToVary"], frameName, _worker["engine"])
+    pdfFileName = None
+    if _worker["savePdf"]:
+        pdfFileName = VariationPlotFileName(_worker["outputDir"], mc, category, nuisanceName)
+        SaveVariationPlot(frame, pdfFileName)
+
+    # the first plot of the worker recreates its file
+    frameFile = ROOT.TFile.Open(_worker["frameFileName"],
+                                "UPDATE" if _worker["nFrames"] else "RECREATE")
+    frame.Write(frameName)
+    frameFile.Close()
+    _worker["nFrames"] += 1
+    return pdfFileName, _worker["frameFileName"], frameName
+
+
+def ParallelVariationPlots(fileName, workspaceName, modelConfigName, dataName, pairs,
+                           nSigmaToVary=5., muVal=0., nWorkers=None, outputDir=".",
+                           useEngine=False, savePdf=True):
+    '''
+    Variation plots of the (category, nuisance parameter name) pairs made
+    in nWorkers processes (all the cores if None), each reading the
+    workspace from fileName.  With useEngine every worker draws the
+    variations from a VariationEngine.  With savePdf every plot is also
+    saved to its own PDF file (the file name is None otherwise).
+
+    Returns a list of (category, nuisance name, PDF file name, RooPlot) in
+    the order of pairs.  The RooPlots are copied to memory and the ROOT
+    files of the workers are removed.
+    '''
+    if nWorkers is None:
+        nWorkers = multiprocessing.cpu_count()
+    if not os.path.isdir(outputDir):
+        os.makedirs(outputDir)
+    jobs = [(i, category, name) for i, (category, name) in enumerate(pairs)]
+    pool = multiprocessing.Pool(nWorkers, _InitWorker,
+                                (fileName, workspaceName, modelConfigName, dataName, muVal,
+                                 nSigmaToVary, outputDir, useEngine, savePdf))
+    try:
+        chunkSize = max(1, len(jobs) // (4 * nWorkers))
+        results = pool.map(_PlotPair, jobs, chunksize=chunkSize)
+    finally:
+        pool.close()
+        pool.join()
+
+    frameFiles = {}
+    plots = []
+    for (category, name), (pdfFileName, frameFileName, frameName) in zip(pairs, results):
+        if frameFileName not in frameFiles:
+            frameFiles[frameFileName] = ROOT.TFile.Open(frameFileName)
+        # the copy belongs to memory, not to the worker file, and stays
+        # alive for the canvases drawing it, as the frames of PlotVariations
+        ROOT.gROOT.cd()
+        frame = frameFiles[frameFileName].Get(frameName).Clone(frameName)
+        ROOT.SetOwnership(frame, False)
+        plots.append((category, name, pdfFileName, frame))
+    for frameFileName, frameFile in frameFiles.items():
+        frameFile.Close()
+        os.remove(frameFileName)
+    return plots
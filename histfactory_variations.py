@@ -0,0 +1,166 @@
+# /
+#
+# Cached +-N sigma variations of HistFactory templates
+#
+# The channel pdf of a HistFactory model is a RooRealSumPdf of one
+# RooProduct per sample, the nominal template times the interpolation
+# terms of the shape and normalization systematics.  Every plotOn after a
+# var.setVal(+-N) evaluates the full channel pdf on the plotting grid, although
+# only the terms of the samples depending on var have changed.
+#
+# VariationEngine evaluates every factor of every sample product once per
+# category at the bin centres of the observable, and keeps the values.  A
+# variation of a nuisance parameter re-evaluates only the factors that
+# depend on it and multiplies them with the cached values of the others.
+# The results are arrays of expected yields per sample and bin, which the
+# variation plots and yield tables share:
+#
+#   engine = VariationEngine(mc)
+#   nominal = engine.NominalYields("channel1").sum(axis=0)
+#   up = engine.VariedYields("channel1", "alpha_syst1", 5.).sum(axis=0)
+#
+# As in HistFactory the templates are taken to be constant within the bins
+# of the observable.
+#
+# /
+
+
+import ROOT
+import numpy as np
+
+
+def _Components(func):
+    '''
+    Factors of a RooProduct, or the function itself.
+    '''
+    if func.ClassName() == "RooProduct":
+        return [c for c in ROOT.RooArgList(func.components())]
+    return [func]
+
+
+class _Channel(object):
+    '''
+    Cached factors of the samples of one category.
+    '''
+
+    def __init__(self, channelPdf, observables):
+        self.obs = channelPdf.getObservables(observables).first()
+        binning = self.obs.getBinning()
+        nBins = binning.numBins()
+        self.lowEdges = np.array([binning.binLow(i) for i in range(nBins)])
+        self.highEdges = np.array([binning.binHigh(i) for i in range(nBins)])
+        self.centres = 0.5 * (self.lowEdges + self.highEdges)
+        # the bin centres as a dataset, for the batch evaluation
+        self.grid = ROOT.RooDataSet("grid_" + channelPdf.GetName(), "", ROOT.RooArgSet(self.obs))
+        saved = self.obs.getVal()
+        for x in self.centres:
+            self.obs.setVal(x)
+            self.grid.add(ROOT.RooArgSet(self.obs))
+        self.obs.setVal(saved)
+
+        sumPdf = None
+        for component in ROOT.RooArgList(channelPdf.getComponents()):
+            if component.ClassName() == "RooRealSumPdf":
+                sumPdf = component
+                break
+        if sumPdf is None:
+            raise ValueError("no RooRealSumPdf in %s" % channelPdf.GetName())
+        funcs = [f for f in ROOT.RooArgList(sumPdf.funcList())]
+        coefs = [c for c in ROOT.RooArgList(sumPdf.coefList())]
+        self.sampleNames = [f.GetName() for f in funcs]
+        # the coefficient is a factor like the others
+        self.factors = [_Components(f) + [c] for f, c in zip(funcs, coefs)]
+        self.values = [[self.Evaluate(factor) for factor in factors] for factors in self.factors]
+
+    def Evaluate(self, func):
+        '''
+        Values of func at the bin centres.
+        '''
+        if hasattr(func, "getValues"):
+            # batch evaluation done in C++
+            return np.array(func.getValues(self.grid), dtype=float)
+        # older ROOT: one bin after the other
+        saved = self.obs.getVal()
+        values = np.empty(len(self.centres))
+        for i, x in enumerate(self.centres):
+            self.obs.setVal(x)
+            values[i] = func.getVal()
+        self.obs.setVal(saved)
+        return values
+
+    def Yields(self, values):
+        widths = self.highEdges - self.lowEdges
+        return np.array([np.prod(sample, axis=0) * widths for sample in values])
+
+
+class VariationEngine(object):
+    '''
+    Expected yields per sample and bin of the categories of the
+    RooSimultaneous pdf of mc, for the current (nominal) parameter values
+    and for variations of single nuisance parameters.  The factors are
+    evaluated when a category is first used, and the variations are
+    cached until Clear is called.
+    '''
+
+    def __init__(self, mc):
+        self.mc = mc
+        self._channels = {}
+        self._variations = {}
+
+    def Channel(self, category):
+        if category not in self._channels:
+            self._channels[category] = _Channel(self.mc.GetPdf().getPdf(category),
+                                                self.mc.GetObservables())
+        return self._channels[category]
+
+    def Clear(self):
+        '''
+        Forget the cached values, eg. after changing the nominal parameters.
+        '''
+        self._channels.clear()
+        self._variations.clear()
+
+    def Bins(self, category):
+        '''
+        Observable, low and high bin edges of the category.
+        '''
+        channel = self.Channel(category)
+        return channel.obs, channel.lowEdges, channel.highEdges
+
+    def SampleNames(self, category):
+        return self.Channel(category).sampleNames
+
+    def NominalYields(self, category):
+        '''
+        Nominal expected yields, an array (samples, bins).
+        '''
+        channel = self.Channel(category)
+        return channel.Yields(channel.values)
+
+    def VariedYields(self, category, nuisanceName, value):
+        '''
+        Expected yields, an array (samples, bins), with the nuisance
+        parameter at value and the other parameters at their nominal
+        values.  Only the factors depending on it are evaluated.
+        '''
+        key = (category, nuisanceName, value)
+        if key in self._variations:
+            return self._variations[key]
+        channel = self.Channel(category)
+        var = self.mc.GetNuisanceParameters().find(nuisanceName)
+        nominal = var.getVal()
+        var.setVal(value)
+        values = [[channel.Evaluate(factor) if factor.dependsOn(var) else cached
+                   for factor, cached in zip(factors, sampleValues)]
+                  for factors, sampleValues in zip(channel.factors, channel.values)]
+        var.setVal(nominal)
+        self._variations[key] = channel.Yields(values)
+        return self._variations[key]
+
+    def TotalYields(self, category, nuisanceName, values):
+        '''
+        Expected yields summed over the samples, an array (values, bins),
+        for the values of the nuisance parameter.
+        '''
+        return np.array([self.VariedYields(category, nuisanceName, value).sum(axis=0)
+                         for value in values])
@@ -0,0 +1,179 @@
+# /
+#
+# Per-category yield tables of HistFactory models
+#
+# StandardHistFactoryPlotsWithCategories counts the observed events of a
+# category with data.sumEntries("channelCat==channelCat::label"), a full
+# pass over the dataset for every category, and asks the pdf for the
+# expected events separately.  ComputeYieldTable instead splits the
+# dataset by the index category once (SplitByCategory, which can also be
+# given the parts already split, eg. for plotting) and takes the
+# expected yields of all samples of all categories from the templates of a
+# histfactory_variations.VariationEngine.  Samples depending on the
+# parameter of interest count as signal, the others as background.
+#
+# The table is plain data and can be kept in a JSON file alongside the
+# workspace, keyed by the file, its modification time and the parameter
+# values.  If the file cannot be written the tables are only kept in
+# memory:
+#
+#   cache = YieldTableCache("ws.root.yields.json")
+#   key = cache.Key("ws.root", "combined", "ModelConfig", "obsData", mc)
+#   table = cache.Get(key, lambda: ComputeYieldTable(mc, data))
+#   print table.Format()
+#
+# /
+
+
+import json
+import os
+
+import ROOT
+
+from histfactory_plots import CategoryLabels
+from histfactory_variations import VariationEngine
+
+
+def SplitByCategory(data, channelCat):
+    '''
+    Dict of the datasets of the events of data per label of channelCat,
+    made in one pass.
+    '''
+    parts = data.split(channelCat)
+    # the list and the split datasets belong to the caller
+    ROOT.SetOwnership(parts, True)
+    result = {}
+    for part in parts:
+        ROOT.SetOwnership(part, True)
+        result[part.GetName()] = part
+    return result
+
+
+def ObservedCounts(data, channelCat, parts=None):
+    '''
+    Sum of the weights of data per label of channelCat, in one pass, or
+    of the parts of SplitByCategory if already split.
+    '''
+    if parts is None:
+        parts = SplitByCategory(data, channelCat)
+    return dict((label, part.sumEntries()) for label, part in parts.items())
+
+
+class YieldTable(object):
+    '''
+    Observed events and expected yields per category and sample.
+    categories is the list of category labels, samples[label] the sample
+    names, observed[label] the observed events, expected[label][sample]
+    the expected yields and signal[label] the names of the signal samples.
+    '''
+
+    def __init__(self, categories, samples, observed, expected, signal):
+        self.categories = categories
+        self.samples = samples
+        self.observed = observed
+        self.expected = expected
+        self.signal = signal
+
+    def Signal(self, category):
+        return sum(self.expected[category][s] for s in self.signal[category])
+
+    def Background(self, category):
+        return sum(y for s, y in self.expected[category].items()
+                   if s not in self.signal[category])
+
+    def Total(self, category):
+        return sum(self.expected[category].values())
+
+    def ToDict(self):
+        return {"categories": self.categories, "samples": self.samples,
+                "observed": self.observed, "expected": self.expected, "signal": self.signal}
+
+    @classmethod
+    def FromDict(cls, d):
+        return cls(d["categories"], d["samples"], d["observed"], d["expected"], d["signal"])
+
+    def Format(self):
+        '''
+        The table as text, one line per category.
+        '''
+        lines = ["%-20s %12s %12s %12s %12s" % ("category", "observed", "signal", "background",
+                                                "expected")]
+        for category in self.categories:
+            lines.append("%-20s %12.2f %12.4g %12.4g %12.4g" % (
+                category, self.observed[category], self.Signal(category),
+                self.Background(category), self.Total(category)))
+        return "\n".join(lines)
+
+
+def ComputeYieldTable(mc, data, engine=None, parts=None):
+    '''
+    YieldTable of the RooSimultaneous pdf of mc and data, with the expected
+    yields of the current parameter values from engine (a new
+    VariationEngine if None).  parts are the datasets of the categories
+    from SplitByCategory, if data has already been split.
+    '''
+    if engine is None:
+        engine = VariationEngine(mc)
+    simPdf = mc.GetPdf()
+    categories = CategoryLabels(simPdf)
+    counts = ObservedCounts(data, simPdf.indexCat(), parts)
+    poi = mc.GetParametersOfInterest().first()
+
+    samples, observed, expected, signal = {}, {}, {}, {}
+    for category in categories:
+        channel = engine.Channel(category)
+        yields = engine.NominalYields(category).sum(axis=1)
+        samples[category] = list(channel.sampleNames)
+        observed[category] = counts.get(category, 0.)
+        expected[category] = dict(zip(channel.sampleNames, [float(y) for y in yields]))
+        signal[category] = [name for name, factors in zip(channel.sampleNames, channel.factors)
+                            if any(factor.dependsOn(poi) for factor in factors)]
+    return YieldTable(categories, samples, observed, expected, signal)
+
+
+class YieldTableCache(object):
+    '''
+    Yield tables kept in the JSON file fileName, eg. next to the workspace
+    file, or only in memory if it cannot be written.
+    '''
+
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.tables = {}
+        if os.path.exists(fileName):
+            with open(fileName) as cacheFile:
+                self.tables = json.load(cacheFile)
+
+    @staticmethod
+    def Key(fileName, workspaceName, modelConfigName, dataName, mc):
+        '''
+        Key from the workspace file and its modification time, the names of
+        the workspace, ModelConfig and data and the values of the parameter
+        of interest and the nuisance parameters.
+        '''
+        parameters = ROOT.RooArgList(mc.GetParametersOfInterest())
+        if mc.GetNuisanceParameters():
+            parameters.add(mc.GetNuisanceParameters())
+        values = [(p.GetName(), p.getVal()) for p in parameters]
+        return json.dumps([os.path.abspath(fileName), os.path.getmtime(fileName),
+                           workspaceName, modelConfigName, dataName, values])
+
+    def Get(self, key, compute):
+        '''
+        Return the table stored for key, calling compute() to make it and
+        saving the file the first time.
+        '''
+        if key not in self.tables:
+            self.tables[key] = compute().ToDict()
+            try:
+                with open(self.fileName, "w") as cacheFile:
+                    json.dump(self.tables, cacheFile, indent=1)
+            except IOError:
+                # eg. a read-only directory: kept in memory only
+                pass
+        return YieldTable.FromDict(self.tables[key])
+
+    def Clear(self):
+        self.tables.clear()
+        if os.path.exists(self.fileName):
+            os.remove(self.fileName)
@@ -0,0 +1,278 @@
+# /
+#
+# Closed-form hybrid p-values for the on/off problem
+#
+# The hybrid (prior averaged) p-value of the on/off problem
+#
+#   x ~ Pois(s + kappa b),   y ~ Pois(tau b),   b ~ eta(b)
+#
+# is computed in Zbi_Zgamma and HybridInstructional by integrating
+# PROJ::averagedModel(PROD::foo(px|b,py,prior_b),b) numerically with
+# createCdf, which takes seconds per point.  When the averaging density
+# py(y|b) eta(b) has the Gamma form b^(alpha-1) exp(-beta b), ie. for a
+# uniform prior (alpha = y + 1, beta = tau) or a Gamma prior on b, the
+# averaged model of x is a negative binomial distribution and for s = 0
+#
+#   P(x >= n) = I_{kappa/(kappa+beta)}(n, alpha)
+#
+# with the regularized incomplete beta function I (P_Bi of
+# NumberCountingUtils for a uniform prior).  For s > 0 the Poisson signal
+# counts are summed over.
+#
+# HybridPValueEngine checks numerically, from the values of the pdfs in the
+# workspace, whether the model has this structure and then evaluates the
+# p-values for arrays of n (and y) in closed form.  Otherwise, or where the
+# range of b cuts off a visible part of the Gamma density, it falls back to
+# createCdf of the averaged model.
+#
+#   engine = HybridPValueEngine(w, "px", "x", "b", ["py", "prior_b"],
+#                               auxObservableName="y")
+#   p = engine.PValue(np.arange(100, 201), 100.)
+#   z = number_counting.PValueToSignificance(p)
+#
+# /
+
+
+import ROOT
+import numpy as np
+from scipy import special
+
+# relative tolerance of the checks of the model structure
+_STRUCTURE_TOLERANCE = 1e-6
+# largest mass of the Gamma density outside the range of b
+_TRUNCATION_TOLERANCE = 1e-9
+
+
+def NegativeBinomialTail(n, alpha, beta, kappa=1., s=0.):
+    '''
+    P(x >= n) for x = k + m, k ~ Pois(s) and m ~ Pois(kappa b) with b
+    averaged over the Gamma density b^(alpha-1) exp(-beta b).  All the
+    arguments are broadcastable arrays, n counts.
+    '''
+    n, alpha, beta, kappa, s = np.broadcast_arrays(*[np.asarray(v, dtype=float)
+                                                     for v in (n, alpha, beta, kappa, s)])
+    n = np.ceil(n)
+    x = kappa / (kappa + beta)
+
+    def Tail(m):
+        with np.errstate(invalid="ignore"):
+            return np.where(m > 0, special.betainc(np.maximum(m, 1.), alpha, x), 1.)
+
+    if not np.any(s > 0):
+        p = Tail(n)
+        return p[()] if p.ndim == 0 else p
+
+    # sum over the signal counts k < n, P(k >= n) for the rest
+    p = np.where(n > 0, special.pdtrc(np.maximum(n - 1., 0.), s), 1.)
+    for k in range(int(n.max())):
+        weight = np.exp(special.xlogy(k, s) - s - special.gammaln(k + 1.))
+        p = p + np.where(k < n, weight * Tail(n - k), 0.)
+    return p[()] if p.ndim == 0 else p
+
+
+def _PoissonMean(pdf, observable, n0):
+    '''
+    Mean of pdf as a Poisson distribution in observable, from the ratios of
+    its values at n0, n0 + 1 and n0 + 2, or None if the ratios are not
+    those of a Poisson distribution.
+    '''
+    values = []
+    for n in (n0, n0 + 1, n0 + 2):
+        observable.setVal(n)
+        values.append(pdf.getVal())
+    if min(values) <= 0:
+        return None
+    mean = (n0 + 1.) * values[1] / values[0]
+    if not np.isclose(mean, (n0 + 2.) * values[2] / values[1], rtol=_STRUCTURE_TOLERANCE):
+        return None
+    return mean
+
+
+def _LinearFit(x, y):
+    '''
+    Intercept and slope of y(x), or None if it is not linear.
+    '''
+    slope, intercept = np.polyfit(x, y, 1)
+    if not np.allclose(intercept + slope * x, y, rtol=_STRUCTURE_TOLERANCE,
+                       atol=_STRUCTURE_TOLERANCE * np.abs(y).max()):
+        return None
+    return intercept, slope
+
+
+def _GammaForm(b, logDensity):
+    '''
+    alpha and beta of logDensity(b) = (alpha - 1) log b - beta b + c, or
+    None if it does not have this form.
+    '''
+    design = np.column_stack([np.log(b), -b, np.ones_like(b)])
+    coefficients = np.linalg.lstsq(design, logDensity, rcond=None)[0]
+    residual = logDensity - design.dot(coefficients)
+    if np.abs(residual).max() > _STRUCTURE_TOLERANCE * max(1., np.abs(logDensity).max()):
+        return None
+    return coefficients[0] + 1., coefficients[1]
+
+
+class HybridPValueEngine(object):
+    '''
+    Hybrid p-values P(x >= n) of the averaged model of the workspace w,
+    mainPdfName(x | b) averaged over b with the product of the pdfs
+    averagingPdfNames (eg. the auxiliary measurement and the prior).  With
+    auxObservableName, the observable of the auxiliary measurement, the
+    p-values can also be computed for arrays of its values.
+
+    The structure is detected for the current values of the parameters
+    (eg. the signal s); call Detect again after changing them.  analytic
+    tells whether the closed form is used.
+    '''
+
+    def __init__(self, w, mainPdfName, observableName, nuisanceName, averagingPdfNames,
+                 auxObservableName=None, averagedModelName="averagedModel"):
+        self.w = w
+        self.mainPdf = w.pdf(mainPdfName)
+        self.observable = w.var(observableName)
+        self.nuisance = w.var(nuisanceName)
+        self.averagingPdfs = [w.pdf(name) for name in averagingPdfNames]
+        self.auxObservable = w.var(auxObservableName) if auxObservableName else None
+        self.averagedModelName = averagedModelName
+        self._projection = "PROJ::%s(PROD::%s_integrand(%s|%s,%s),%s)" % (
+            averagedModelName, averagedModelName, mainPdfName, nuisanceName,
+            ",".join(averagingPdfNames), nuisanceName)
+        self._cdf = None
+        self.Detect()
+
+    def Detect(self):
+        '''
+        Check the model structure and compute the parameters of the closed
+        form: s, kappa, alpha and beta (alpha at the current value y0 of
+        the auxiliary observable).
+        '''
+        self.analytic = False
+        variables = [self.observable, self.nuisance]
+        if self.auxObservable:
+            variables.append(self.auxObservable)
+        saved = [v.getVal() for v in variables]
+        try:
+            self._Detect()
+        finally:
+            for v, value in zip(variables, saved):
+                v.setVal(value)
+        return self.analytic
+
+    def _Detect(self):
+        b = self.nuisance
+        if b.getMin() < 0:
+            return
+        probes = b.getMin() + (b.getMax() - b.getMin()) * np.linspace(0.05, 0.95, 9)
+
+        # x ~ Pois(s + kappa b)
+        n0 = int(min(max(np.floor(self.observable.getVal()), 0.), self.observable.getMax() - 2.))
+        means = []
+        for value in probes:
+            b.setVal(value)
+            means.append(_PoissonMean(self.mainPdf, self.observable, n0))
+        if None in means:
+            return
+        fit = _LinearFit(probes, np.array(means))
+        if fit is None or fit[1] <= 0:
+            return
+        self.s, self.kappa = max(fit[0], 0.), fit[1]
+
+        # the auxiliary pdfs must be Poisson in y with mean proportional to b
+        if self.auxObservable:
+            self.y0 = self.auxObservable.getVal()
+            m0 = int(min(max(np.floor(self.y0), 0.), self.auxObservable.getMax() - 2.))
+            for pdf in self.averagingPdfs:
+                if not pdf.dependsOn(self.auxObservable):
+                    continue
+                auxMeans = []
+                for value in probes:
+                    b.setVal(value)
+                    auxMeans.append(_PoissonMean(pdf, self.auxObservable, m0))
+                if None in auxMeans:
+                    return
+                auxFit = _LinearFit(probes, np.array(auxMeans))
+                if auxFit is None or abs(auxFit[0]) > _STRUCTURE_TOLERANCE * max(auxMeans):
+                    return
+            self.auxObservable.setVal(self.y0)
+
+        # averaging density b^(alpha-1) exp(-beta b)
+        logDensity = []
+        for value in probes:
+            b.setVal(value)
+            density = np.prod([pdf.getVal() for pdf in self.averagingPdfs])
+            logDensity.append(np.log(density) if density > 0 else np.nan)
+        logDensity = np.array(logDensity)
+        finite = np.isfinite(logDensity)
+        if finite.sum() < 5:
+            return
+        form = _GammaForm(probes[finite], logDensity[finite])
+        if form is None or form[0] <= 0 or form[1] <= 0:
+            return
+        self.alpha, self.beta = form
+        self.analytic = True
+
+    def _Alpha(self, y):
+        if y is None:
+            return self.alpha
+        if not self.auxObservable:
+            raise ValueError("y values need the auxiliary observable")
+        return self.alpha + np.asarray(y, dtype=float) - self.y0
+
+    def _Truncated(self, alpha):
+        '''
+        True where the range of b cuts off more than the tolerance of the
+        Gamma density.
+        '''
+        mass = (special.gammainc(alpha, self.beta * self.nuisance.getMin()) +
+                special.gammaincc(alpha, self.beta * self.nuisance.getMax()))
+        return mass > _TRUNCATION_TOLERANCE
+
+    def PValue(self, n, y=None):
+        '''
+        P(x >= n) of the averaged model for broadcastable arrays n (and y,
+        the values of the auxiliary observable, its current value if None).
+        '''
+        if not self.analytic:
+            return self.NumericPValue(n, y)
+        alpha = self._Alpha(y)
+        n, alpha = np.broadcast_arrays(np.asarray(n, dtype=float), alpha)
+        p = np.asarray(NegativeBinomialTail(n, alpha, self.beta, self.kappa, self.s), dtype=float)
+        truncated = self._Truncated(alpha)
+        if np.any(truncated):
+            p = p.copy()
+            yValues = None if y is None else np.broadcast_to(y, n.shape)[truncated]
+            p[truncated] = self.NumericPValue(n[truncated], yValues)
+        return p[()] if p.ndim == 0 else p
+
+    def Cdf(self, n, y=None):
+        '''
+        createCdf of the averaged model at x = n, 1 - P(x >= n).
+        '''
+        return 1. - self.PValue(n, y)
+
+    def NumericPValue(self, n, y=None):
+        '''
+        1 - createCdf of the averaged model at x = n (and y), one point at
+        a time by numerical integration.
+        '''
+        if y is not None and not self.auxObservable:
+            raise ValueError("y values need the auxiliary observable")
+        if self._cdf is None:
+            if not self.w.pdf(self.averagedModelName):
+                self.w.factory(self._projection)
+            self._cdf = self.w.pdf(self.averagedModelName).createCdf(ROOT.RooArgSet(self.observable))
+        n = np.asarray(n, dtype=float)
+        if y is not None:
+            n, y = np.broadcast_arrays(n, np.asarray(y, dtype=float))
+        xSaved = self.observable.getVal()
+        ySaved = self.auxObservable.getVal() if self.auxObservable else None
+        p = np.empty(n.shape)
+        for index in np.ndindex(*n.shape):
+            self.observable.setVal(n[index])
+            if y is not None:
+                self.auxObservable.setVal(y[index])
+            p[index] = 1. - self._cdf.getVal()
+        self.observable.setVal(xSaved)
+        if self.auxObservable:
+            self.auxObservable.setVal(ySaved)
+        return p[()] if p.ndim == 0 else p
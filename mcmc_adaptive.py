@@ -0,0 +1,92 @@
+# /
+#
+# Adaptive Metropolis proposal
+#
+# A fixed SequentialProposal needs its step size tuned by hand and a
+# ProposalHelper needs a full Hesse fit first to get the covariance matrix,
+# and neither changes afterwards.  Here the proposal learns the covariance
+# of the posterior from the running chain (Haario, Saksman & Tamminen,
+# Bernoulli 7 (2001) 223) and scales it to reach a target acceptance rate
+# (Andrieu & Thoms, Stat. Comput. 18 (2008) 343).  After nAdaptSteps steps
+# the proposal is frozen, so that the rest of the chain is a proper Markov
+# chain.  The steps taken while adapting must be discarded as burn-in, eg.
+# with chain.EntriesForWeightedSteps(nAdaptSteps).
+#
+# It is used with RunMetropolisHastings of mcmc_chain:
+#
+#   proposal = AdaptiveMetropolisProposal(initialWidths, nAdaptSteps=5000)
+#   RunMetropolisHastings(nll, params, proposal, nIters, chain)
+#
+# /
+
+
+import numpy as np
+
+
+class AdaptiveMetropolisProposal(object):
+    '''
+    Gaussian random walk proposal whose covariance is estimated from the
+    chain during the first nAdaptSteps steps.
+
+    initialCovariance is a covariance matrix, or a 1-d array of widths, used
+    until nInitialSteps steps have been made.  updateInterval controls how
+    often the Cholesky decomposition of the covariance is recomputed.
+    '''
+
+    def __init__(self, initialCovariance, nAdaptSteps, targetAcceptance=0.234,
+                 nInitialSteps=None, updateInterval=50, epsilon=1e-8):
+        covariance = np.atleast_1d(np.asarray(initialCovariance, dtype=float))
+        if covariance.ndim == 1:
+            covariance = np.diag(covariance ** 2)
+        self.dim = covariance.shape[0]
+        self.nAdaptSteps = nAdaptSteps
+        self.targetAcceptance = targetAcceptance
+        self.nInitialSteps = nInitialSteps if nInitialSteps is not None else 10 * self.dim
+        self.updateInterval = updateInterval
+        # the regularization is relative to the scale of each parameter
+        self.epsilon = epsilon * np.diag(covariance)
+        # optimal scaling for a Gaussian target
+        self.logScale = np.log(2.38 ** 2 / self.dim)
+        self.cholesky = np.linalg.cholesky(covariance)
+
+        # running mean and covariance of the visited points (Welford)
+        self.nPoints = 0
+        self.mean = np.zeros(self.dim)
+        self.sumSquares = np.zeros((self.dim, self.dim))
+        self.nAccepted = 0
+
+    def IsFrozen(self, iStep):
+        return iStep >= self.nAdaptSteps
+
+    def Propose(self, x, rng):
+        return x + np.exp(0.5 * self.logScale) * self.cholesky.dot(rng.standard_normal(self.dim))
+
+    def Update(self, iStep, x, accepted):
+        if self.IsFrozen(iStep):
+            return
+        self.nAccepted += accepted
+
+        self.nPoints += 1
+        delta = x - self.mean
+        self.mean += delta / self.nPoints
+        self.sumSquares += np.outer(delta, x - self.mean)
+
+        if iStep < self.nInitialSteps:
+            return
+        # Robbins-Monro update of the global scale towards the target rate
+        gain = 1. / (iStep - self.nInitialSteps + 1) ** 0.6
+        self.logScale += gain * (float(accepted) - self.targetAcceptance)
+
+        if iStep % self.updateInterval == 0 or iStep == self.nAdaptSteps - 1:
+            covariance = self.sumSquares / (self.nPoints - 1) + np.diag(self.epsilon)
+            try:
+                self.cholesky = np.linalg.cholesky(covariance)
+            except np.linalg.LinAlgError:
+                # keep the previous covariance until the estimate is usable
+                pass
+
+    def Covariance(self):
+        '''
+        Current proposal covariance matrix, including the scale.
+        '''
+        return np.exp(self.logScale) * self.cholesky.dot(self.cholesky.T)
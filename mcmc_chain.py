@@ -0,0 +1,417 @@
+# /
+#
+# Markov chain storage and a Metropolis-Hastings driver
+#
+# MCMCInterval keeps the chain in a RooDataSet, GetChainAsDataSet() makes a
+# copy and GetAsTTree() another one, eg. only to draw the chain in
+# rs101_limitexample.  For long chains (10^6 steps in
+# StandardBayesianMCMCDemo) this holds several full copies in memory.
+#
+# ChainStore writes the parameter values, weights and NLL values of the
+# chain to one memory-mapped .npy file per column while the chain runs.
+# The columns are exposed as NumPy views that can be used directly for
+# interval computation and plotting, and the files can be reopened later
+# with ChainStore.Open.  Like MarkovChain, repeated points are stored once
+# with a weight equal to the number of steps spent there.
+#
+# RunMetropolisHastings runs the chain, calling the NLL of the model
+# directly, with a flat prior inside the parameter ranges (the default of
+# MCMCCalculator) and a symmetric proposal.  Instead of a fixed number of
+# iterations it can run until a target effective sample size is reached:
+#
+#   nll = mc.GetPdf().createNLL(data, ROOT.RooFit.Constrain(constrainedParams))
+#   params = ROOT.RooArgList(...)  # the floating parameters
+#   chain = ChainStore("chain_dir", [p.GetName() for p in params], nIters)
+#   RunMetropolisHastings(nll, params, RandomWalkProposal(widths), nIters, chain,
+#                         targetESS=1000, essName="s", burnInSteps=nBurnIn)
+#   burnIn = chain.EntriesForWeightedSteps(nBurnIn)
+#   lower, upper = ChainInterval(chain.Values("s", burnIn), chain.Weights(burnIn), 0.95)
+#
+# When only the posterior of a few parameters is needed, HistogramChain can
+# be given to RunMetropolisHastings instead of a ChainStore.  It fills a
+# weighted N-d histogram of the chosen axes as the chain runs and never
+# stores the points, so its memory does not grow with the chain length:
+#
+#   chain = HistogramChain([p.GetName() for p in params], ["s"], 100, [(0., 50.)],
+#                          burnInSteps=nBurnIn)
+#   RunMetropolisHastings(nll, params, proposal, nIters, chain)
+#   lower, upper = chain.Interval("s", 0.95)
+#
+# /
+
+
+import json
+import os
+
+import numpy as np
+
+from mcmc_diagnostics import EffectiveSampleSize, ExpandWeightedChain, SplitRHat
+
+WEIGHT_NAME = "weight"
+NLL_NAME = "nll"
+
+
+class ChainStore(object):
+    '''
+    Columnar storage of a weighted Markov chain.  With a directory the
+    columns are memory-mapped .npy files, without one they are kept in
+    memory.  capacity is the maximal number of stored points (at most the
+    number of iterations).
+    '''
+
+    def __init__(self, directory, names, capacity):
+        self.directory = directory
+        self.names = list(names)
+        self.size = 0
+        self.columns = {}
+        allNames = self.names + [WEIGHT_NAME, NLL_NAME]
+        if directory is not None and not os.path.isdir(directory):
+            os.makedirs(directory)
+        for name in allNames:
+            if directory is None:
+                self.columns[name] = np.empty(capacity)
+            else:
+                self.columns[name] = np.lib.format.open_memmap(
+                    self._ColumnFile(directory, name), mode="w+",
+                    dtype=np.float64, shape=(capacity,))
+
+    @staticmethod
+    def _ColumnFile(directory, name):
+        return os.path.join(directory, name + ".npy")
+
+    @classmethod
+    def Open(cls, directory):
+        '''
+        Open a chain written before, read-only.
+        '''
+        with open(os.path.join(directory, "chain.json")) as metaFile:
+            meta = json.load(metaFile)
+        chain = cls.__new__(cls)
+        chain.directory = directory
+        chain.names = meta["names"]
+        chain.size = meta["size"]
+        chain.columns = {}
+        for name in chain.names + [WEIGHT_NAME, NLL_NAME]:
+            chain.columns[name] = np.load(cls._ColumnFile(directory, name), mmap_mode="r")
+        return chain
+
+    def Add(self, values, nll, weight):
+        i = self.size
+        for name, value in zip(self.names, values):
+            self.columns[name][i] = value
+        self.columns[WEIGHT_NAME][i] = weight
+        self.columns[NLL_NAME][i] = nll
+        self.size += 1
+
+    def Flush(self):
+        '''
+        Write the pending data and the number of stored points to disk.
+        '''
+        if self.directory is None:
+            return
+        for column in self.columns.values():
+            if hasattr(column, "flush"):
+                column.flush()
+        with open(os.path.join(self.directory, "chain.json"), "w") as metaFile:
+            json.dump({"names": self.names, "size": self.size}, metaFile)
+
+    def Size(self):
+        return self.size
+
+    def Values(self, name, burnIn=0):
+        '''
+        View of the values of parameter name, skipping the first burnIn points.
+        '''
+        return self.columns[name][burnIn:self.size]
+
+    def Weights(self, burnIn=0):
+        return self.columns[WEIGHT_NAME][burnIn:self.size]
+
+    def NLL(self, burnIn=0):
+        return self.columns[NLL_NAME][burnIn:self.size]
+
+    def EntriesForWeightedSteps(self, nSteps):
+        '''
+        Number of stored points that cover the first nSteps weighted steps
+        of the chain, for a burn-in counted in steps as by
+        RunMetropolisHastings and AdaptiveMetropolisProposal.  Not for the
+        chains of MCMCInterval, whose burn-in is a number of entries.
+        '''
+        return int(np.searchsorted(np.cumsum(self.Weights()), nSteps, side="right"))
+
+
+class HistogramChain(object):
+    '''
+    Weighted histogram of the axes (a subset of names) of a Markov chain,
+    filled point by point without storing the chain.  nBins and ranges are
+    given per axis (or one value for all).  The steps of the first
+    burnInSteps are recorded in a snapshot of the histogram that is
+    subtracted from the full one by Histogram().  With a directory, Flush
+    writes the histogram to it.
+    '''
+
+    def __init__(self, names, axes, nBins, ranges, burnInSteps=0, directory=None):
+        self.names = list(names)
+        self.axes = list(axes)
+        self.axisIndices = [self.names.index(a) for a in self.axes]
+        nAxes = len(self.axes)
+        self.nBins = np.broadcast_to(nBins, (nAxes,)).astype(int)
+        if np.ndim(ranges) == 1:
+            ranges = [ranges] * nAxes
+        self.low = np.array([r[0] for r in ranges], dtype=float)
+        self.high = np.array([r[1] for r in ranges], dtype=float)
+        self.binWidths = (self.high - self.low) / self.nBins
+        self.burnInSteps = burnInSteps
+        self.directory = directory
+        self.counts = np.zeros(tuple(self.nBins))
+        self.snapshot = None if burnInSteps > 0 else np.zeros_like(self.counts)
+        self.size = 0
+        self.nSteps = 0
+        self.nOutside = 0
+
+    def Add(self, values, nll, weight):
+        values = np.asarray(values, dtype=float)[self.axisIndices]
+        index = np.floor((values - self.low) / self.binWidths).astype(int)
+        inside = np.all(index >= 0) and np.all(index < self.nBins)
+        if self.snapshot is None and self.nSteps + weight >= self.burnInSteps:
+            # the burn-in ends at this point, only its first steps belong to it
+            self.snapshot = self.counts.copy()
+            if inside:
+                self.snapshot[tuple(index)] += self.burnInSteps - self.nSteps
+        if inside:
+            self.counts[tuple(index)] += weight
+        else:
+            self.nOutside += weight
+        self.nSteps += weight
+        self.size += 1
+
+    def Flush(self):
+        '''
+        Write the histogram after burn-in, its bin edges and the axis names
+        to directory.
+        '''
+        if self.directory is None:
+            return
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        np.save(os.path.join(self.directory, "histogram.npy"), self.Histogram())
+        for axis, edges in zip(self.axes, self.Edges()):
+            np.save(os.path.join(self.directory, axis + "_edges.npy"), edges)
+        with open(os.path.join(self.directory, "histogram.json"), "w") as metaFile:
+            json.dump({"names": self.names, "axes": self.axes, "size": self.size,
+                       "steps": self.nSteps}, metaFile)
+
+    def Size(self):
+        return self.size
+
+    def Edges(self):
+        return [low + width * np.arange(n + 1)
+                for low, width, n in zip(self.low, self.binWidths, self.nBins)]
+
+    def Centres(self):
+        return [0.5 * (e[1:] + e[:-1]) for e in self.Edges()]
+
+    def Histogram(self, afterBurnIn=True):
+        '''
+        Bin contents in steps, with one array axis per histogram axis.
+        '''
+        if not afterBurnIn or self.snapshot is None:
+            return self.counts.copy()
+        return self.counts - self.snapshot
+
+    def Marginal(self, axis, afterBurnIn=True):
+        iAxis = self.axes.index(axis)
+        others = tuple(i for i in range(len(self.axes)) if i != iAxis)
+        return self.Histogram(afterBurnIn).sum(axis=others)
+
+    def Interval(self, axis, confidenceLevel, leftSideTailFraction=-1.):
+        '''
+        Interval on one axis from its marginal histogram, with the options
+        of ChainInterval.  The limits are bin edges: the tail interval
+        extends to the edges of the bins where the tails are cut and the
+        shortest interval spans the highest bins holding confidenceLevel.
+        '''
+        edges = self.Edges()[self.axes.index(axis)]
+        heights = self.Marginal(axis)
+        total = heights.sum()
+        if leftSideTailFraction >= 0:
+            cumulative = np.cumsum(heights) / total
+            alpha = 1. - confidenceLevel
+            lowFraction = alpha * leftSideTailFraction
+            highFraction = 1. - alpha * (1. - leftSideTailFraction)
+            nBins = len(heights)
+            iLow = min(np.searchsorted(cumulative, lowFraction, side="right"), nBins - 1)
+            iHigh = min(np.searchsorted(cumulative, highFraction), nBins - 1)
+            if leftSideTailFraction == 0:
+                iLow = 0
+            return edges[iLow], edges[iHigh + 1]
+
+        order = np.argsort(heights)[::-1]
+        content = np.cumsum(heights[order]) / total
+        nKeep = np.searchsorted(content, confidenceLevel) + 1
+        kept = order[:nKeep]
+        return edges[kept.min()], edges[kept.max() + 1]
+
+    def FillHistogram(self, hist):
+        '''
+        Fill the TH1, TH2 or TH3 hist (with the same binning) with the
+        histogram after burn-in.
+        '''
+        grids = np.meshgrid(*self.Centres(), indexing="ij")
+        return FillHistogramFromArrays(hist, [g.ravel() for g in grids],
+                                       self.Histogram().ravel())
+
+
+class RandomWalkProposal(object):
+    '''
+    Symmetric Gaussian random walk proposal with the given covariance
+    matrix, or independent widths if a 1-d array is given.
+    '''
+
+    def __init__(self, covariance):
+        covariance = np.atleast_1d(np.asarray(covariance, dtype=float))
+        if covariance.ndim == 1:
+            covariance = np.diag(covariance ** 2)
+        self.cholesky = np.linalg.cholesky(covariance)
+
+    def Propose(self, x, rng):
+        return x + self.cholesky.dot(rng.standard_normal(len(x)))
+
+    def Update(self, iStep, x, accepted):
+        pass
+
+
+def RunMetropolisHastings(nll, parameters, proposal, nIters, chain, seed=None, startValues=None,
+                          targetESS=None, essName=None, burnInSteps=0, checkInterval=1000,
+                          maxRHat=1.05):
+    '''
+    Run nIters steps of the Metropolis-Hastings algorithm on the function nll
+    (eg. from createNLL) of the RooRealVars in the RooArgList parameters,
+    storing the points in chain (a ChainStore or a HistogramChain).
+    proposal must be symmetric and provide Propose(x, rng) and
+    Update(iStep, x, accepted).
+
+    With targetESS, nIters is only the maximal number of steps: at least
+    every checkInterval steps (and every 10% of the chain length) the
+    effective sample size of parameter essName after burnInSteps steps and
+    its split R-hat are computed, and the chain stops once the ESS reaches
+    targetESS with R-hat below maxRHat.
+
+    Returns a dict with the number of steps, accepted steps and NLL
+    evaluations, and the final ESS and R-hat when targetESS is used.
+    '''
+    if targetESS is not None and not hasattr(chain, "Values"):
+        raise ValueError("targetESS needs a chain that stores the points, eg. a ChainStore")
+    rng = np.random.RandomState(seed)
+    params = [parameters.at(i) for i in range(parameters.getSize())]
+    lowEdges = np.array([p.getMin() for p in params])
+    highEdges = np.array([p.getMax() for p in params])
+
+    def evaluate(x):
+        for p, value in zip(params, x):
+            p.setVal(value)
+        return nll.getVal()
+
+    if startValues is None:
+        x = np.array([p.getVal() for p in params])
+    else:
+        x = np.asarray(startValues, dtype=float)
+    xNll = evaluate(x)
+    nEvaluations = 1
+    nAccepted = 0
+    weight = 1
+    ess = rHat = None
+    if targetESS is not None:
+        essIndex = chain.names.index(essName)
+        nextCheck = max(checkInterval, burnInSteps + 1)
+
+    nSteps = nIters
+    for iStep in range(1, nIters):
+        xPrime = proposal.Propose(x, rng)
+        # flat prior: points outside the ranges are never accepted
+        accepted = False
+        if np.all(xPrime >= lowEdges) and np.all(xPrime <= highEdges):
+            xPrimeNll = evaluate(xPrime)
+            nEvaluations += 1
+            if np.isfinite(xPrimeNll) and np.log(rng.uniform()) < xNll - xPrimeNll:
+                accepted = True
+
+        if accepted:
+            chain.Add(x, xNll, weight)
+            x, xNll, weight = xPrime, xPrimeNll, 1
+            nAccepted += 1
+        else:
+            weight += 1
+        proposal.Update(iStep, x, accepted)
+
+        if targetESS is not None and iStep == nextCheck:
+            # the checks get rarer as the chain grows, to keep their
+            # total cost proportional to the chain length
+            nextCheck = iStep + max(checkInterval, iStep // 10)
+            # the stored points plus the current one
+            steps = ExpandWeightedChain(np.append(chain.Values(essName), x[essIndex]),
+                                        np.append(chain.Weights(), weight))[burnInSteps:]
+            ess = EffectiveSampleSize(steps)
+            rHat = SplitRHat(steps)
+            if ess >= targetESS and rHat < maxRHat:
+                nSteps = iStep + 1
+                break
+
+    chain.Add(x, xNll, weight)
+    chain.Flush()
+    # leave the parameters at the last point of the chain
+    evaluate(x)
+    return {"nIters": nSteps, "nAccepted": nAccepted,
+            "nNLLEvaluations": nEvaluations + 1,
+            "acceptanceRate": nAccepted / float(max(nSteps - 1, 1)),
+            "ess": ess, "rHat": rHat}
+
+
+def ChainInterval(values, weights, confidenceLevel, leftSideTailFraction=-1., nBins=100):
+    '''
+    Interval on one parameter from the (weighted) points of a chain.
+
+    With leftSideTailFraction >= 0 the interval leaves that fraction of
+    (1 - confidenceLevel) on the left side (0.5 for central, 0 for an upper
+    limit), otherwise the shortest interval is found from a histogram with
+    nBins bins as for MCMCInterval.
+    '''
+    values = np.asarray(values)
+    weights = np.asarray(weights, dtype=float)
+    if leftSideTailFraction >= 0:
+        order = np.argsort(values)
+        cumulative = np.cumsum(weights[order])
+        cumulative /= cumulative[-1]
+        alpha = 1. - confidenceLevel
+        lowFraction = alpha * leftSideTailFraction
+        highFraction = 1. - alpha * (1. - leftSideTailFraction)
+        sortedValues = values[order]
+        lower = sortedValues[min(np.searchsorted(cumulative, lowFraction), len(values) - 1)]
+        upper = sortedValues[min(np.searchsorted(cumulative, highFraction), len(values) - 1)]
+        if leftSideTailFraction == 0:
+            lower = sortedValues[0]
+        return lower, upper
+
+    heights, edges = np.histogram(values, bins=nBins, weights=weights)
+    order = np.argsort(heights)[::-1]
+    content = np.cumsum(heights[order]) / heights.sum()
+    nKeep = np.searchsorted(content, confidenceLevel) + 1
+    kept = order[:nKeep]
+    return edges[kept.min()], edges[kept.max() + 1]
+
+
+def FillHistogramFromArrays(hist, columns, weights=None):
+    '''
+    Fill the TH1, TH2 or TH3 hist with the points given as a list of arrays
+    (one per axis), binning them with NumPy and setting only the non-empty
+    bins, instead of filling the histogram point by point.
+    '''
+    axes = [hist.GetXaxis(), hist.GetYaxis(), hist.GetZaxis()][:len(columns)]
+    edges = [np.array([axis.GetBinLowEdge(i) for i in range(1, axis.GetNbins() + 2)])
+             for axis in axes]
+    contents = np.histogramdd(np.column_stack(columns), bins=edges, weights=weights)[0]
+    for index in zip(*np.nonzero(contents)):
+        # ROOT bins start at 1, bin 0 is the underflow
+        hist.SetBinContent(hist.GetBin(*[int(i) + 1 for i in index]), contents[index])
+    hist.ResetStats()
+    return hist
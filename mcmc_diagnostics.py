@@ -0,0 +1,83 @@
+# /
+#
+# Convergence diagnostics for Markov chains
+#
+# The chains of the MetropolisHastings algorithm are stored with weights
+# (the number of steps the chain stayed at the same point).  The
+# functions below work on the unweighted sequence of steps, use
+# ExpandWeightedChain to get it from the stored chain.
+#
+# /
+
+
+import numpy as np
+
+
+def ExpandWeightedChain(values, weights):
+    '''
+    Return the sequence of steps of a chain stored as (values, weights),
+    where weights are the number of steps spent at each value.
+    '''
+    counts = np.rint(np.asarray(weights)).astype(int)
+    return np.repeat(np.asarray(values), counts)
+
+
+def GelmanRubin(chains):
+    '''
+    Gelman-Rubin potential scale reduction factor R-hat for a list of
+    chains of the same quantity.  Chains are truncated to the shortest one.
+    Values close to 1 indicate that the chains sample the same distribution.
+    '''
+    n = min(len(c) for c in chains)
+    if len(chains) < 2 or n < 2:
+        return np.nan
+    samples = np.array([np.asarray(c[:n], dtype=float) for c in chains])
+    chainMeans = samples.mean(axis=1)
+    # between and within chain variances
+    between = n * chainMeans.var(ddof=1)
+    within = samples.var(axis=1, ddof=1).mean()
+    if within == 0:
+        return np.nan
+    varianceEstimate = (n - 1.) / n * within + between / n
+    return np.sqrt(varianceEstimate / within)
+
+
+def Autocorrelation(x):
+    '''
+    Normalized autocorrelation function of the sequence x, computed with FFT.
+    '''
+    x = np.asarray(x, dtype=float)
+    n = len(x)
+    x = x - x.mean()
+    # zero padding to avoid the circular correlation
+    nFFT = 1 << (2 * n - 1).bit_length()
+    spectrum = np.fft.rfft(x, nFFT)
+    acf = np.fft.irfft(spectrum * np.conjugate(spectrum), nFFT)[:n]
+    if acf[0] == 0:
+        return np.zeros(n)
+    return acf / acf[0]
+
+
+def EffectiveSampleSize(x):
+    '''
+    Effective sample size of the sequence x, using Geyer's initial positive
+    sequence estimate of the integrated autocorrelation time.
+    '''
+    n = len(x)
+    if n < 4:
+        return float(n)
+    rho = Autocorrelation(x)
+    # sums of adjacent pairs are positive for a reversible chain,
+    # stop at the first one that is not
+    pairs = rho[:2 * (n // 2)].reshape(-1, 2).sum(axis=1)
+    nonPositive = np.flatnonzero(pairs <= 0)
+    nPairs = nonPositive[0] if len(nonPositive) else len(pairs)
+    tau = -1. + 2. * pairs[:nPairs].sum()
+    return n / max(tau, 1.)
+
+
+def SplitRHat(x, nSplits=2):
+    '''
+    R-hat of a single chain, comparing nSplits consecutive parts of it.
+    '''
+    return GelmanRubin(np.array_split(np.asarray(x), nSplits))
@@ -0,0 +1,127 @@
+# /
+#
+# Binned kernel density estimate of MCMC posteriors
+#
+# MCMCCalculator.SetUseKeys(True) smooths the chain with a RooNDKeysPdf,
+# which puts a kernel on every point of the chain, so that evaluating it
+# on the posterior histogram costs O(N_points x N_bins) and dominates the
+# MCMC step of rs401d_FeldmanCousins.
+#
+# Here the chain is first binned on a fine grid and the grid is convolved
+# with a Gaussian kernel using FFTs, in 1 to 3 dimensions.  The cost is
+# that of filling a histogram plus O(N_bins log N_bins), independent of
+# the chain length.  The grid is padded by a few kernel widths so that the
+# periodic convolution does not wrap around.  Intervals and contour levels
+# are then computed directly from the smoothed grid:
+#
+#   centres, density = BinnedKDE([values], weights, ranges=[(low, high)])
+#   lower, upper = KDEInterval(centres[0], density, 0.95)
+#   level = KDEContourLevel(density, 0.9)  # for 2-d contours
+#
+# /
+
+
+import numpy as np
+
+from contours import MarchingSquares
+# the intervals and levels of the smoothed grid are those of any density grid
+from density_grid import GridInterval as KDEInterval
+from density_grid import HighestDensityLevel as KDEContourLevel
+
+DEFAULT_BINS = {1: 512, 2: 128, 3: 48}
+
+
+def ScottBandwidth(samples, weights=None):
+    '''
+    Gaussian kernel width for each dimension from Scott's rule, using the
+    effective number of points of a weighted chain.
+    '''
+    dim = len(samples)
+    if weights is None:
+        weights = np.ones(len(samples[0]))
+    weights = np.asarray(weights, dtype=float)
+    nEff = weights.sum() ** 2 / (weights ** 2).sum()
+    widths = []
+    for x in samples:
+        x = np.asarray(x, dtype=float)
+        mean = np.average(x, weights=weights)
+        sigma = np.sqrt(np.average((x - mean) ** 2, weights=weights))
+        widths.append(sigma * nEff ** (-1. / (dim + 4)))
+    return np.array(widths)
+
+
+def BinnedKDE(samples, weights=None, nBins=None, bandwidth=None, ranges=None, nSigmaPad=3.):
+    '''
+    Kernel density estimate of the points samples (a list of 1 to 3 arrays,
+    one per dimension) with the given weights.
+
+    nBins is the number of grid bins per dimension inside ranges (by default
+    the range of the samples), bandwidth the Gaussian kernel width per
+    dimension (by default from ScottBandwidth).  The density is normalized
+    to 1 inside ranges, so that the probability outside parameter limits is
+    removed as for a truncated posterior.
+
+    Returns the list of bin centres per dimension and the density grid with
+    one axis per dimension, in the order of samples.
+    '''
+    dim = len(samples)
+    if dim < 1 or dim > 3:
+        raise ValueError("BinnedKDE supports 1 to 3 dimensions, got %d" % dim)
+    samples = [np.asarray(x, dtype=float) for x in samples]
+    if weights is None:
+        weights = np.ones(len(samples[0]))
+    weights = np.asarray(weights, dtype=float)
+    if nBins is None:
+        nBins = DEFAULT_BINS[dim]
+    nBins = np.broadcast_to(nBins, (dim,))
+    if bandwidth is None:
+        bandwidth = ScottBandwidth(samples, weights)
+    bandwidth = np.broadcast_to(np.asarray(bandwidth, dtype=float), (dim,))
+    if ranges is None:
+        ranges = [(x.min(), x.max()) for x in samples]
+
+    edges = []
+    inner = []
+    for (low, high), n, h in zip(ranges, nBins, bandwidth):
+        width = (high - low) / float(n)
+        nPad = int(np.ceil(nSigmaPad * h / width))
+        edges.append(low + width * np.arange(-nPad, n + nPad + 1))
+        inner.append(slice(nPad, nPad + n))
+
+    counts = np.histogramdd(np.column_stack(samples), bins=edges, weights=weights)[0]
+
+    # Gaussian kernel in Fourier space, the last axis uses the real FFT
+    spectrum = np.fft.rfftn(counts)
+    for axis, (e, h) in enumerate(zip(edges, bandwidth)):
+        nGrid = len(e) - 1
+        width = e[1] - e[0]
+        if axis == dim - 1:
+            freq = np.fft.rfftfreq(nGrid, width)
+        else:
+            freq = np.fft.fftfreq(nGrid, width)
+        shape = [1] * dim
+        shape[axis] = len(freq)
+        spectrum *= np.exp(-2. * (np.pi * h * freq) ** 2).reshape(shape)
+    smoothed = np.fft.irfftn(spectrum, counts.shape)
+
+    # remove the padding and the round-off below zero
+    density = np.maximum(smoothed[tuple(inner)], 0.)
+    centres = [0.5 * (e[1:] + e[:-1])[s] for e, s in zip(edges, inner)]
+    binVolume = np.prod([c[1] - c[0] for c in centres])
+    total = density.sum() * binVolume
+    if total > 0:
+        density /= total
+    return centres, density
+
+
+def KDEContours(centres, density, confidenceLevels):
+    '''
+    Contours of the highest posterior density regions of a 2-d density
+    grid, as a dict from confidence level to a list of polylines for
+    MakeContourGraphs.
+    '''
+    # MarchingSquares expects the grid as (y, x)
+    grid = density.T
+    return dict((cl, MarchingSquares(centres[0], centres[1], grid,
+                                     KDEContourLevel(density, cl)))
+                for cl in confidenceLevels)
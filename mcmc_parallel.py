@@ -0,0 +1,175 @@
+# /
+#
+# Multi-chain parallel MCMC
+#
+# MCMCCalculator runs a single Markov chain.  Here K independent chains are
+# run in parallel worker processes, each with its own copy of the workspace
+# (read from the ROOT file) and its own random seed.  MetropolisHastings
+# starts every chain from a random point in the parameter ranges, so
+# different seeds also give dispersed starting points.
+#
+# Each worker writes its MarkovChain to a ROOT file (in a temporary
+# directory unless outputDir is given).  The chains are then merged into a
+# single MCMCInterval, removing the burn-in of each chain separately, and
+# the Gelman-Rubin R-hat of the parameters of interest is computed from the
+# individual chains.
+#
+#   interval, rHat = RunParallelMCMC("rs101_ws.root", "w", "ModelConfig",
+#                                    "exampleData", nChains=8, nIters=20000,
+#                                    nBurnInSteps=40)
+#
+# /
+
+
+import multiprocessing
+import os
+import tempfile
+
+import ROOT
+
+from dataset_numpy import DataSetToArrays
+from mcmc_diagnostics import ExpandWeightedChain, GelmanRubin
+
+
+class SequentialProposalSetup(object):
+    '''
+    Configure the MCMCCalculator of every worker with a SequentialProposal.
+    Any picklable callable taking (mcmc, workspace, modelConfig, data) can be
+    used instead, eg. to build a ProposalHelper from a fit.
+    '''
+
+    def __init__(self, stepSize=0.1):
+        self.stepSize = stepSize
+
+    def __call__(self, mcmc, w, modelConfig, data):
+        proposal = ROOT.RooStats.SequentialProposal(self.stepSize)
+        mcmc.SetProposalFunction(proposal)
+        # the calculator does not own the proposal
+        return proposal
+
+
+class FitProposalSetup(object):
+    '''
+    Configure the MCMCCalculator of every worker with a ProposalHelper built
+    from the covariance matrix of a fit to the data, as in rs101_limitexample.
+    '''
+
+    def __init__(self, cacheSize=100):
+        self.cacheSize = cacheSize
+
+    def __call__(self, mcmc, w, modelConfig, data):
+        fit = modelConfig.GetPdf().fitTo(data, ROOT.RooFit.Save(True))
+        ph = ROOT.RooStats.ProposalHelper()
+        ph.SetVariables(ROOT.RooArgSet(fit.floatParsFinal()))
+        ph.SetCovMatrix(fit.covarianceMatrix())
+        ph.SetUpdateProposalParameters(True)
+        ph.SetCacheSize(self.cacheSize)
+        proposal = ph.GetProposalFunction()
+        mcmc.SetProposalFunction(proposal)
+        return (fit, ph, proposal)
+
+
+def _RunChain(args):
+    (iChain, fileName, workspaceName, modelConfigName, dataName,
+     nIters, seed, configure, outputDir) = args
+
+    ROOT.gROOT.SetBatch(True)
+    ROOT.RooRandom.randomGenerator().SetSeed(seed)
+
+    inputFile = ROOT.TFile.Open(fileName)
+    w = inputFile.Get(workspaceName)
+    modelConfig = w.obj(modelConfigName)
+    data = w.data(dataName)
+
+    mcmc = ROOT.RooStats.MCMCCalculator(data, modelConfig)
+    keepAlive = None
+    if configure is not None:
+        keepAlive = configure(mcmc, w, modelConfig, data)
+    mcmc.SetNumIters(nIters)
+    # burn-in is removed per chain when merging
+    mcmc.SetNumBurnInSteps(0)
+    interval = mcmc.GetInterval()
+
+    chainFileName = os.path.join(outputDir, "chain_%d.root" % iChain)
+    chainFile = ROOT.TFile(chainFileName, "RECREATE")
+    interval.GetChain().Write("chain")
+    chainFile.Close()
+    inputFile.Close()
+    del keepAlive
+    return chainFileName
+
+
+def RunParallelMCMC(fileName, workspaceName, modelConfigName, dataName,
+                    nChains=4, nIters=10000, nBurnInSteps=100, seed=1,
+                    configure=None, nWorkers=None, outputDir=None,
+                    confidenceLevel=0.95, leftSideTailFraction=-1.,
+                    useKeys=False, axes=None):
+    '''
+    Run nChains Markov chains of nIters steps in parallel and merge them.
+
+    Returns the merged MCMCInterval and a dict with the Gelman-Rubin R-hat
+    of each parameter of interest.  The merged chain is available from
+    interval.GetChain().  The chain files of the workers are kept in
+    outputDir if one is given, which the caller owns, otherwise they are
+    written to a temporary directory that is removed after the merge.
+    '''
+    removeOutput = outputDir is None
+    if removeOutput:
+        outputDir = tempfile.mkdtemp(prefix="mcmc_chains_")
+    if nWorkers is None:
+        nWorkers = min(nChains, multiprocessing.cpu_count())
+
+    jobs = [(i, fileName, workspaceName, modelConfigName, dataName,
+             nIters, seed + i, configure, outputDir) for i in range(nChains)]
+    pool = multiprocessing.Pool(nWorkers)
+    try:
+        chainFileNames = pool.map(_RunChain, jobs)
+    finally:
+        pool.close()
+        pool.join()
+
+    # the model is needed in the main process for the parameters
+    inputFile = ROOT.TFile.Open(fileName)
+    w = inputFile.Get(workspaceName)
+    modelConfig = w.obj(modelConfigName)
+    data = w.data(dataName)
+    poi = modelConfig.GetParametersOfInterest()
+    # same parameters as used by MCMCCalculator for the chain
+    parameters = modelConfig.GetPdf().getParameters(data)
+    ROOT.RooStats.RemoveConstantParameters(parameters)
+
+    merged = ROOT.RooStats.MarkovChain("mergedChain", "merged Markov chain", parameters)
+    poiNames = [p.GetName() for p in ROOT.RooArgList(poi)]
+    poiChains = dict((name, []) for name in poiNames)
+    for chainFileName in chainFileNames:
+        chainFile = ROOT.TFile.Open(chainFileName)
+        chain = chainFile.Get("chain")
+        merged.AddWithBurnIn(chain, nBurnInSteps)
+
+        # keep the POI samples of each chain for the diagnostics
+        arrays = DataSetToArrays(chain.GetAsConstDataSet(), poiNames)
+        for name in poiNames:
+            poiChains[name].append(ExpandWeightedChain(arrays[name][nBurnInSteps:],
+                                                       arrays["weight"][nBurnInSteps:]))
+        chainFile.Close()
+        # the merged chain holds a copy of the points
+        if removeOutput:
+            os.remove(chainFileName)
+    if removeOutput:
+        os.rmdir(outputDir)
+
+    interval = ROOT.RooStats.MCMCInterval("mergedMCMCInterval", poi, merged)
+    # the interval does not own the chain
+    ROOT.SetOwnership(merged, False)
+    interval.SetNumBurnInSteps(0)
+    interval.SetConfidenceLevel(confidenceLevel)
+    interval.SetUseKeys(useKeys)
+    if leftSideTailFraction >= 0:
+        interval.SetIntervalType(ROOT.RooStats.MCMCInterval.kTailFraction)
+        interval.SetLeftSideTailFraction(leftSideTailFraction)
+    if axes is not None:
+        interval.SetAxes(axes)
+
+    # the workspace read from the file keeps the parameters alive
+    rHat = dict((name, GelmanRubin(poiChains[name])) for name in poiNames)
+    return interval, rHat
@@ -0,0 +1,87 @@
+# /
+#
+# Multi-page PDF output for plot loops
+#
+# The plot loops of StandardHistFactoryPlotsWithCategories and
+# StandardProfileInspectorDemo save one PDF file per plot, to be merged
+# afterwards with ghostscript, and StandardHypoTestInvDemo squeezes the
+# test statistic distributions of all scan points on one divided canvas.
+# MultiPagePdf writes the pages to one PDF file as they are produced,
+# with the "file.pdf[", "file.pdf" and "file.pdf]" forms of TPad::Print,
+# and names every page in the PDF outline:
+#
+#   output = MultiPagePdf("variations.pdf")
+#   for frame in frames:
+#       output.AddObject(frame, title=frame.GetName())
+#   output.AddCanvas(c1, title="summary")
+#   output.Close()
+#
+# It can also be used in a with statement, which closes the file.
+#
+# /
+
+
+import ROOT
+
+
+class MultiPagePdf(object):
+    '''
+    PDF file fileName written one page at a time.  The file is opened with
+    the first page, so no file is written if there are no pages.
+    '''
+
+    def __init__(self, fileName, width=800, height=600):
+        self.fileName = fileName
+        self.width = width
+        self.height = height
+        self.nPages = 0
+        self._canvas = None
+        self._opened = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.Close()
+
+    def Canvas(self):
+        '''
+        Canvas of the pages drawn with AddObject.
+        '''
+        if self._canvas is None:
+            self._canvas = ROOT.TCanvas("multipage_" + self.fileName, self.fileName,
+                                        self.width, self.height)
+        return self._canvas
+
+    def AddCanvas(self, canvas, title=None):
+        '''
+        Append canvas as a page.
+        '''
+        if self._opened is None:
+            canvas.Print(self.fileName + "[")
+            self._opened = canvas
+        canvas.Print(self.fileName, "Title:" + title if title else "")
+        self.nPages += 1
+
+    def AddObject(self, obj, drawOption="", title=None, logY=False):
+        '''
+        Draw obj (eg. a RooPlot) alone on a page and append it.
+        '''
+        canvas = self.Canvas()
+        canvas.cd()
+        canvas.Clear()
+        canvas.SetLogy(logY)
+        obj.Draw(drawOption)
+        self.AddCanvas(canvas, title)
+
+    def Close(self):
+        '''
+        Close the file, the last call.
+        '''
+        if self._opened is not None:
+            self._opened.Print(self.fileName + "]")
+            self._opened = None
+        if self._canvas is not None:
+            self._canvas.Close()
+            self._canvas = None
+
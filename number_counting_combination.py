@@ -0,0 +1,202 @@
+# /
+#
+# Combination of many number counting channels
+#
+# NumberCountingPdfFactory builds one pair of RooPoisson terms per channel,
+#
+#   x_i ~ Pois(mu s_i + b_i),   y_i ~ Pois(tau_i b_i)
+#
+# with a common signal strength mu (masterSignal), and
+# ProfileLikelihoodCalculator minimizes over mu and all the b_i with Migrad.
+# With hundreds or thousands of channels that scales badly, but for fixed mu
+# every b_i has its own closed-form conditional maximum, the positive root
+# of
+#
+#   (1 + tau_i) b^2 + ((1 + tau_i) mu s_i - x_i - y_i) b - y_i mu s_i = 0
+#
+# so the profile likelihood is a function of mu only, evaluated for all the
+# channels at once with array operations.  It is convex, and its
+# derivative, from the envelope theorem
+#
+#   dNLL/dmu = sum_i s_i (1 - x_i / (mu s_i + b_i))
+#
+# is monotonic, so the fit and the interval are one dimensional root
+# searches.  The NLL is the Poisson deviance (without the constant terms),
+# which gives the same likelihood ratios as the RooFit model.  As in
+# RooPoisson the counts are rounded down unless noRounding is set.
+#
+#   combination = NumberCountingCombination.FromObserved(s, mainMeas, bkgMeas, dbMeas)
+#   muHat = combination.Fit()
+#   lower, upper = combination.Interval(0.95)
+#   z, pValue = combination.Significance()
+#
+# /
+
+
+import numpy as np
+from scipy import optimize, special, stats
+
+
+class NumberCountingCombination(object):
+    '''
+    Profile likelihood of the signal strength mu >= 0 for the number
+    counting channels with expected signal s, main measurements x,
+    auxiliary measurements y and ratios tau of the background in the
+    auxiliary and the main measurement (arrays of the number of channels).
+    x and y are rounded down unless noRounding is set.
+    '''
+
+    def __init__(self, s, x, y, tau, muRange=(0., None), noRounding=False):
+        self.s, self.x, self.y, self.tau = [np.asarray(v, dtype=float) for v in (s, x, y, tau)]
+        if not noRounding:
+            self.x, self.y = np.floor(self.x), np.floor(self.y)
+        if muRange[0] < 0:
+            raise ValueError("the closed-form profile needs mu >= 0")
+        self.muRange = muRange
+        self._fit = None
+
+    @classmethod
+    def FromExpected(cls, s, b, db, **options):
+        '''
+        Expected data, as NumberCountingPdfFactory.AddExpData: x = s + b,
+        y = tau b with tau = 1 / (b db^2) for the fractional background
+        uncertainties db.
+        '''
+        s, b, db = [np.asarray(v, dtype=float) for v in (s, b, db)]
+        tau = 1. / b / db ** 2
+        return cls(s, s + b, b * tau, tau, **options)
+
+    @classmethod
+    def FromObserved(cls, s, mainMeas, bkgMeas, dbMeas, **options):
+        '''
+        Observed data, as NumberCountingPdfFactory.AddData.
+        '''
+        bkgMeas, dbMeas = [np.asarray(v, dtype=float) for v in (bkgMeas, dbMeas)]
+        tau = 1. / bkgMeas / dbMeas ** 2
+        return cls(s, mainMeas, bkgMeas * tau, tau, **options)
+
+    @classmethod
+    def FromSideband(cls, s, mainMeas, sideband, tau, **options):
+        '''
+        Observed data with a sideband, as
+        NumberCountingPdfFactory.AddDataWithSideband.
+        '''
+        return cls(s, mainMeas, sideband, tau, **options)
+
+    @classmethod
+    def FromWorkspace(cls, wspace, dataName, nChannels, **options):
+        '''
+        Channels of a workspace made by NumberCountingPdfFactory (variables
+        expected_s_i and tau_i, data x_i and y_i).
+        '''
+        row = wspace.data(dataName).get(0)
+        s, x, y, tau = [np.array([getter(i) for i in range(nChannels)]) for getter in (
+            lambda i: wspace.var("expected_s_%d" % i).getVal(),
+            lambda i: row.getRealValue("x_%d" % i),
+            lambda i: row.getRealValue("y_%d" % i),
+            lambda i: wspace.var("tau_%d" % i).getVal())]
+        return cls(s, x, y, tau, **options)
+
+    def JointNLL(self, mu, b):
+        '''
+        NLL of the signal strength mu and the backgrounds b (an array of
+        the number of channels, or with leading dimensions broadcasting
+        against mu[..., np.newaxis]) and its gradient with respect to mu
+        and to b.
+        '''
+        mu = np.asarray(mu, dtype=float)[..., np.newaxis]
+        b = np.asarray(b, dtype=float)
+        mean = mu * self.s + b
+        tauB = self.tau * b
+        nll = (mean - special.xlogy(self.x, mean) + tauB - special.xlogy(self.y, tauB)).sum(axis=-1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            dMain = 1. - np.where(self.x > 0, self.x / mean, 0.)
+            dAux = self.tau - np.where(self.y > 0, self.y / b, 0.)
+        return nll, (self.s * dMain).sum(axis=-1), dMain + dAux
+
+    def ProfiledBackground(self, mu):
+        '''
+        Conditional maximum likelihood backgrounds for the signal strengths
+        mu, an array of shape mu.shape + (number of channels,).
+        '''
+        signal = np.asarray(mu, dtype=float)[..., np.newaxis] * self.s
+        a = 1. + self.tau
+        linear = a * signal - self.x - self.y
+        root = np.sqrt(linear ** 2 + 4. * a * self.y * signal)
+        # the two forms of the positive root, without cancellation
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(linear <= 0., (root - linear) / (2. * a),
+                            2. * self.y * signal / (root + linear))
+
+    def ProfiledNLL(self, mu):
+        '''
+        Profile NLL of mu (any shape) and its derivative.
+        '''
+        nll, dMu, dB = self.JointNLL(mu, self.ProfiledBackground(mu))
+        return nll, dMu
+
+    def Fit(self):
+        '''
+        Maximum likelihood signal strength within the range of mu.
+        '''
+        if self._fit is not None:
+            return self._fit
+        derivative = lambda mu: float(self.ProfiledNLL(mu)[1])
+        low, high = self.muRange
+        if derivative(low) >= 0:
+            self._fit = low
+        else:
+            high = self._Bracket(derivative, low, 0.)
+            self._fit = optimize.brentq(derivative, low, high, xtol=1e-10)
+        return self._fit
+
+    def _Bracket(self, f, low, target):
+        '''
+        Upper end of a bracket of f(mu) = target above low, for increasing f,
+        within the range of mu.
+        '''
+        high = self.muRange[1]
+        if high is not None:
+            return high
+        # step of the order of the statistical error of mu
+        step = max(np.sqrt(self.x.sum() + 1.) / max(self.s.sum(), 1e-300), 1e-3)
+        high = low + step
+        while f(high) < target:
+            step *= 2.
+            high = low + step
+        return high
+
+    def ProfileLikelihoodRatio(self, mu):
+        '''
+        -2 log of the profile likelihood ratio at mu (any shape).
+        '''
+        muHat = self.Fit()
+        return 2. * (self.ProfiledNLL(mu)[0] - self.ProfiledNLL(muHat)[0])
+
+    def Significance(self, mu0=0.):
+        '''
+        One-sided significance sqrt(q) of the hypothesis mu = mu0 and its
+        p-value, as the HypoTestResult of ProfileLikelihoodCalculator.
+        '''
+        if self.Fit() <= mu0:
+            z = 0.
+        else:
+            z = np.sqrt(max(float(self.ProfileLikelihoodRatio(mu0)), 0.))
+        return z, stats.norm.sf(z)
+
+    def Interval(self, cl=0.95):
+        '''
+        Profile likelihood interval of mu, as the LikelihoodInterval of
+        ProfileLikelihoodCalculator with confidence level cl.
+        '''
+        threshold = stats.chi2.ppf(cl, 1)
+        muHat = self.Fit()
+        q = lambda mu: float(self.ProfileLikelihoodRatio(mu)) - threshold
+        low = self.muRange[0]
+        if muHat == low or q(low) <= 0:
+            lower = low
+        else:
+            lower = optimize.brentq(q, low, muHat, xtol=1e-10)
+        high = self._Bracket(q, muHat, 0.)
+        upper = high if q(high) <= 0 else optimize.brentq(q, muHat, high, xtol=1e-10)
+        return lower, upper
@@ -14,9 +14,12 @@
 
 
 import ROOT
+from dataset_numpy import DataSetToArrays
+from mcmc_chain import FillHistogramFromArrays
+from mcmc_parallel import FitProposalSetup, RunParallelMCMC
 
 
-def rs101_limitexample():
+def rs101_limitexample(nParallelChains=0):
     # /
     # An example of setting a limit in a number counting experiment with uncertainty on background and signal
     # /
@@ -140,6 +143,15 @@ def rs101_limitexample():
     mc.SetLeftSideTailFraction(0.5)  # find a "central" interval
     mcInt = mc.GetInterval()  # that was easy
 
+    # Optionally, run several chains in parallel worker processes using
+    # the workspace saved above and merge them into one interval
+    if nParallelChains > 0:
+        mcInt, rHat = RunParallelMCMC("rs101_ws.root", "w", "ModelConfig", "exampleData",
+                                      nChains=nParallelChains, nIters=20000,
+                                      nBurnInSteps=40, configure=FitProposalSetup(100),
+                                      confidenceLevel=0.95, leftSideTailFraction=0.5)
+        print "Gelman-Rubin R-hat for s = ", rHat["s"]
+
     # Get Lower and Upper limits from Profile Calculator
     print "Profile lower limit s = ", lrint.LowerLimit(s)
     print "Profile upper limit s = ", lrint.UpperLimit(s)
@@ -172,19 +184,24 @@ def rs101_limitexample():
 
     # 3-d plot of the parameter points
     dataCanvas.cd(2)
-    # also plot the points in the markov chain
-    chainData = mcInt.GetChainAsDataSet()
+    # also plot the points in the markov chain.
+    # Read the columns of the chain directly, without copying it
+    # into another RooDataSet and a TTree first
+    chainData = mcInt.GetChain().GetAsConstDataSet()
 
     assert(chainData)
     print "plotting the chain data - nentries = ", chainData.numEntries()
-    chain = ROOT.RooStats.GetAsTTree(
-        "chainTreeData", "chainTreeData", chainData)
-    assert(chain)
-    chain.SetMarkerStyle(6)
-    chain.SetMarkerColor(ROOT.kRed)
-
-    chain.Draw("s:ratioSigEff:ratioBkgEff", "nll_MarkovChain_local_",
-               "box")  # 3-d box proporional to posterior
+    chain = DataSetToArrays(chainData, ["ratioBkgEff", "ratioSigEff", "s",
+                                        "nll_MarkovChain_local_"])
+    chainHist = ROOT.TH3F("chainHist", "", 20, ratioBkgEff.getMin(), ratioBkgEff.getMax(),
+                          20, ratioSigEff.getMin(), ratioSigEff.getMax(),
+                          20, s.getMin(), s.getMax())
+    FillHistogramFromArrays(chainHist, [chain["ratioBkgEff"], chain["ratioSigEff"], chain["s"]],
+                            chain["nll_MarkovChain_local_"])
+    chainHist.SetMarkerStyle(6)
+    chainHist.SetMarkerColor(ROOT.kRed)
+
+    chainHist.Draw("box")  # 3-d box proporional to posterior
 
     # the points used in the profile construction
     parScanData = fc.GetPointsToScan()
@@ -194,14 +211,10 @@ def rs101_limitexample():
     # parameterScan =  ROOT.RooStats.GetAsTTree("parScanTreeData", "parScanTreeData",*parScanData)
     # assert(parameterScan)
     # parameterScan.Draw("s:ratioSigEff:ratioBkgEff", "", "candle goff")
-    gr = ROOT.TGraph2D(parScanData.numEntries())
-    for ievt in range(parScanData.numEntries()):
-        evt = parScanData.get(ievt)
-        x = evt.getRealValue("ratioBkgEff")
-        y = evt.getRealValue("ratioSigEff")
-        z = evt.getRealValue("s")
-        gr.SetPoint(ievt, x, y, z)
-        # std.print ievt << "  " << x << "  " << y << "  " << z << std.endl
+    # export the scanned points once and fill the graph from the arrays
+    scan = DataSetToArrays(parScanData, ["ratioBkgEff", "ratioSigEff", "s"])
+    gr = ROOT.TGraph2D(parScanData.numEntries(), scan["ratioBkgEff"],
+                       scan["ratioSigEff"], scan["s"])
 
     gr.SetMarkerStyle(24)
     gr.Draw("P SAME")
@@ -20,10 +20,15 @@
 # /
 
 
+import os
+
 import ROOT
+import numpy as np
+from dataset_numpy import DataSetToArrays
+from splot import AddSWeights, ChunkedSPlot, NumpyChunkSource, SPlotWeights, SWeightedViews
 
 
-def rs301_splot():
+def rs301_splot(doChunkedSPlot=False, nThreads=1):
 
     # Create a workspace to manage the project.
     wspace = ROOT.RooWorkspace("myWS")
@@ -40,12 +45,17 @@ def rs301_splot():
 
     # do sPlot.
     # This wil make a dataset with sWeights added for every event.
-    DoSPlot(wspace)
+    DoSPlot(wspace, nThreads)
 
     # Make some plots showing the discriminating variable and
     # the control variable after unfolding.
     MakePlots(wspace)
 
+    # the same sPlot, reading the events in chunks from files as for
+    # datasets that do not fit in memory
+    if doChunkedSPlot:
+        DoChunkedSPlot(wspace)
+
 
 # ____________________________________
 def AddModel(ws):
@@ -158,7 +168,7 @@ def AddData(ws):  # Add a toy dataset
 
 
 # ____________________________________
-def DoSPlot(ws):
+def DoSPlot(ws, nThreads=1):
 
     print "Calculate sWeights"
 
@@ -180,21 +190,23 @@ def DoSPlot(ws):
 
     ROOT.RooMsgService.instance().setSilentMode(True)
 
-    # Now we use the SPlot class to add SWeights to our data set
-    # based on our model and our yield variables
-    sData = ROOT.RooStats.SPlot("sData", "An SPlot",
-                                data, model, ROOT.RooArgList(zYield, qcdYield))
+    # Now we compute the sWeights for all events at once, based on our
+    # model and our yield variables, and add them to our data set as
+    # zYield_sw and qcdYield_sw, as the SPlot class does
+    # with nThreads > 1 the pdfs are evaluated in parallel threads
+    sWeights, covariance = SPlotWeights(data, model, ROOT.RooArgList(zYield, qcdYield), nThreads)
+    AddSWeights(data, sWeights, ["zYield", "qcdYield"])
 
     # Check that our weights have the desired properties
 
     print "Check SWeights:"
 
-    print "Yield of Z is ", zYield.getVal(), ".  From sWeights it is ", sData.GetYieldFromSWeight("zYield")
+    print "Yield of Z is ", zYield.getVal(), ".  From sWeights it is ", sWeights[:, 0].sum()
 
-    print "Yield of QCD is ", qcdYield.getVal(), ".  From sWeights it is ", sData.GetYieldFromSWeight("qcdYield")
+    print "Yield of QCD is ", qcdYield.getVal(), ".  From sWeights it is ", sWeights[:, 1].sum()
 
     for i in range(10):
-        print "z Weight   ", sData.GetSWeight(i, "zYield"), "   qcd Weight   ", sData.GetSWeight(i, "qcdYield"), "  ROOT.Total Weight   ", sData.GetSumOfEventSWeight(i)
+        print "z Weight   ", sWeights[i, 0], "   qcd Weight   ", sWeights[i, 1], "  Total Weight   ", sWeights[i].sum()
 
     print ""
 
@@ -203,6 +215,33 @@ def DoSPlot(ws):
     getattr(ws, 'import')(data, ROOT.RooFit.Rename("dataWithSWeights"))
 
 
+# ____________________________________
+def DoChunkedSPlot(ws, directory="rs301_chunks", chunkSize=250):
+
+    print "Calculate sWeights in chunks of ", chunkSize, " events"
+
+    model = ws.pdf("model")
+    zYield = ws.var("zYield")
+    qcdYield = ws.var("qcdYield")
+    observables = ROOT.RooArgSet(ws.var("invMass"), ws.var("isolation"))
+    names = ["invMass", "isolation"]
+
+    # write the toy data as one .npy file per variable, in real life
+    # these would be the output of the event selection
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    arrays = DataSetToArrays(ws.data("data"), names)
+    for name in names:
+        np.save(os.path.join(directory, name + ".npy"), arrays[name])
+
+    result = ChunkedSPlot(NumpyChunkSource(directory, names), model,
+                          ROOT.RooArgList(zYield, qcdYield), observables,
+                          directory, chunkSize, nYieldPasses=1)
+    for name in ["zYield", "qcdYield"]:
+        sWeights = np.load(result["files"][name], mmap_mode="r")
+        print "Yield of ", name, " is ", result["yields"][name], ".  From sWeights it is ", sWeights.sum()
+
+
 def MakePlots(ws):
     # Here we make plots of the discriminating variable (invMass) after the fit
     # and of the control variable (isolation) after unfolding with sPlot.
@@ -250,28 +289,27 @@ def MakePlots(ws):
 
     # Plot isolation for Z component.
     # Do self by plotting all events weighted by the sWeight for the Z component.
-    # ROOT.The SPlot class adds a variable that has the name of the corresponding
+    # AddSWeights, like the SPlot class, adds a variable that has the name of the corresponding
     # yield + "_sw".
     cdata.cd(2)
 
-    # create weightfed data set
-    dataw_z = ROOT.RooDataSet(data.GetName(), data.GetTitle(),
-                           data, data.get(), "", "zYield_sw")
+    # create weighted views of the data set, they share the isolation
+    # values instead of copying the data set for each species
+    views = SWeightedViews(data, ["zYield", "qcdYield"], ["isolation"])
 
     frame2 = isolation.frame()
-    dataw_z.plotOn(frame2, ROOT.RooFit.DataError(ROOT.RooAbsData.SumW2))
+    views["zYield"].PlotOn(frame2, isolation)
 
     frame2.SetTitle("isolation distribution for Z")
     frame2.Draw()
 
     # Plot isolation for QCD component.
     # Eg. plot all events weighted by the sWeight for the QCD component.
-    # ROOT.The SPlot class adds a variable that has the name of the corresponding
+    # AddSWeights, like the SPlot class, adds a variable that has the name of the corresponding
     # yield + "_sw".
     cdata.cd(3)
-    dataw_qcd = ROOT.RooDataSet(data.GetName(), data.GetTitle(), data, data.get(), "", "qcdYield_sw")
     frame3 = isolation.frame()
-    dataw_qcd.plotOn(frame3, ROOT.RooFit.DataError(ROOT.RooAbsData.SumW2))
+    views["qcdYield"].PlotOn(frame3, isolation)
 
     frame3.SetTitle("isolation distribution for QCD")
     frame3.Draw()
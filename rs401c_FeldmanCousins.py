@@ -14,9 +14,11 @@
 
 
 import ROOT
+from belt_utils import GetIntervalsFromBelt, GetIntervalLimits, GetPointSetMembership
+from dataset_numpy import DataSetToArrays
 
 
-def rs401c_FeldmanCousins():
+def rs401c_FeldmanCousins(nExtraDatasets=0):
     # to time the macro... about 30 s
     t = ROOT.TStopwatch()
     t.Start()
@@ -54,6 +56,8 @@ def rs401c_FeldmanCousins():
     # observed
     fc.FluctuateNumDataEntries(False)
     fc.SetNBins(100)  # number of points to test per parameter
+    # keep the belt so that further datasets can reuse it
+    fc.CreateConfBelt(True)
 
     # use the Feldman-Cousins tool
     interval = fc.GetInterval()
@@ -76,16 +80,15 @@ def rs401c_FeldmanCousins():
     hist = parameterScan.createHistogram("mu", 30)
     hist.Draw()
 
-    tmpPoint = ROOT.RooArgSet()
+    # read all the points to test and their membership at once
+    muValues = DataSetToArrays(parameterScan, ["mu"])["mu"]
+    inInterval = GetPointSetMembership(parameterScan, interval, ["mu"])
     mark = []
     # loop over points to test
     for i in range(parameterScan.numEntries()):
         # print "on parameter point ", i, " out of ", parameterScan.numEntries()
-        # get a parameter point from the list of points to test.
-        tmpPoint = parameterScan.get(i).clone("temp")
-
-        mark.append(ROOT.TMarker(tmpPoint.getRealValue("mu"), 1, 25))
-        if interval.IsInInterval(tmpPoint):
+        mark.append(ROOT.TMarker(muValues[i], 1, 25))
+        if inInterval[i]:
             mark[i].SetMarkerColor(ROOT.kBlue)
         else:
             mark[i].SetMarkerColor(ROOT.kRed)
@@ -95,6 +98,18 @@ def rs401c_FeldmanCousins():
         #    delete mark
 
     intervalCanvas.SaveAs("rs401c_FeldmanCousins.png")
+
+    # intervals for extra datasets (eg. for the expected sensitivity) only
+    # need the test statistic along the belt points, not a new construction
+    if nExtraDatasets > 0:
+        extraCounts = [[pois.generate(ROOT.RooArgSet(x), 1).get(0).getRealValue("x")]
+                       for i in range(nExtraDatasets)]
+        inInterval = GetIntervalsFromBelt(fc.GetConfidenceBelt(), parameterScan,
+                                          fc.GetTestStatSampler(), extraCounts,
+                                          ROOT.RooArgSet(x))
+        lower, upper = GetIntervalLimits(parameterScan, inInterval, "mu")
+        for i in range(nExtraDatasets):
+            print "n = ", extraCounts[i][0], " interval is [", lower[i], ", ", upper[i], "]"
     t.Stop()
     t.Print()
 
@@ -15,9 +15,13 @@
 
 
 import ROOT
+from belt_utils import GetPointSetMembership
+from contours import GetContours, MakeContourGraphs
+from dataset_numpy import DataSetToArrays
+from mcmc_kde import BinnedKDE, KDEContours
 
 
-def rs401d_FeldmanCousins(doFeldmanCousins=False, doMCMC=True):
+def rs401d_FeldmanCousins(doFeldmanCousins=False, doMCMC=True, useBinnedKDE=False):
 
     # to time the macro
     t = ROOT.TStopwatch()
@@ -221,7 +225,8 @@ def rs401d_FeldmanCousins(doFeldmanCousins=False, doMCMC=True):
         mc = ROOT.RooStats.MCMCCalculator(data, modelConfig)
         mc.SetNumIters(5000)
         mc.SetNumBurnInSteps(100)
-        mc.SetUseKeys(True)
+        # the binned KDE below replaces the keys pdf of the whole chain
+        mc.SetUseKeys(not useBinnedKDE)
         mc.SetTestSize(.1)
         # set which is x and y axis in posterior histogram
         mc.SetAxes(axisList)
@@ -236,34 +241,23 @@ def rs401d_FeldmanCousins(doFeldmanCousins=False, doMCMC=True):
 
     dataCanvas.cd(4)
 
-    # first plot a small dot for every point tested
+    # first draw the Feldman-Cousins contour
+    contourGraphs = []
     if doFeldmanCousins:
         parameterScan = fc.GetPointsToScan()
-        hist = parameterScan.createHistogram("sinSq2theta:deltaMSq", 30, 30)
-        #  hist.Draw()
-        forContour = hist.Clone()
-
-        # now loop through the points and put a marker if it's in the interval
-        tmpPoint = ROOT.RooArgSet()
-        # loop over points to test
-        for i in range(parameterScan.numEntries()):
-            # get a parameter point from the list of points to test.
-            tmpPoint = parameterScan.get(i).clone("temp")
-
-            if interval:
-                if interval.IsInInterval(tmpPoint):
-                    forContour.SetBinContent(hist.FindBin(tmpPoint.getRealValue("sinSq2theta"),
-                                                          tmpPoint.getRealValue("deltaMSq")), 1)
-                else:
-                    forContour.SetBinContent(hist.FindBin(tmpPoint.getRealValue("sinSq2theta"),
-                                                          tmpPoint.getRealValue("deltaMSq")), 0)
 
+        # find which scanned points are in the interval and
+        # draw the contour of the membership flags
         if interval:
+            names = ["sinSq2theta", "deltaMSq"]
+            scan = DataSetToArrays(parameterScan, names)
+            inInterval = GetPointSetMembership(parameterScan, interval, names)
             level = 0.5
-            forContour.SetContour(1, level)
-            forContour.SetLineWidth(2)
-            forContour.SetLineColor(ROOT.kRed)
-            forContour.Draw("cont2,same")
+            lines = GetContours(scan["sinSq2theta"], scan["deltaMSq"],
+                                inInterval, [level])[level]
+            contourGraphs = MakeContourGraphs(lines, ROOT.kRed, 2)
+            for graph in contourGraphs:
+                graph.Draw("L SAME")
 
     mcPlot = 0
     if mcInt:
@@ -272,6 +266,24 @@ def rs401d_FeldmanCousins(doFeldmanCousins=False, doMCMC=True):
         mcPlot.SetLineColor(ROOT.kMagenta)
         mcPlot.Draw()
 
+        if useBinnedKDE:
+            # smoothed posterior of the chain after burn-in, in the axes of mcPlot
+            names = [deltaMSq.GetName(), sinSq2theta.GetName()]
+            chain = DataSetToArrays(mcInt.GetChain().GetAsConstDataSet(), names)
+            # MCMCInterval skips the first GetNumBurnInSteps() entries of
+            # the chain, not weighted steps
+            burnIn = mcInt.GetNumBurnInSteps()
+            centres, density = BinnedKDE([chain[n][burnIn:] for n in names],
+                                         chain["weight"][burnIn:],
+                                         ranges=[(deltaMSq.getMin(), deltaMSq.getMax()),
+                                                 (sinSq2theta.getMin(), sinSq2theta.getMax())])
+            lines = KDEContours(centres, density, [mcInt.ConfidenceLevel()])[mcInt.ConfidenceLevel()]
+            kdeGraphs = MakeContourGraphs(lines, ROOT.kMagenta, 2)
+            for graph in kdeGraphs:
+                graph.SetLineStyle(2)
+                graph.Draw("L SAME")
+            contourGraphs += kdeGraphs
+
     dataCanvas.Update()
 
     plotInt = ROOT.RooStats.LikelihoodIntervalPlot(plcInterval)
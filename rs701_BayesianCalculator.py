@@ -10,9 +10,10 @@
 
 
 import ROOT
+from bayesian_scan import MakePosteriorPlot, PosteriorInterval, ScanCalculatorPosterior
 
 
-def rs701_BayesianCalculator(useBkg=True, confLevel=0.90):
+def rs701_BayesianCalculator(useBkg=True, confLevel=0.90, nScanPoints=200):
 
     w = ROOT.RooWorkspace("w", True)
     w.factory("SUM::pdf(s[0.001,15]*Uniform(x[0,1]),b[1,0,2]*Uniform(x))")
@@ -39,14 +40,18 @@ def rs701_BayesianCalculator(useBkg=True, confLevel=0.90):
         nuisPar = nuisanceParameters
     # if not useBkg) ((ROOT.RooRealVar *)w.var("b")).setVal(0:
 
+    # the posterior of each prior is scanned once and reused for the
+    # intervals and the plots
     size = 1. - confLevel
     print "\nBayesian Result using a Flat prior "
     bcalc = ROOT.RooStats.BayesianCalculator(data, model, ROOT.RooArgSet(POI), priorPOI, nuisPar)
     bcalc.SetTestSize(size)
-    interval = bcalc.GetInterval()
+    poiValues, density = ScanCalculatorPosterior(bcalc, POI, nScanPoints)
+    interval = PosteriorInterval(poiValues, density, confLevel)
     cl = bcalc.ConfidenceLevel()
-    print cl, "% CL central interval: [ ", interval.LowerLimit(), " - ", interval.UpperLimit(), " ] or ", cl + (1. - cl) / 2, "% CL limits\n"
-    plot = ROOT.RooPlot = bcalc.GetPosteriorPlot()
+    print cl, "% CL central interval: [ ", interval[0], " - ", interval[1], " ] or ", cl + (1. - cl) / 2, "% CL limits\n"
+    print cl, "% CL upper limit: ", PosteriorInterval(poiValues, density, confLevel, 0.)[1]
+    plot = MakePosteriorPlot(POI, poiValues, density, interval)
     c1 = ROOT.TCanvas("c1", "Bayesian Calculator Result")
     c1.Divide(1, 2)
     c1.cd(1)
@@ -56,11 +61,13 @@ def rs701_BayesianCalculator(useBkg=True, confLevel=0.90):
     print "\nBayesian Result using a 1/sqrt(s) prior  "
     bcalc2 = ROOT.RooStats.BayesianCalculator(data, model, ROOT.RooArgSet(POI), priorPOI2, nuisPar)
     bcalc2.SetTestSize(size)
-    interval2 = bcalc2.GetInterval()
+    poiValues2, density2 = ScanCalculatorPosterior(bcalc2, POI, nScanPoints)
+    interval2 = PosteriorInterval(poiValues2, density2, confLevel)
     cl = bcalc2.ConfidenceLevel()
-    print cl, "% CL central interval: [ ", interval2.LowerLimit(), " - ", interval2.UpperLimit(), " ] or ", cl + (1. - cl) / 2, "% CL limits\n"
+    print cl, "% CL central interval: [ ", interval2[0], " - ", interval2[1], " ] or ", cl + (1. - cl) / 2, "% CL limits\n"
+    print cl, "% CL upper limit: ", PosteriorInterval(poiValues2, density2, confLevel, 0.)[1]
 
-    plot2 = bcalc2.GetPosteriorPlot()
+    plot2 = MakePosteriorPlot(POI, poiValues2, density2, interval2)
     c1.cd(2)
     plot2.Draw()
     ROOT.gPad.SetLogy()
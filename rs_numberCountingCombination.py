@@ -25,8 +25,11 @@
 
 
 import ROOT
+import numpy as np
 from array import array
 
+from number_counting_combination import NumberCountingCombination
+
 
 ######################
 # main driver to choose one
@@ -37,6 +40,8 @@ def rs_numberCountingCombination(flag=1):
         rs_numberCountingCombination_observed()
     if flag == 3:
         rs_numberCountingCombination_observedWithTau()
+    if flag == 4:
+        rs_numberCountingCombination_manyChannels()
 
 
 # /
@@ -376,5 +381,39 @@ def rs_numberCountingCombination_observedWithTau():
     print "upper limit on signal = ",   lrint.UpperLimit(mu)
 
 
+def rs_numberCountingCombination_manyChannels(nChannels=1000):
+
+    # /
+    # With many channels the fit over masterSignal and all the b_i is slow.
+    # NumberCountingCombination profiles every b_i in closed form, so only
+    # a one dimensional fit of masterSignal is left.
+
+    # the two channels of rs_numberCountingCombination_observed give the
+    # same result as the ProfileLikelihoodCalculator
+    s = np.array([20., 10.])
+    combination = NumberCountingCombination.FromObserved(s, [123., 117.], [111.23, 98.76],
+                                                         [.011, .0095])
+    z, pValue = combination.Significance()
+    print "-------------------------------------------------"
+    print "The p-value for the null is ", pValue
+    print "Corresponding to a signifcance of ", z
+    print "-------------------------------------------------\n\n"
+
+    # many channels with a signal strength of 1.2
+    rng = np.random.RandomState(1234)
+    s = rng.uniform(0.5, 5., nChannels)
+    b = rng.uniform(10., 100., nChannels)
+    tau = rng.uniform(1., 10., nChannels)
+    mainMeas = rng.poisson(1.2 * s + b)
+    sideband = rng.poisson(tau * b)
+    combination = NumberCountingCombination.FromSideband(s, mainMeas, sideband, tau)
+    lower, upper = combination.Interval(0.95)
+    z, pValue = combination.Significance()
+    print nChannels, "channels: masterSignal = ", combination.Fit()
+    print "lower limit on signal = ", lower
+    print "upper limit on signal = ", upper
+    print "signifcance of masterSignal = 0: ", z
+
+
 if __name__ == "__main__":
     rs_numberCountingCombination()
@@ -34,6 +34,8 @@
 
 
 import ROOT
+import numpy as np
+import number_counting
 
 
 def rs_numbercountingutils():
@@ -117,6 +119,17 @@ def rs_numbercountingutils():
         observed, bExpected, tau)
     print "observed p-value =", pObsWithTau, "  Z value (Gaussian sigma) = ", zObsWithTau
 
+    # /
+    # number_counting has the same functions for NumPy arrays, eg. to scan
+    # many cut points at once without one call per point
+    ##########################
+    sScan = np.linspace(10, 100, 10)
+    bScan = np.array([50., 100., 200.])
+    # Z for every (s, b) pair, broadcasting to a 10 x 3 array
+    zScan = number_counting.BinomialExpZ(sScan[:, np.newaxis], bScan, relativeBkgUncert)
+    for b, zValues in zip(bScan, zScan.T):
+        print "b =", b, "  expected Z for s in", sScan[0], "...", sScan[-1], ":", np.round(zValues, 3)
+
 
 if __name__ == "__main__":
     rs_numbercountingutils()
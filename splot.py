@@ -0,0 +1,443 @@
+# /
+#
+# Vectorized sWeights
+#
+# RooStats.SPlot evaluates every component pdf event by event, and
+# GetSWeight / GetSumOfEventSWeight loop over the events again.  Here the
+# component pdfs of the extended model are evaluated over the whole dataset
+# into an (N_events x N_species) array, in bulk with RooAbsReal.getValues
+# of recent ROOT versions or otherwise in a single pass over the events.
+# The inverse covariance matrix of the yields is then one matrix product,
+#
+#   Vinv_jk = sum_e f_j(e) f_k(e) / (sum_s N_s f_s(e))^2
+#
+# and the sWeights of all events and species another one,
+#
+#   sW_s(e) = sum_j V_sj f_j(e) / sum_k N_k f_k(e)
+#
+# As for SPlot, the model must have been fitted and its parameters other
+# than the yields set constant:
+#
+#   sWeights, covariance = SPlotWeights(data, model, ROOT.RooArgList(zYield, qcdYield))
+#   AddSWeights(data, sWeights, ["zYield", "qcdYield"])  # adds zYield_sw, qcdYield_sw
+#
+# The per-event evaluation can also be split over threads (nThreads > 1).
+# Every thread evaluates its own clones of the pdfs on its range of events
+# in a small compiled loop, which runs without the Python interpreter lock.
+#
+# Instead of building one weighted RooDataSet per species (a full copy of
+# the dataset each), SWeightedViews gives per-species views that share one
+# NumPy export of the variables and the sWeight array, and can fill
+# weighted histograms or plot on a RooPlot:
+#
+#   views = SWeightedViews(data, ["zYield", "qcdYield"], ["isolation"], sWeights)
+#   views["zYield"].PlotOn(frame, isolation)
+#
+# For datasets that do not fit in memory ChunkedSPlot reads the events in
+# fixed-size chunks from a TTree or from NumPy .npy files (memory-mapped).
+# The yields are fitted on an evenly spread subsample and scaled to the
+# full dataset, Vinv is accumulated over the chunks in a first pass and
+# the sWeights are computed in a second pass and written incrementally to
+# memory-mapped .npy files, so the memory use does not depend on the
+# number of events:
+#
+#   source = TreeChunkSource("data.root", "tree", ["invMass", "isolation"])
+#   result = ChunkedSPlot(source, model, ROOT.RooArgList(zYield, qcdYield),
+#                         ROOT.RooArgSet(invMass, isolation), "sweights_dir")
+#   zWeights = np.load("sweights_dir/zYield_sw.npy", mmap_mode="r")
+#
+# /
+
+
+import os
+from multiprocessing.pool import ThreadPool
+
+import ROOT
+import numpy as np
+
+from dataset_numpy import ArraysToDataSet, DataSetToArrays
+
+_EVALUATE_RANGE_CODE = '''
+namespace splot_helpers {
+// values of pdf normalized over the variables vars, for events given as
+// columns[j * nEvents + i] (variable j, event i)
+void EvaluatePdfRange(RooAbsPdf& pdf, RooArgList& vars, const double* columns,
+                      long nEvents, double* out) {
+   RooArgSet normSet(vars);
+   int nVars = vars.getSize();
+   for (long i = 0; i < nEvents; ++i) {
+      for (int j = 0; j < nVars; ++j)
+         static_cast<RooRealVar&>(vars[j]).setVal(columns[j * nEvents + i]);
+      out[i] = pdf.getVal(&normSet);
+   }
+}
+}
+'''
+
+
+def _EvaluatePdfRange():
+    if not hasattr(ROOT, "splot_helpers"):
+        ROOT.gInterpreter.Declare(_EVALUATE_RANGE_CODE)
+        # the loop only touches the clones of its thread
+        ROOT.splot_helpers.EvaluatePdfRange.__release_gil__ = True
+    return ROOT.splot_helpers.EvaluatePdfRange
+
+
+def ThreadedPdfValues(pdfs, data, observables, nThreads):
+    '''
+    As PdfValues, splitting the events in nThreads ranges evaluated in
+    parallel, each with its own clones of the pdfs and their variables.
+    The clones are made and primed with one getVal in the calling thread,
+    so the normalization integrals and caches exist before the pool
+    starts; only the compiled per-event loop over the clones runs
+    concurrently.
+    '''
+    evaluate = _EvaluatePdfRange()
+    obsList = ROOT.RooArgList(observables)
+    names = [obsList.at(i).GetName() for i in range(obsList.getSize())]
+    arrays = DataSetToArrays(data, names)
+    nEvents = data.numEntries()
+    bounds = np.linspace(0, nEvents, nThreads + 1).astype(int)
+
+    # the clones and the event columns are prepared here, the threads only
+    # call the compiled loop
+    tasks = []
+    values = np.empty((len(pdfs), nEvents))
+    for t in range(nThreads):
+        begin, end = bounds[t], bounds[t + 1]
+        for s, pdf in enumerate(pdfs):
+            clone = pdf.cloneTree()
+            cloneObservables = clone.getObservables(observables)
+            # only the observables this pdf depends on, eg. a background
+            # flat in one of them
+            pdfNames = [n for n in names if cloneObservables.find(n)]
+            cloneVars = ROOT.RooArgList()
+            for n in pdfNames:
+                cloneVars.add(cloneObservables.find(n))
+            columns = np.ascontiguousarray([arrays[n][begin:end] for n in pdfNames],
+                                           dtype=np.float64)
+            # build the normalization integral and caches of the clone here,
+            # not lazily in the threads
+            clone.getVal(cloneObservables)
+            tasks.append((clone, cloneObservables, cloneVars, columns, s, begin, end))
+
+    def work(task):
+        clone, cloneObservables, cloneVars, columns, s, begin, end = task
+        out = np.empty(end - begin)
+        evaluate(clone, cloneVars, columns, end - begin, out)
+        values[s, begin:end] = out
+
+    pool = ThreadPool(nThreads)
+    try:
+        pool.map(work, tasks)
+    finally:
+        pool.close()
+        pool.join()
+    return values.T.copy()
+
+
+def PdfValues(pdfs, data, observables, nThreads=1):
+    '''
+    Values of the pdfs (a list) normalized over observables for all events
+    of data, as an array of shape (N_events, N_pdfs).  With nThreads > 1
+    the events are split over threads, see ThreadedPdfValues.
+    '''
+    if nThreads > 1:
+        return ThreadedPdfValues(pdfs, data, observables, nThreads)
+    nEvents = data.numEntries()
+    values = np.empty((nEvents, len(pdfs)))
+    if all(hasattr(pdf, "getValues") for pdf in pdfs):
+        # batch evaluation over the whole dataset done in C++
+        for s, pdf in enumerate(pdfs):
+            values[:, s] = np.asarray(pdf.getValues(data))
+        return values
+
+    # older ROOT: one pass over the events for all the pdfs
+    obsList = ROOT.RooArgList(observables)
+    names = [obsList.at(i).GetName() for i in range(obsList.getSize())]
+    columns = DataSetToArrays(data, names)
+    variables = [obsList.at(i) for i in range(obsList.getSize())]
+    for e in range(nEvents):
+        for name, var in zip(names, variables):
+            var.setVal(columns[name][e])
+        for s, pdf in enumerate(pdfs):
+            values[e, s] = pdf.getVal(observables)
+    return values
+
+
+def ComputeSWeights(pdfValues, yields):
+    '''
+    sWeights from the (N_events, N_species) array of normalized pdf values
+    and the fitted yields.  Returns the (N_events, N_species) sWeights and
+    the covariance matrix of the yields.
+    '''
+    yields = np.asarray(yields, dtype=float)
+    # f_s(e) / sum_k N_k f_k(e)
+    ratios = pdfValues / pdfValues.dot(yields)[:, np.newaxis]
+    covariance = np.linalg.inv(ratios.T.dot(ratios))
+    return ratios.dot(covariance), covariance
+
+
+def SPlotWeights(data, model, yields, nThreads=1):
+    '''
+    sWeights of data for the yields (a RooArgList of the yield RooRealVars,
+    coefficients of the RooAddPdf model), evaluating the pdfs in nThreads
+    threads.  Returns the sWeights, one column per yield in the order of
+    yields, and the covariance matrix.
+    '''
+    pdfList = model.pdfList()
+    coefList = model.coefList()
+    coefNames = [coefList.at(i).GetName() for i in range(coefList.getSize())]
+    yieldList = [yields.at(i) for i in range(yields.getSize())]
+    pdfs = [pdfList.at(coefNames.index(y.GetName())) for y in yieldList]
+
+    observables = model.getObservables(data)
+    values = PdfValues(pdfs, data, observables, nThreads)
+    return ComputeSWeights(values, [y.getVal() for y in yieldList])
+
+
+def AddSWeights(data, sWeights, yieldNames, suffix="_sw"):
+    '''
+    Add the sWeights as columns yieldName + suffix to data, as SPlot does.
+    Returns the RooArgSet of the new variables.
+    '''
+    variables = ROOT.RooArgSet()
+    arrays = {}
+    for s, yieldName in enumerate(yieldNames):
+        name = yieldName + suffix
+        var = ROOT.RooRealVar(name, name, 0.)
+        variables.addOwned(var)
+        ROOT.SetOwnership(var, False)
+        arrays[name] = sWeights[:, s]
+    columns = ArraysToDataSet(arrays, variables, "sWeights")
+    data.merge(columns)
+    return variables
+
+
+class SWeightedView(object):
+    '''
+    The events of a dataset weighted by the sWeights of one species.  The
+    arrays are shared with the other views and are not copied.
+    '''
+
+    def __init__(self, arrays, weights, name):
+        self.arrays = arrays
+        self.weights = weights
+        self.name = name
+
+    def Histogram(self, var, nBins=None, name=None):
+        '''
+        TH1D of the RooRealVar var (binned as var, or with nBins bins over
+        its range) filled with the sWeights, with sum of weights squared
+        errors.
+        '''
+        if nBins is None:
+            nBins = var.getBins()
+        if name is None:
+            name = "%s_%s" % (var.GetName(), self.name)
+        low, high = var.getMin(), var.getMax()
+        values = self.arrays[var.GetName()]
+        contents, edges = np.histogram(values, bins=nBins, range=(low, high), weights=self.weights)
+        sumW2 = np.histogram(values, bins=nBins, range=(low, high), weights=self.weights ** 2)[0]
+        hist = ROOT.TH1D(name, name, nBins, low, high)
+        hist.Sumw2()
+        for i in range(nBins):
+            hist.SetBinContent(i + 1, contents[i])
+            hist.SetBinError(i + 1, np.sqrt(sumW2[i]))
+        hist.SetDirectory(0)
+        return hist
+
+    def PlotOn(self, frame, var, nBins=None):
+        '''
+        Add the weighted distribution of var to the RooPlot frame, with sum
+        of weights squared errors as for DataError(RooAbsData.SumW2).
+        '''
+        hist = self.Histogram(var, nBins)
+        rooHist = ROOT.RooHist(hist, 0., 1., ROOT.RooAbsData.SumW2)
+        frame.addPlotable(rooHist, "P")
+        # the frame owns the RooHist
+        ROOT.SetOwnership(rooHist, False)
+        return rooHist
+
+    def ToDataSet(self, variables):
+        '''
+        Weighted RooDataSet copy, when one is needed, eg. for a fit.
+        '''
+        arrays = dict(self.arrays)
+        arrays[self.name + "_weight"] = self.weights
+        return ArraysToDataSet(arrays, variables, "data_" + self.name,
+                               weightName=self.name + "_weight")
+
+
+def SWeightedViews(data, yieldNames, names, sWeights=None, suffix="_sw"):
+    '''
+    Dict of SWeightedView per species for the variables names of data.
+    The sWeights are taken from the array sWeights (one column per yield)
+    or otherwise from the yieldName + suffix columns of data.
+    '''
+    if sWeights is None:
+        columns = DataSetToArrays(data, [n + suffix for n in yieldNames])
+        sWeights = np.column_stack([columns[n + suffix] for n in yieldNames])
+    arrays = DataSetToArrays(data, names)
+    return dict((n, SWeightedView(arrays, sWeights[:, s], n)) for s, n in enumerate(yieldNames))
+
+
+class NumpyChunkSource(object):
+    '''
+    Events stored as one .npy file per variable (name.npy) in directory,
+    read in chunks through memory maps.
+    '''
+
+    def __init__(self, directory, names):
+        self.names = list(names)
+        self.columns = dict((n, np.load(os.path.join(directory, n + ".npy"), mmap_mode="r"))
+                            for n in self.names)
+
+    def NumEntries(self):
+        return len(self.columns[self.names[0]])
+
+    def Chunk(self, start, stop):
+        return dict((n, np.array(self.columns[n][start:stop])) for n in self.names)
+
+
+class TreeChunkSource(object):
+    '''
+    Events stored in the TTree treeName of fileName, read in consecutive
+    chunks with TTree::Draw starting at the first entry of the chunk, so
+    every entry is read once.
+    '''
+
+    def __init__(self, fileName, treeName, names):
+        self.fileName = fileName
+        self.treeName = treeName
+        self.names = list(names)
+        self.file = ROOT.TFile.Open(fileName)
+        self.tree = self.file.Get(treeName)
+        self.nEntries = self.tree.GetEntries()
+
+    def NumEntries(self):
+        return self.nEntries
+
+    def Chunk(self, start, stop):
+        # the values of the selected entries are kept in buffers of
+        # GetEstimate() entries
+        if self.tree.GetEstimate() < stop - start:
+            self.tree.SetEstimate(stop - start)
+        # more than 4 expressions need the "para" option
+        option = "goff para" if len(self.names) > 4 else "goff"
+        n = self.tree.Draw(":".join(self.names), "", option, stop - start, start)
+        return dict((name, _BufferToArray(self.tree.GetVal(j), n))
+                    for j, name in enumerate(self.names))
+
+
+def _BufferToArray(buf, n):
+    '''
+    Copy of the first n doubles of a double* returned by PyROOT.
+    '''
+    if hasattr(buf, "reshape"):
+        buf.reshape((n,))
+    else:
+        # older PyROOT buffers
+        buf.SetSize(n)
+    return np.array(np.frombuffer(buf, dtype=np.float64, count=n))
+
+
+def _Chunks(source, chunkSize):
+    nEntries = source.NumEntries()
+    for start in range(0, nEntries, chunkSize):
+        stop = min(start + chunkSize, nEntries)
+        yield start, stop, source.Chunk(start, stop)
+
+
+def ChunkedSPlot(source, model, yields, observables, outputDir, chunkSize=100000,
+                 nSubsample=100000, nYieldPasses=0, suffix="_sw", nThreads=1):
+    '''
+    sPlot of the events of source (a NumpyChunkSource or TreeChunkSource
+    with the variables of the RooArgSet observables) for the yields of the
+    RooAddPdf model, reading chunkSize events at a time.
+
+    The model is fitted to a subsample of about nSubsample events spread
+    over the whole source, then its parameters other than the yields are
+    set constant and the yields are scaled to the number of events.
+    nYieldPasses extra passes refine the yields on all events with
+    expectation-maximization steps, so that the sWeights sum exactly to
+    the yields.  The sWeights are written to outputDir as
+    yieldName + suffix + ".npy".  The pdfs of every chunk are evaluated
+    in nThreads threads.
+
+    Returns a dict with the yields, their covariance matrix and the output
+    file names.
+    '''
+    nEntries = source.NumEntries()
+    stride = max(1, nEntries // nSubsample)
+    yieldList = [yields.at(i) for i in range(yields.getSize())]
+    yieldNames = [y.GetName() for y in yieldList]
+    obsList = ROOT.RooArgList(observables)
+    names = [obsList.at(i).GetName() for i in range(obsList.getSize())]
+
+    # yield fit on a subsample taken with a fixed stride from every chunk
+    pieces = dict((n, []) for n in names)
+    for start, stop, chunk in _Chunks(source, chunkSize):
+        first = (-start) % stride
+        for n in names:
+            pieces[n].append(chunk[n][first::stride])
+    subsample = {}
+    for n in names:
+        subsample[n] = np.concatenate(pieces[n])
+    del pieces
+    nSub = len(subsample[names[0]])
+    subData = ArraysToDataSet(subsample, observables, "splotSubsample")
+    del subsample
+    model.fitTo(subData, ROOT.RooFit.Extended(), ROOT.RooFit.PrintLevel(-1))
+
+    # the sPlot technique requires the shape parameters to be fixed
+    parameters = ROOT.RooArgList(model.getParameters(observables))
+    for i in range(parameters.getSize()):
+        if parameters.at(i).GetName() not in yieldNames:
+            parameters.at(i).setConstant(True)
+    yieldValues = np.array([y.getVal() for y in yieldList]) * nEntries / float(nSub)
+
+    pdfList = model.pdfList()
+    coefList = model.coefList()
+    coefNames = [coefList.at(i).GetName() for i in range(coefList.getSize())]
+    pdfs = [pdfList.at(coefNames.index(n)) for n in yieldNames]
+
+    def chunkPdfValues(chunk):
+        chunkData = ArraysToDataSet(chunk, observables, "splotChunk")
+        return PdfValues(pdfs, chunkData, observables, nThreads)
+
+    for iPass in range(nYieldPasses):
+        newYields = np.zeros(len(yieldNames))
+        for start, stop, chunk in _Chunks(source, chunkSize):
+            values = chunkPdfValues(chunk) * yieldValues
+            newYields += (values / values.sum(axis=1)[:, np.newaxis]).sum(axis=0)
+        yieldValues = newYields
+
+    # first pass: inverse covariance matrix of the yields
+    inverseCovariance = np.zeros((len(yieldNames), len(yieldNames)))
+    for start, stop, chunk in _Chunks(source, chunkSize):
+        values = chunkPdfValues(chunk)
+        ratios = values / values.dot(yieldValues)[:, np.newaxis]
+        inverseCovariance += ratios.T.dot(ratios)
+    covariance = np.linalg.inv(inverseCovariance)
+
+    # second pass: sWeights written chunk by chunk
+    if not os.path.isdir(outputDir):
+        os.makedirs(outputDir)
+    fileNames = [os.path.join(outputDir, n + suffix + ".npy") for n in yieldNames]
+    outputs = [np.lib.format.open_memmap(f, mode="w+", dtype=np.float64, shape=(nEntries,))
+               for f in fileNames]
+    for start, stop, chunk in _Chunks(source, chunkSize):
+        values = chunkPdfValues(chunk)
+        sWeights = (values / values.dot(yieldValues)[:, np.newaxis]).dot(covariance)
+        for s, output in enumerate(outputs):
+            output[start:stop] = sWeights[:, s]
+            output.flush()
+    del outputs
+
+    for y, value in zip(yieldList, yieldValues):
+        # the fitted yields of the full dataset, if they fit in the range
+        if y.getMin() <= value <= y.getMax():
+            y.setVal(value)
+    return {"yields": dict(zip(yieldNames, yieldValues)), "covariance": covariance,
+            "files": dict(zip(yieldNames, fileNames))}
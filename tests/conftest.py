@@ -0,0 +1,5 @@
+# the helper modules live at the top of the repository
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+ROOT = pytest.importorskip("ROOT")
+
+from scipy import integrate, stats
+
+from bayesian_laplace import ScanLaplacePosterior
+
+
+def _LognormalModel():
+    # 8 events observed on s + b, with a wide lognormal constraint on b:
+    # the likelihood is skewed in b, so the Laplace approximation is off
+    w = ROOT.RooWorkspace("w", True)
+    w.factory("Poisson::pois(n[8,0,200],sum::splusb(s[1,0,15],b[3,0.001,100]))")
+    w.factory("Lognormal::constraint(b,b0[3],k[3])")
+    w.factory("PROD::model(pois,constraint)")
+    data = ROOT.RooDataSet("data", "", ROOT.RooArgSet(w.var("n")))
+    data.add(ROOT.RooArgSet(w.var("n")))
+    getattr(w, "import")(data)
+
+    mc = ROOT.RooStats.ModelConfig("ModelConfig", w)
+    mc.SetPdf(w.pdf("model"))
+    mc.SetParametersOfInterest(ROOT.RooArgSet(w.var("s")))
+    mc.SetNuisanceParameters(ROOT.RooArgSet(w.var("b")))
+    mc.SetObservables(ROOT.RooArgSet(w.var("n")))
+    return w, mc, w.data("data")
+
+
+def _ExactMarginal(poiValues):
+    def integrand(b, s):
+        return stats.poisson.pmf(8, s + b) * stats.lognorm.pdf(b, np.log(3.), scale=3.)
+    density = np.array([integrate.quad(integrand, 0.001, 100., args=(s,), limit=200)[0]
+                        for s in poiValues])
+    return density / (density.sum() * (poiValues[1] - poiValues[0]))
+
+
+def _Normalize(poiValues, logDensity):
+    density = np.exp(logDensity - logDensity.max())
+    return density / (density.sum() * (poiValues[1] - poiValues[0]))
+
+
+def test_importance_sampling_corrects_skewed_nuisance():
+    ROOT.RooMsgService.instance().setGlobalKillBelow(ROOT.RooFit.FATAL)
+    w, mc, data = _LognormalModel()
+    poiValues, density, info = ScanLaplacePosterior(mc, data, nScanPoints=40,
+                                                    nImportanceSamples=1000, seed=1)
+    exact = _ExactMarginal(poiValues)
+    laplace = _Normalize(poiValues, info["logLaplace"])
+    peak = exact.max()
+    laplaceError = np.max(np.abs(laplace - exact)) / peak
+    sampledError = np.max(np.abs(density - exact)) / peak
+    # about 13% and 2% of the peak
+    assert laplaceError > 0.05
+    assert sampledError < 0.3 * laplaceError
+    assert sampledError < 0.05
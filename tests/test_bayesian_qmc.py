@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+ROOT = pytest.importorskip("ROOT")
+
+from bayesian_qmc import QMCMarginalPosterior
+
+
+def test_gaussian_marginal_at_default_budget():
+    # x = 1 measured with unit width on mu + b1 + b2, Gaussian constraints of
+    # widths 0.5 and 0.3 on b1 and b2: the marginal of mu is a Gaussian of
+    # variance 1 + 0.5^2 + 0.3^2 centred at 1
+    w = ROOT.RooWorkspace("w", True)
+    w.factory("expr::nll('0.5*pow(1-mu-b1-b2,2)+2*b1*b1+0.5*pow(b2/0.3,2)',"
+              "mu[0,-3,5],b1[0,-3,3],b2[0,-3,3])")
+    poiValues = np.linspace(-2., 4., 25)
+    width = poiValues[1] - poiValues[0]
+    density, error = QMCMarginalPosterior(w.function("nll"), w.var("mu"),
+                                          [w.var("b1"), w.var("b2")], poiValues, seed=1)
+    total = density.sum() * width
+    density, error = density / total, error / total
+    exact = np.exp(-0.5 * (poiValues - 1.) ** 2 / 1.34)
+    exact /= exact.sum() * width
+
+    # 4 x 1024 points: about 0.2% of the peak, where 10000 plain Monte
+    # Carlo points give about 1.3%
+    peak = exact.max()
+    assert np.max(np.abs(density - exact)) < 5e-3 * peak
+    assert np.max(error) < 1e-2 * peak
+    assert np.all(np.abs(density - exact) <= 5. * error + 1e-3 * peak)
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+ROOT = pytest.importorskip("ROOT")
+
+from bayesian_scan import RunParallelBayesianScan
+
+
+def _WriteWorkspace(fileName):
+    # the model of rs701_BayesianCalculator with a flat prior on s
+    w = ROOT.RooWorkspace("w", True)
+    w.factory("SUM::pdf(s[0.001,15]*Uniform(x[0,1]),b[1,0,2]*Uniform(x))")
+    w.factory("Gaussian::prior_b(b,1,1)")
+    w.factory("PROD::model(pdf,prior_b)")
+    w.factory("Uniform::priorPOI(s)")
+    w.factory("n[3]")
+    data = ROOT.RooDataSet("data", "", ROOT.RooArgSet(w.var("x"), w.var("n")), "n")
+    data.add(ROOT.RooArgSet(w.var("x")), w.var("n").getVal())
+    getattr(w, "import")(data)
+
+    mc = ROOT.RooStats.ModelConfig("ModelConfig", w)
+    mc.SetPdf(w.pdf("model"))
+    mc.SetParametersOfInterest(ROOT.RooArgSet(w.var("s")))
+    mc.SetNuisanceParameters(ROOT.RooArgSet(w.var("b")))
+    mc.SetObservables(ROOT.RooArgSet(w.var("x")))
+    mc.SetPriorPdf(w.pdf("priorPOI"))
+    getattr(w, "import")(mc)
+    w.writeToFile(fileName)
+    return w, mc, data
+
+
+def test_scan_matches_calculator_interval(tmp_path):
+    ROOT.RooMsgService.instance().setGlobalKillBelow(ROOT.RooFit.FATAL)
+    fileName = str(tmp_path / "ws.root")
+    w, mc, data = _WriteWorkspace(fileName)
+
+    nScanPoints = 200
+    interval, plot = RunParallelBayesianScan(fileName, "w", "ModelConfig", "data",
+                                             nScanPoints=nScanPoints, nWorkers=2)
+
+    calculator = ROOT.RooStats.BayesianCalculator(data, mc)
+    calculator.SetConfidenceLevel(0.95)
+    expected = calculator.GetInterval()
+    # up to the width of a scan bin
+    tolerance = 15. / nScanPoints
+    assert abs(interval.LowerLimit() - expected.LowerLimit()) < tolerance
+    assert abs(interval.UpperLimit() - expected.UpperLimit()) < tolerance
+    assert np.isclose(interval.ConfidenceLevel(), 0.95)
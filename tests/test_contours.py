@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+ROOT = pytest.importorskip("ROOT")
+
+from contours import GetContours, GridFromPoints, MakeContourGraphs, MarchingSquares
+
+
+def _Circle(n=41):
+    axis = np.linspace(-2., 2., n)
+    x, y = np.meshgrid(axis, axis)
+    return axis, x ** 2 + y ** 2
+
+
+def test_circle_is_one_closed_line():
+    axis, grid = _Circle()
+    lines = MarchingSquares(axis, axis, grid, 1.)
+    assert len(lines) == 1
+    line = lines[0]
+    np.testing.assert_allclose(line[0], line[-1])
+    radius = np.hypot(line[:, 0], line[:, 1])
+    # linear interpolation of r^2 along the edges, within the grid spacing
+    assert np.all(np.abs(radius - 1.) < axis[1] - axis[0])
+
+
+def test_open_line_crosses_the_grid():
+    axis = np.linspace(-1., 1., 11)
+    x, y = np.meshgrid(axis, axis)
+    lines = MarchingSquares(axis, axis, x - 0.25, 0.)
+    assert len(lines) == 1
+    line = lines[0]
+    np.testing.assert_allclose(line[:, 0], 0.25)
+    assert sorted([line[0, 1], line[-1, 1]]) == [-1., 1.]
+
+
+def test_membership_flags_from_scattered_points():
+    axis, grid = _Circle(21)
+    x, y = [a.ravel() for a in np.meshgrid(axis, axis)]
+    inside = (x ** 2 + y ** 2 <= 1.).astype(float)
+    order = np.random.RandomState(2).permutation(len(x))
+    contours = GetContours(x[order], y[order], inside[order], [0.5])
+    lines = contours[0.5]
+    assert len(lines) == 1
+    spacing = axis[1] - axis[0]
+    radius = np.hypot(lines[0][:, 0], lines[0][:, 1])
+    assert np.all(np.abs(radius - 1.) < spacing)
+    graphs = MakeContourGraphs(lines)
+    assert graphs[0].GetN() == len(lines[0])
+
+
+def test_missing_points_are_skipped():
+    axis = np.arange(4.)
+    x, y = [a.ravel() for a in np.meshgrid(axis, axis)]
+    keep = ~((x == 3.) & (y == 3.))
+    xAxis, yAxis, grid = GridFromPoints(x[keep], y[keep], x[keep])
+    assert np.isnan(grid[3, 3])
+    lines = MarchingSquares(xAxis, yAxis, grid, 2.5)
+    assert len(lines) == 1
+    # the line stops at the cell with the missing corner
+    assert lines[0][:, 1].max() == 2.
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+ROOT = pytest.importorskip("ROOT")
+
+from dataset_numpy import ArraysToDataSet, DataSetToArrays
+
+
+def test_dataset_round_trip():
+    x = ROOT.RooRealVar("x", "x", -10., 10.)
+    y = ROOT.RooRealVar("y", "y", -10., 10.)
+    arrays = {"x": np.linspace(-1., 1., 7), "y": np.arange(7.)}
+    data = ArraysToDataSet(arrays, ROOT.RooArgSet(x, y))
+    result = DataSetToArrays(data)
+    np.testing.assert_allclose(result["x"], arrays["x"])
+    np.testing.assert_allclose(result["y"], arrays["y"])
+
+
+def test_points_to_scan_without_nuisance_parameters():
+    # FeldmanCousins::GetPointsToScan is a RooDataHist of the parameters
+    # of interest when there are no nuisance parameters (rs401c, rs401d)
+    mu = ROOT.RooRealVar("mu", "mu", 0., 10.)
+    mu.setBins(20)
+    parameterScan = ROOT.RooDataHist("parameterScan", "", ROOT.RooArgSet(mu))
+    for i in range(20):
+        mu.setVal(0.25 + 0.5 * i)
+        parameterScan.add(ROOT.RooArgSet(mu), 2.)
+
+    result = DataSetToArrays(parameterScan, ["mu"])
+    np.testing.assert_allclose(result["mu"], 0.25 + 0.5 * np.arange(20))
+    np.testing.assert_allclose(result["weight"], 2.)
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+ROOT = pytest.importorskip("ROOT")
+
+from hybrid_pvalue import HybridPValueEngine, NegativeBinomialTail
+
+
+def _Workspace(prior):
+    w = ROOT.RooWorkspace("w", True)
+    w.factory("Poisson::px(x[150,0,500],sum::splusb(s[0,0,100],b[100,0,300]))")
+    w.factory("Poisson::py(y[100,0,500],prod::taub(tau[1.],b))")
+    w.factory(prior)
+    return w
+
+
+def test_uniform_prior_closed_form_matches_cdf():
+    # Zbi_Zgamma: the averaged model is negative binomial
+    w = _Workspace("Uniform::prior_b(b)")
+    engine = HybridPValueEngine(w, "px", "x", "b", ["py", "prior_b"], auxObservableName="y")
+    assert engine.analytic
+    n = np.array([130., 150., 170.])
+    np.testing.assert_allclose(engine.PValue(n), engine.NumericPValue(n), rtol=1e-3, atol=1e-6)
+    # Zbi_Zgamma output: hybrid p-value 1 - 0.999058 at x = 150, y = 100
+    np.testing.assert_allclose(engine.PValue(150.), 1. - 0.999058, rtol=1e-3)
+
+
+def test_gaussian_prior_falls_back_to_cdf():
+    w = _Workspace("Gaussian::prior_b(b,100,10)")
+    engine = HybridPValueEngine(w, "px", "x", "b", ["py", "prior_b"], auxObservableName="y")
+    assert not engine.analytic
+    n = np.array([130., 150.])
+    p = engine.PValue(n)
+    np.testing.assert_allclose(p, engine.NumericPValue(n))
+    assert np.all((p > 0.) & (p < 1.))
+    # a narrower prior on b than the uniform one gives a smaller p-value
+    assert np.all(p < NegativeBinomialTail(n, 101., 1.))
+    # sum over b of Pois(x >= n | b) Pois(100 | b) Gauss(b | 100, 10)
+    np.testing.assert_allclose(p, [1.1165e-2, 1.0375e-4], rtol=2e-2)
@@ -0,0 +1,53 @@
+import numpy as np
+
+from mcmc_adaptive import AdaptiveMetropolisProposal
+
+# correlated 2-d Gaussian target with very different widths
+COVARIANCE = np.array([[4., 0.95 * 2. * 0.05], [0.95 * 2. * 0.05, 0.0025]])
+
+
+def _Run(proposal, nSteps, seed=4):
+    rng = np.random.RandomState(seed)
+    precision = np.linalg.inv(COVARIANCE)
+
+    def nll(x):
+        return 0.5 * x.dot(precision).dot(x)
+
+    x = np.zeros(2)
+    xNll = nll(x)
+    accepted = np.zeros(nSteps, dtype=bool)
+    for iStep in range(1, nSteps):
+        xPrime = proposal.Propose(x, rng)
+        xPrimeNll = nll(xPrime)
+        if np.log(rng.uniform()) < xNll - xPrimeNll:
+            x, xNll = xPrime, xPrimeNll
+            accepted[iStep] = True
+        proposal.Update(iStep, x, accepted[iStep])
+    return accepted
+
+
+def test_learns_the_target_covariance():
+    # badly scaled start: wide in the narrow direction and vice versa
+    proposal = AdaptiveMetropolisProposal([0.1, 1.], nAdaptSteps=20000)
+    accepted = _Run(proposal, 30000)
+
+    covariance = proposal.Covariance()
+    widths = np.sqrt(np.diag(covariance))
+    correlation = covariance[0, 1] / (widths[0] * widths[1])
+    assert abs(correlation - 0.95) < 0.03
+    # the shape of the target, scaled by about 2.38^2 / dim
+    ratio = widths / np.sqrt(np.diag(COVARIANCE))
+    assert abs(ratio[0] / ratio[1] - 1.) < 0.2
+    assert 0.5 < ratio[0] < 3.
+    # acceptance of the frozen proposal near the target rate
+    assert abs(accepted[20000:].mean() - 0.234) < 0.07
+
+
+def test_frozen_after_adaptation():
+    proposal = AdaptiveMetropolisProposal([1., 0.05], nAdaptSteps=2000)
+    _Run(proposal, 2000)
+    covariance = proposal.Covariance()
+    for iStep in range(2000, 2100):
+        assert proposal.IsFrozen(iStep)
+        proposal.Update(iStep, np.array([100., -100.]), True)
+    np.testing.assert_array_equal(proposal.Covariance(), covariance)
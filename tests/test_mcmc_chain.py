@@ -0,0 +1,57 @@
+import numpy as np
+
+from mcmc_chain import ChainStore, HistogramChain
+
+
+def _GaussianChain(nPoints=50000, seed=3):
+    rng = np.random.RandomState(seed)
+    chain = HistogramChain(["s", "b"], ["s"], 80, [(-4., 4.)])
+    for s, b in zip(rng.standard_normal(nPoints), rng.uniform(size=nPoints)):
+        chain.Add([s, b], 0., 1)
+    return chain
+
+
+def _Content(chain, lower, upper):
+    edges = chain.Edges()[0]
+    heights = chain.Marginal("s")
+    inside = (edges[:-1] >= lower) & (edges[1:] <= upper)
+    return heights[inside].sum() / heights.sum()
+
+
+def test_interval_limits_are_bin_edges():
+    chain = _GaussianChain()
+    edges = chain.Edges()[0]
+    for fraction in [-1., 0., 0.5, 1.]:
+        lower, upper = chain.Interval("s", 0.9, fraction)
+        assert np.isclose(edges, lower).any()
+        assert np.isclose(edges, upper).any()
+        assert _Content(chain, lower, upper) >= 0.9
+
+
+def test_tail_intervals():
+    chain = _GaussianChain()
+    width = chain.binWidths[0]
+    lower, upper = chain.Interval("s", 0.95, 0.5)
+    assert abs(lower + 1.96) <= width + 0.02
+    assert abs(upper - 1.96) <= width + 0.02
+    lower, upper = chain.Interval("s", 0.95, 0.)
+    assert lower == chain.Edges()[0][0]
+    assert abs(upper - 1.645) <= width + 0.02
+
+
+def test_shortest_interval():
+    chain = _GaussianChain()
+    width = chain.binWidths[0]
+    lower, upper = chain.Interval("s", 0.68)
+    assert abs(lower + 1.) <= width + 0.02
+    assert abs(upper - 1.) <= width + 0.02
+    assert _Content(chain, lower + width, upper) < 0.68
+    assert _Content(chain, lower, upper - width) < 0.68
+
+
+def test_entries_for_weighted_steps():
+    chain = ChainStore(None, ["s"], 3)
+    for value, weight in [(0., 3), (1., 2), (2., 5)]:
+        chain.Add([value], 0., weight)
+    # a point whose steps all fall in the burn-in is skipped
+    assert [chain.EntriesForWeightedSteps(n) for n in [0, 2, 3, 4, 5, 10]] == [0, 0, 1, 1, 2, 3]
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+ROOT = pytest.importorskip("ROOT")
+
+from mcmc_kde import BinnedKDE, KDEContours, KDEInterval, ScottBandwidth
+
+
+def test_binned_kde_matches_direct_kde():
+    rng = np.random.RandomState(6)
+    x = rng.standard_normal(5000)
+    weights = rng.randint(1, 4, len(x)).astype(float)
+    centres, density = BinnedKDE([x], weights, ranges=[(-3., 3.)])
+    h = ScottBandwidth([x], weights)[0]
+    # sum of Gaussian kernels on every point, normalized inside the range
+    direct = (weights * np.exp(-0.5 * ((centres[0][:, np.newaxis] - x) / h) ** 2)).sum(axis=1)
+    direct /= direct.sum() * (centres[0][1] - centres[0][0])
+    assert np.max(np.abs(density - direct)) < 1e-2 * direct.max()
+
+
+def test_interval_of_gaussian_chain():
+    rng = np.random.RandomState(7)
+    x = rng.standard_normal(200000)
+    centres, density = BinnedKDE([x], bandwidth=0.05, ranges=[(-6., 6.)])
+    # the kernel widens the posterior a little
+    sigma = np.sqrt(1. + 0.05 ** 2)
+    lower, upper = KDEInterval(centres[0], density, 0.95, leftSideTailFraction=0.5)
+    assert abs(lower + 1.96 * sigma) < 0.03
+    assert abs(upper - 1.96 * sigma) < 0.03
+    lower, upper = KDEInterval(centres[0], density, 0.68)
+    assert abs(upper - lower - 2. * 0.994 * sigma) < 0.05
+    lower, upper = KDEInterval(centres[0], density, 0.95, leftSideTailFraction=0.)
+    assert lower == centres[0][0] - 0.5 * (centres[0][1] - centres[0][0])
+    assert abs(upper - 1.645 * sigma) < 0.03
+
+
+def test_contours_of_correlated_gaussian():
+    rng = np.random.RandomState(8)
+    covariance = np.array([[1., 0.6], [0.6, 1.]])
+    points = rng.multivariate_normal([0., 0.], covariance, 100000)
+    h = 0.1
+    centres, density = BinnedKDE([points[:, 0], points[:, 1]], bandwidth=h,
+                                 ranges=[(-5., 5.), (-5., 5.)])
+    # the 39.3% highest density region is the ellipse of Mahalanobis
+    # radius 1 of the smoothed Gaussian
+    lines = KDEContours(centres, density, [0.393])[0.393]
+    assert len(lines) == 1
+    line = lines[0]
+    np.testing.assert_allclose(line[0], line[-1])
+    precision = np.linalg.inv(covariance + h ** 2 * np.eye(2))
+    radius = np.sqrt(np.einsum("ij,jk,ik->i", line, precision, line))
+    assert np.all(np.abs(radius - 1.) < 0.1)
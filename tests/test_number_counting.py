@@ -0,0 +1,42 @@
+import numpy as np
+from scipy import special, stats
+
+from number_counting import BinomialWithTauObsP, BinomialWithTauObsZ, _MIN_P
+
+
+def _LogP(nOn, nOff, tau):
+    # I_{1/(1+tau)}(n_on, n_off + 1) as the upper tail of Beta(n_off + 1, n_on)
+    return stats.beta.logsf(tau / (1. + tau), nOff + 1., nOn)
+
+
+def test_p_value_matches_beta_tail():
+    nOn = np.array([5., 20., 150., 400., 600.])
+    bExp = np.array([3., 10., 100., 20., 50.])
+    tau = np.array([1., 0.5, 1., 0.5, 2.])
+    p = BinomialWithTauObsP(nOn, bExp, tau)
+    np.testing.assert_allclose(np.log(p), _LogP(nOn, bExp * tau, tau), rtol=1e-10)
+    z = BinomialWithTauObsZ(nOn, bExp, tau)
+    np.testing.assert_allclose(special.log_ndtr(-z), _LogP(nOn, bExp * tau, tau), rtol=1e-10)
+
+
+def test_log_space_tail():
+    # p-values below _MIN_P but still above the smallest denormal
+    nOn = np.array([1050., 1100., 1200.])
+    bExp = np.array([10., 10., 30.])
+    tau = np.ones(3)
+    logP = _LogP(nOn, bExp * tau, tau)
+    assert np.all(logP < np.log(_MIN_P))
+    z = BinomialWithTauObsZ(nOn, bExp, tau)
+    np.testing.assert_allclose(special.log_ndtr(-z), logP, rtol=1e-10)
+
+
+def test_log_space_tail_beyond_double_range():
+    # for integer counts I_x(a, b) is the tail P(k >= a) of a binomial
+    # with a + b - 1 trials, summed here in log space
+    nOn, bExp, tau = 2000., 100., 1.
+    nTrials = int(nOn + bExp * tau)
+    k = np.arange(int(nOn), nTrials + 1)
+    logP = special.logsumexp(stats.binom.logpmf(k, nTrials, 1. / (1. + tau)))
+    assert logP < -745.
+    z = BinomialWithTauObsZ(nOn, bExp, tau)
+    np.testing.assert_allclose(special.log_ndtr(-z), logP, rtol=1e-10)
@@ -0,0 +1,65 @@
+import numpy as np
+from scipy import optimize, stats
+
+from number_counting_combination import NumberCountingCombination
+
+
+def _Channels(nChannels=200, seed=9):
+    rng = np.random.RandomState(seed)
+    s = rng.uniform(0.5, 5., nChannels)
+    b = rng.uniform(1., 50., nChannels)
+    tau = rng.uniform(0.5, 5., nChannels)
+    x = rng.poisson(1.3 * s + b)
+    y = rng.poisson(tau * b)
+    return NumberCountingCombination(s, x, y, tau)
+
+
+def test_profiled_background_minimizes_the_joint_nll():
+    combination = _Channels(20)
+    for mu in [0., 0.5, 2.]:
+        b = combination.ProfiledBackground(mu)
+        # every channel minimized on its own
+        for i in range(len(b)):
+            def nll(bi):
+                trial = b.copy()
+                trial[i] = bi
+                return float(combination.JointNLL(mu, trial)[0])
+            best = optimize.minimize_scalar(nll, bounds=(1e-6, 200.), method="bounded",
+                                            options={"xatol": 1e-10})
+            assert abs(best.x - b[i]) < 1e-4 * max(b[i], 1.)
+        np.testing.assert_allclose(combination.JointNLL(mu, b)[2], 0., atol=1e-8)
+
+
+def test_profiled_derivative():
+    combination = _Channels()
+    mu = np.array([0.2, 1., 3.])
+    nll, derivative = combination.ProfiledNLL(mu)
+    step = 1e-6
+    numeric = (combination.ProfiledNLL(mu + step)[0] - combination.ProfiledNLL(mu - step)[0]) / (2. * step)
+    np.testing.assert_allclose(derivative, numeric, rtol=1e-5)
+
+
+def test_single_channel_closed_form():
+    # one channel: b = y / tau and mu = (x - b) / s at the maximum
+    combination = NumberCountingCombination([10.], [40.], [60.], [3.])
+    np.testing.assert_allclose(combination.Fit(), (40. - 20.) / 10., rtol=1e-8)
+    # background only: b = (x + y) / (1 + tau)
+    b0 = (40. + 60.) / 4.
+    q0 = 2. * (float(combination.JointNLL(0., [b0])[0]) - float(combination.JointNLL(2., [20.])[0]))
+    z, pValue = combination.Significance()
+    np.testing.assert_allclose(z, np.sqrt(q0), rtol=1e-8)
+    np.testing.assert_allclose(pValue, stats.norm.sf(z))
+
+
+def test_interval_limits_on_the_threshold():
+    combination = _Channels()
+    muHat = combination.Fit()
+    assert abs(muHat - 1.3) < 0.5
+    lower, upper = combination.Interval(0.95)
+    assert lower < muHat < upper
+    threshold = stats.chi2.ppf(0.95, 1)
+    np.testing.assert_allclose(combination.ProfileLikelihoodRatio(np.array([lower, upper])),
+                               threshold, rtol=1e-6)
+    # the interval shrinks with the confidence level
+    lower68, upper68 = combination.Interval(0.68)
+    assert lower < lower68 < muHat < upper68 < upper
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+ROOT = pytest.importorskip("ROOT")
+
+from splot import ComputeSWeights, PdfValues, TreeChunkSource, _Chunks
+
+
+def test_threaded_values_with_background_flat_in_one_observable():
+    w = ROOT.RooWorkspace("w")
+    w.factory("Gaussian::sigX(x[-5,5], mx[0], sx[1])")
+    w.factory("Gaussian::sigY(y[-5,5], my[0], sy[1])")
+    w.factory("PROD::sig(sigX, sigY)")
+    # the background does not depend on y
+    w.factory("Exponential::bkg(x, c[-0.3])")
+    w.factory("SUM::model(nSig[200, 0, 1000] * sig, nBkg[800, 0, 2000] * bkg)")
+    observables = ROOT.RooArgSet(w.var("x"), w.var("y"))
+    data = w.pdf("model").generate(observables, 1000)
+    pdfs = [w.pdf("sig"), w.pdf("bkg")]
+
+    serial = PdfValues(pdfs, data, observables)
+    threaded = PdfValues(pdfs, data, observables, nThreads=3)
+    np.testing.assert_allclose(threaded, serial, rtol=1e-10)
+
+
+def test_sweight_sums_equal_fitted_yields():
+    # Gaussian signal on a flat background in [-5, 5], pdf values from NumPy
+    rng = np.random.RandomState(5)
+    x = np.concatenate([rng.normal(0., 1., 300), rng.uniform(-5., 5., 1200)])
+    x = x[(x > -5.) & (x < 5.)]
+    signal = np.exp(-0.5 * x ** 2) / np.sqrt(2. * np.pi)
+    background = np.full(len(x), 0.1)
+    pdfValues = np.column_stack([signal, background])
+
+    # extended maximum likelihood yields, with the EM iteration
+    yields = np.array([0.5, 0.5]) * len(x)
+    for i in range(2000):
+        yields = yields * (pdfValues / pdfValues.dot(yields)[:, np.newaxis]).sum(axis=0)
+
+    sWeights, covariance = ComputeSWeights(pdfValues, yields)
+    np.testing.assert_allclose(sWeights.sum(axis=0), yields, rtol=1e-8)
+    # the yield errors are about sqrt(N)
+    assert np.all(np.sqrt(np.diag(covariance)) > 0.5 * np.sqrt(yields))
+    assert np.all(np.sqrt(np.diag(covariance)) < 3. * np.sqrt(yields))
+
+
+def test_tree_chunks_cover_the_tree(tmp_path):
+    fileName = str(tmp_path / "events.root")
+    frame = ROOT.RDataFrame(1000).Define("x", "double(rdfentry_)") \
+                                 .Define("y", "-2. * rdfentry_")
+    frame.Snapshot("tree", fileName, ["x", "y"])
+
+    source = TreeChunkSource(fileName, "tree", ["x", "y"])
+    chunks = list(_Chunks(source, 300))
+    assert [(start, stop) for start, stop, chunk in chunks] == \
+        [(0, 300), (300, 600), (600, 900), (900, 1000)]
+    x = np.concatenate([chunk["x"] for start, stop, chunk in chunks])
+    y = np.concatenate([chunk["y"] for start, stop, chunk in chunks])
+    np.testing.assert_array_equal(x, np.arange(1000.))
+    np.testing.assert_array_equal(y, -2. * np.arange(1000.))
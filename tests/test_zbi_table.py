@@ -0,0 +1,39 @@
+import numpy as np
+
+from number_counting import BinomialWithTauObsZ
+from zbi_table import ZTable
+
+
+def _Table(directory):
+    return ZTable.Build(str(directory), np.arange(1, 51), np.arange(0, 51),
+                        np.logspace(-1, 1, 11))
+
+
+def test_query_inside_grid(tmp_path):
+    table = _Table(tmp_path / "zbi")
+    rng = np.random.RandomState(1)
+    nOn = rng.uniform(1, 50, 200)
+    nOff = rng.uniform(0, 50, 200)
+    tau = np.exp(rng.uniform(np.log(0.1), np.log(10.), 200))
+    z, error = table.Query(nOn, nOff, tau)
+    exact = BinomialWithTauObsZ(nOn, nOff / tau, tau)
+    assert np.all(error > 0.)
+    assert np.all(np.abs(z - exact) <= error)
+
+
+def test_query_outside_grid_is_exact(tmp_path):
+    table = _Table(tmp_path / "zbi")
+    nOn = np.array([500., 10., 10., 20.])
+    nOff = np.array([10., 80., 10., 5.])
+    tau = np.array([1., 1., 50., 0.01])
+    z, error = table.Query(nOn, nOff, tau)
+    np.testing.assert_allclose(z, BinomialWithTauObsZ(nOn, nOff / tau, tau))
+    np.testing.assert_array_equal(error, 0.)
+
+
+def test_query_obs_opened_table(tmp_path):
+    _Table(tmp_path / "zbi")
+    table = ZTable.Open(str(tmp_path / "zbi"))
+    z, error = table.QueryObs(500, 10., 1.)
+    np.testing.assert_allclose(z, BinomialWithTauObsZ(500, 10., 1.))
+    assert error == 0.
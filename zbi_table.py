@@ -0,0 +1,195 @@
+# /
+#
+# Lookup tables of the Z_Bi significance
+#
+# For the on/off problem with a uniform prior on the background the
+# hybrid significance Z_Gamma equals Z_Bi (see Zbi_Zgamma), so a single
+# table serves both.  ZTable tabulates Z_Bi = BinomialWithTauObsZ on a
+# grid of (n_on, n_off, tau), with n_off = b * tau the count of the
+# auxiliary measurement and tau on a logarithmic grid, and stores it in
+# memory-mapped .npy files.  Queries are answered by trilinear
+# interpolation, with an error bound for every grid cell estimated when
+# the table is built: the larger of the interpolation error at the cell
+# centre and the bound h^2 |f''| / 8 per axis from the second differences
+# of the table at the cell corners, with a safety factor.  Points outside
+# the grid are not extrapolated: their Z is computed exactly with
+# number_counting.BinomialWithTauObsZ and their error is 0.
+#
+#   table = ZTable.Build("zbi_table", np.arange(1, 501), np.arange(0, 501),
+#                        np.logspace(-1, 1, 21))
+#   table = ZTable.Open("zbi_table")   # later, eg. in another process
+#   z, error = table.Query(nOn, nOff, tau)
+#
+# /
+
+
+import json
+import os
+
+import numpy as np
+
+from number_counting import BinomialWithTauObsZ
+
+_AXES = ["nOn", "nOff", "tau"]
+# safety factor on the estimated interpolation error
+_ERROR_SAFETY = 1.25
+
+
+def _CellCoordinates(axis, values):
+    '''
+    Index of the cell containing values on the sorted axis and the
+    fractional position inside it, clipped to the axis range.
+    '''
+    values = np.clip(values, axis[0], axis[-1])
+    index = np.clip(np.searchsorted(axis, values, side="right") - 1, 0, len(axis) - 2)
+    fraction = (values - axis[index]) / (axis[index + 1] - axis[index])
+    return index, fraction
+
+
+def _CurvatureBound(z):
+    '''
+    Error bound of multilinear interpolation in every cell of the grid z,
+    sum over the axes of max |second difference| / 8 at the cell corners.
+    '''
+    bound = np.zeros(tuple(n - 1 for n in z.shape))
+    for axis in range(z.ndim):
+        secondDifference = np.abs(np.diff(z, 2, axis=axis))
+        padding = [(0, 0)] * z.ndim
+        padding[axis] = (1, 1)
+        secondDifference = np.pad(secondDifference, padding, mode="edge")
+        # maximum over the corners of each cell
+        for a in range(z.ndim):
+            secondDifference = np.maximum(np.delete(secondDifference, 0, axis=a),
+                                          np.delete(secondDifference, -1, axis=a))
+        bound += secondDifference / 8.
+    return bound
+
+
+class ZTable(object):
+    '''
+    Z_Bi on a (nOn, nOff, tau) grid with trilinear interpolation (linear in
+    log tau).  Use Build to compute a table and Open to read one.
+    '''
+
+    def __init__(self, directory, axes, z, cellError):
+        self.directory = directory
+        self.axes = axes
+        self.z = z
+        self.cellError = cellError
+        self.maxError = float(cellError.max()) if cellError.size else 0.
+
+    @staticmethod
+    def _File(directory, name):
+        return os.path.join(directory, name + ".npy")
+
+    @classmethod
+    def Build(cls, directory, nOnAxis, nOffAxis, tauAxis):
+        '''
+        Compute the table on the given axes (nOn values must be > 0) and
+        write it to directory.  The grid is filled one tau value at a time.
+        '''
+        axes = [np.asarray(a, dtype=float) for a in (nOnAxis, nOffAxis, tauAxis)]
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        for name, axis in zip(_AXES, axes):
+            np.save(cls._File(directory, name), axis)
+
+        shape = tuple(len(a) for a in axes)
+        z = np.lib.format.open_memmap(cls._File(directory, "z"), mode="w+",
+                                      dtype=np.float64, shape=shape)
+        nOn, nOff = np.meshgrid(axes[0], axes[1], indexing="ij")
+        for k, tau in enumerate(axes[2]):
+            z[:, :, k] = BinomialWithTauObsZ(nOn, nOff / tau, tau)
+        z.flush()
+
+        table = cls(directory, axes, z, np.zeros((0, 0, 0)))
+        cellError = np.lib.format.open_memmap(cls._File(directory, "cellError"), mode="w+",
+                                              dtype=np.float64,
+                                              shape=tuple(n - 1 for n in shape))
+        cellError[:] = _CurvatureBound(np.asarray(z))
+        # exact value at the cell centres compared with the interpolation
+        nOnMid = 0.5 * (axes[0][1:] + axes[0][:-1])
+        nOffMid = 0.5 * (axes[1][1:] + axes[1][:-1])
+        tauMid = np.sqrt(axes[2][1:] * axes[2][:-1])
+        nOn, nOff = np.meshgrid(nOnMid, nOffMid, indexing="ij")
+        for k, tau in enumerate(tauMid):
+            exact = BinomialWithTauObsZ(nOn, nOff / tau, tau)
+            interpolated = table.Interpolate(nOn, nOff, np.full(nOn.shape, tau))
+            cellError[:, :, k] = _ERROR_SAFETY * np.maximum(cellError[:, :, k],
+                                                            np.abs(exact - interpolated))
+        cellError.flush()
+
+        with open(os.path.join(directory, "table.json"), "w") as metaFile:
+            json.dump({"axes": _AXES, "shape": list(shape),
+                       "maxError": float(cellError.max())}, metaFile)
+        return cls(directory, axes, z, cellError)
+
+    @classmethod
+    def Open(cls, directory):
+        '''
+        Open a table written by Build, read-only and memory-mapped.
+        '''
+        axes = [np.load(cls._File(directory, name)) for name in _AXES]
+        z = np.load(cls._File(directory, "z"), mmap_mode="r")
+        cellError = np.load(cls._File(directory, "cellError"), mmap_mode="r")
+        return cls(directory, axes, z, cellError)
+
+    def _Cells(self, nOn, nOff, tau):
+        i, fi = _CellCoordinates(self.axes[0], nOn)
+        j, fj = _CellCoordinates(self.axes[1], nOff)
+        k, fk = _CellCoordinates(np.log(self.axes[2]), np.log(tau))
+        return (i, j, k), (fi, fj, fk)
+
+    def Interpolate(self, nOn, nOff, tau):
+        '''
+        Interpolated Z for broadcastable arrays nOn, nOff and tau.  Points
+        outside the grid are clipped to its boundary.
+        '''
+        nOn, nOff, tau = np.broadcast_arrays(np.asarray(nOn, dtype=float),
+                                             np.asarray(nOff, dtype=float),
+                                             np.asarray(tau, dtype=float))
+        (i, j, k), (fi, fj, fk) = self._Cells(nOn, nOff, tau)
+        result = np.zeros(nOn.shape)
+        for di in (0, 1):
+            wi = fi if di else 1. - fi
+            for dj in (0, 1):
+                wj = fj if dj else 1. - fj
+                for dk in (0, 1):
+                    wk = fk if dk else 1. - fk
+                    result += wi * wj * wk * self.z[i + di, j + dj, k + dk]
+        return result
+
+    def Inside(self, nOn, nOff, tau):
+        '''
+        True for the points within the range of every axis of the grid.
+        '''
+        inside = True
+        for axis, values in zip(self.axes, (nOn, nOff, tau)):
+            inside = inside & (values >= axis[0]) & (values <= axis[-1])
+        return inside
+
+    def Query(self, nOn, nOff, tau):
+        '''
+        Interpolated Z and the error bound of the cells of the points.
+        Outside the grid Z is computed exactly, with error 0, instead of
+        taking the value of the edge cell.
+        '''
+        nOn, nOff, tau = np.broadcast_arrays(np.asarray(nOn, dtype=float),
+                                             np.asarray(nOff, dtype=float),
+                                             np.asarray(tau, dtype=float))
+        z = self.Interpolate(nOn, nOff, tau)
+        (i, j, k), fractions = self._Cells(nOn, nOff, tau)
+        error = np.array(self.cellError[i, j, k])
+        outside = ~self.Inside(nOn, nOff, tau)
+        if np.any(outside):
+            z[outside] = BinomialWithTauObsZ(nOn[outside], nOff[outside] / tau[outside],
+                                             tau[outside])
+            error[outside] = 0.
+        return z, error
+
+    def QueryObs(self, nObs, bExp, tau):
+        '''
+        As NumberCountingUtils.BinomialWithTauObsZ(nObs, bExp, tau), from
+        the table within its range and computed exactly outside.
+        '''
+        return self.Query(nObs, np.multiply(bExp, tau), tau)